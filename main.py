@@ -1,8 +1,123 @@
-from valutatrade_hub.cli.interface import run_cli
+import argparse
+import sys
 
 
-def main():
+def main(argv: list[str] | None = None):
     """Точка входа в систему."""
+    parser = argparse.ArgumentParser(
+        prog="project", description="ValutaTrade Hub - торговля валютами."
+    )
+    parser.add_argument(
+        "--script",
+        metavar="FILE",
+        help="выполнить команды из файла (или '-' для stdin) без диалога",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("text", "json", "ndjson"),
+        default="text",
+        help="формат вывода команд (json и ndjson - для обработки программами)",
+    )
+    parser.add_argument(
+        "--fail-fast",
+        action="store_true",
+        help="в пакетном режиме остановиться на первой ошибке",
+    )
+    parser.add_argument(
+        "--serve",
+        nargs="?",
+        const="",
+        metavar="ADDRESS",
+        help="запустить сервис: путь к Unix-сокету или host:port "
+        "(по умолчанию VALUTATRADE_SERVICE или data/valutatrade.sock)",
+    )
+    parser.add_argument(
+        "--connect",
+        nargs="?",
+        const="",
+        metavar="ADDRESS",
+        help="работать как тонкий клиент запущенного сервиса",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="MODES",
+        help="профилировать команды: cpu (cProfile), mem (tracemalloc) "
+        "или cpu,mem; отчёты - в logs/profiles",
+    )
+    parser.add_argument(
+        "--profile-targets",
+        metavar="COMMANDS",
+        help="профилировать только перечисленные через запятую команды",
+    )
+    parser.add_argument(
+        "--profile-every",
+        type=int,
+        metavar="N",
+        help="профилировать только каждый N-й вызов",
+    )
+    parser.add_argument(
+        "--metrics",
+        nargs="?",
+        const="",
+        metavar="ADDRESS",
+        help="отдавать метрики Prometheus по HTTP на host:port "
+        "(по умолчанию VALUTATRADE_METRICS или 127.0.0.1:9108)",
+    )
+    options = parser.parse_args(argv)
+
+    if options.profile or options.profile_targets or options.profile_every:
+        from valutatrade_hub import profiling
+
+        try:
+            profiling.configure(
+                options.profile, options.profile_targets, options.profile_every
+            )
+        except ValueError as e:
+            parser.error(str(e))
+
+    if options.metrics is not None:
+        from valutatrade_hub import metrics
+        from valutatrade_hub.core.usecases import get_engine
+        from valutatrade_hub.infra.settings import SettingsLoader
+
+        # Движок по умолчанию подключает свои метрики при создании
+        get_engine()
+
+        address = options.metrics or SettingsLoader().get("METRICS_ADDRESS")
+        try:
+            metrics.start_http_server(address)
+        except (OSError, ValueError) as e:
+            parser.error(f"не удалось запустить эндпоинт метрик: {e}")
+
+    if options.serve is not None:
+        from valutatrade_hub import metrics
+        from valutatrade_hub.infra.settings import SettingsLoader
+        from valutatrade_hub.service.server import run_server
+
+        # Файл метрик ведёт только долгоживущий процесс
+        metrics.start_file_writer()
+        run_server(options.serve or SettingsLoader().get("SERVICE_ADDRESS"))
+        return
+
+    from valutatrade_hub.cli.interface import (
+        connect_service,
+        run_cli,
+        set_output_format,
+    )
+
+    set_output_format(options.format)
+    if options.connect is not None:
+        try:
+            connect_service(options.connect or None)
+        except OSError as e:
+            print(f"Не удалось подключиться к сервису: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    if options.script:
+        from valutatrade_hub.cli.batch import run_script
+
+        sys.exit(run_script(options.script, options.fail_fast))
+
     print("ValutaTrade запущен.")
     run_cli()
 
@@ -0,0 +1,16 @@
+from .dataset import DatasetSpec, generate_dataset
+from .results import compare, environment, load_result, save_result
+from .suite import CASES, SCALES, format_results, run_suite
+
+__all__ = [
+    "CASES",
+    "SCALES",
+    "DatasetSpec",
+    "compare",
+    "environment",
+    "format_results",
+    "generate_dataset",
+    "load_result",
+    "run_suite",
+    "save_result",
+]
@@ -0,0 +1,336 @@
+"""
+Запуск бенчмарков: python -m valutatrade_hub.bench run [--scale small,medium]
+Результат (JSON) выводится в stdout или в файл --out, таблица - в stderr.
+Набор данных отдельно: python -m valutatrade_hub.bench generate DIR [...]
+Нагрузочный тест: python -m valutatrade_hub.bench load --workers 8 [...]
+Результаты run сохраняются в bench-results; сравнение двух прогонов:
+python -m valutatrade_hub.bench compare previous latest
+Кодеки сжатия файлов данных: python -m valutatrade_hub.bench compression
+"""
+
+import argparse
+import json
+import sys
+
+from valutatrade_hub.bench.compression import (
+    DEFAULT_CODECS,
+    format_compression,
+    run_compression,
+)
+from valutatrade_hub.bench.dataset import DatasetSpec, generate_dataset
+from valutatrade_hub.bench.load import DEFAULT_MIX, format_load, run_load
+from valutatrade_hub.bench.results import (
+    compare,
+    environment,
+    format_comparison,
+    list_results,
+    load_result,
+    save_result,
+)
+from valutatrade_hub.bench.suite import CASES, SCALES, format_results, run_suite
+
+
+def _split(value: str | None) -> list[str]:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def _generate(parser: argparse.ArgumentParser, options) -> int:
+    try:
+        spec = DatasetSpec(
+            users=options.users,
+            wallets=options.wallets,
+            base_wallets=tuple(_split(options.base_wallets.upper())),
+            currencies=tuple(_split(options.currencies.upper()))
+            if options.currencies
+            else DatasetSpec.currencies,
+            pairs=options.pairs,
+            history=options.history,
+            history_step=options.history_step,
+            volatility=options.volatility,
+            seed=options.seed,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    summary = generate_dataset(options.directory, spec)
+    print(
+        f"Набор данных создан в {options.directory}: "
+        f"пользователей {summary['users']}, пар {summary['pairs']}, "
+        f"записей истории {summary['history']}."
+    )
+    return 0
+
+
+def _load(parser: argparse.ArgumentParser, options) -> int:
+    try:
+        report = run_load(
+            workers=options.workers,
+            mix=options.mix,
+            ops=options.ops,
+            seconds=options.seconds,
+            users=options.users,
+            data_dir=options.data_dir,
+            work_dir=options.work_dir,
+            seed=options.seed,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    if options.out:
+        with open(options.out, "w", encoding="utf-8") as f:
+            f.write(json.dumps(report, ensure_ascii=False, indent=2) + "\n")
+    print(format_load(report))
+    return 0 if report["invariants"]["ok"] else 1
+
+
+def _compression(parser: argparse.ArgumentParser, options) -> int:
+    try:
+        report = run_compression(
+            codecs=options.codecs,
+            data_dir=options.data_dir,
+            users=options.users,
+            history=options.history,
+            trades=options.trades,
+            seed=options.seed,
+            work_dir=options.work_dir,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    if options.out:
+        with open(options.out, "w", encoding="utf-8") as f:
+            f.write(json.dumps(report, ensure_ascii=False, indent=2) + "\n")
+    print(format_compression(report))
+    return 0
+
+
+def _list(options) -> int:
+    stored = list_results(options.results_dir)
+    if not stored:
+        print("Сохранённых результатов нет.")
+        return 0
+    for path in stored:
+        report = load_result(str(path))
+        env = report.get("environment") or {}
+        scales = dict.fromkeys(row["scale"] for row in report["results"])
+        print(
+            f"{path.stem}  масштабы: {', '.join(scales)}  "
+            f"Python {env.get('python', '?')}  {env.get('cpu', '?')}"
+        )
+    return 0
+
+
+def _compare(parser: argparse.ArgumentParser, options) -> int:
+    try:
+        baseline = load_result(options.baseline, options.results_dir)
+        candidate = load_result(options.candidate, options.results_dir)
+        comparison = compare(baseline, candidate, options.threshold, options.alpha)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if options.out:
+        with open(options.out, "w", encoding="utf-8") as f:
+            f.write(json.dumps(comparison, ensure_ascii=False, indent=2) + "\n")
+    print(format_comparison(comparison, baseline, candidate))
+    return 1 if comparison["regressions"] else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="bench", description="Бенчмарки ValutaTrade Hub."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="выполнить бенчмарки")
+    run.add_argument(
+        "--scale",
+        default="small",
+        help=f"масштабы через запятую: {', '.join(SCALES)} (по умолчанию small)",
+    )
+    run.add_argument("--users", type=int, help="переопределить число пользователей")
+    run.add_argument("--pairs", type=int, help="переопределить число валютных пар")
+    run.add_argument("--history", type=int, help="переопределить длину истории")
+    run.add_argument(
+        "--cases", help=f"сценарии через запятую (по умолчанию все: {', '.join(CASES)})"
+    )
+    run.add_argument(
+        "--max-ops", type=int, default=1000, help="операций на сценарий (1000)"
+    )
+    run.add_argument(
+        "--max-seconds",
+        type=float,
+        default=5.0,
+        help="ограничение времени замера сценария в секундах (5)",
+    )
+    run.add_argument("--seed", type=int, default=0, help="зерно генератора (0)")
+    run.add_argument("--work-dir", help="каталог для временных наборов данных")
+    run.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="повторов каждого сценария; от 2 - проверка значимости в compare (1)",
+    )
+    run.add_argument("--out", metavar="FILE", help="записать JSON-отчёт в файл")
+    run.add_argument("--label", help="метка результата (по умолчанию коммит)")
+    run.add_argument(
+        "--no-save", action="store_true", help="не сохранять результат в хранилище"
+    )
+
+    generate = commands.add_parser(
+        "generate", help="создать синтетический набор данных в каталоге"
+    )
+    generate.add_argument("directory", help="каталог набора данных")
+    generate.add_argument("--users", type=int, default=1_000)
+    generate.add_argument(
+        "--wallets",
+        default="uniform:0-2",
+        help="число дополнительных кошельков: fixed:N, uniform:A-B или geometric:P",
+    )
+    generate.add_argument(
+        "--base-wallets",
+        default="USD,BTC",
+        help="кошельки каждого пользователя (USD,BTC)",
+    )
+    generate.add_argument(
+        "--currencies", help="валюты кошельков через запятую (все поддерживаемые)"
+    )
+    generate.add_argument("--pairs", type=int, default=10)
+    generate.add_argument("--history", type=int, default=1_000)
+    generate.add_argument(
+        "--history-step", type=int, default=60, help="шаг истории в секундах (60)"
+    )
+    generate.add_argument(
+        "--volatility", type=float, default=0.001, help="волатильность шага (0.001)"
+    )
+    generate.add_argument("--seed", type=int, default=0)
+
+    load = commands.add_parser(
+        "load", help="нагрузочный тест несколькими процессами с проверкой инвариантов"
+    )
+    load.add_argument("--workers", type=int, default=4, help="число процессов (4)")
+    load.add_argument(
+        "--mix", default=DEFAULT_MIX, help=f"веса операций ({DEFAULT_MIX})"
+    )
+    load.add_argument(
+        "--ops", type=int, default=1000, help="операций на воркер (1000)"
+    )
+    load.add_argument(
+        "--seconds", type=float, default=10.0, help="ограничение времени (10)"
+    )
+    load.add_argument(
+        "--users",
+        type=int,
+        default=100,
+        help="пользователей в сгенерированном наборе (100); меньше - выше конкуренция",
+    )
+    load.add_argument(
+        "--data-dir", help="исходный набор данных (копируется, не изменяется)"
+    )
+    load.add_argument("--work-dir", help="каталог для временной копии данных")
+    load.add_argument("--seed", type=int, default=0)
+    load.add_argument("--out", metavar="FILE", help="записать JSON-отчёт в файл")
+
+    compression = commands.add_parser(
+        "compression", help="степень сжатия и скорость кодеков на файлах данных"
+    )
+    compression.add_argument(
+        "--codecs",
+        default=DEFAULT_CODECS,
+        help=f"кодеки и уровни через запятую ({DEFAULT_CODECS})",
+    )
+    compression.add_argument(
+        "--data-dir", help="каталог данных (по умолчанию - сгенерированный набор)"
+    )
+    compression.add_argument(
+        "--users", type=int, default=1_000, help="пользователей в наборе (1000)"
+    )
+    compression.add_argument(
+        "--history", type=int, default=100_000, help="записей истории (100000)"
+    )
+    compression.add_argument(
+        "--trades", type=int, default=20_000, help="сделок в журналах (20000)"
+    )
+    compression.add_argument("--seed", type=int, default=0)
+    compression.add_argument("--work-dir", help="каталог для временных файлов")
+    compression.add_argument("--out", metavar="FILE", help="записать JSON-отчёт в файл")
+
+    commands.add_parser("list", help="сохранённые результаты")
+
+    compare_parser = commands.add_parser(
+        "compare", help="сравнить два результата и найти регрессии"
+    )
+    compare_parser.add_argument(
+        "baseline", help="базовый результат: файл, id, latest или previous"
+    )
+    compare_parser.add_argument("candidate", help="сравниваемый результат")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="допустимое относительное ухудшение (0.1 = 10%%)",
+    )
+    compare_parser.add_argument(
+        "--alpha", type=float, default=0.05, help="уровень значимости (0.05)"
+    )
+    compare_parser.add_argument(
+        "--out", metavar="FILE", help="записать JSON сравнения в файл"
+    )
+
+    for subparser in (run, commands.choices["list"], compare_parser):
+        subparser.add_argument(
+            "--results-dir",
+            help="каталог результатов (VALUTATRADE_BENCH_DIR или bench-results)",
+        )
+
+    options = parser.parse_args(argv)
+    if options.command == "list":
+        return _list(options)
+    if options.command == "compare":
+        return _compare(parser, options)
+    if options.command == "generate":
+        return _generate(parser, options)
+    if options.command == "load":
+        return _load(parser, options)
+    if options.command == "compression":
+        return _compression(parser, options)
+
+    scales = {}
+    for name in _split(options.scale):
+        if name not in SCALES:
+            parser.error(f"неизвестный масштаб '{name}'")
+        scale = dict(SCALES[name])
+        for key in ("users", "pairs", "history"):
+            if getattr(options, key) is not None:
+                scale[key] = getattr(options, key)
+        scales[name] = scale
+
+    try:
+        report = run_suite(
+            scales,
+            cases=_split(options.cases) or None,
+            max_ops=options.max_ops,
+            max_seconds=options.max_seconds,
+            seed=options.seed,
+            repeat=options.repeat,
+            work_dir=options.work_dir,
+            progress=lambda message: print(f"... {message}", file=sys.stderr),
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    report["environment"] = environment()
+    document = json.dumps(report, ensure_ascii=False, indent=2)
+    if options.out:
+        with open(options.out, "w", encoding="utf-8") as f:
+            f.write(document + "\n")
+    else:
+        print(document)
+    print(format_results(report), file=sys.stderr)
+    if not options.no_save:
+        path = save_result(report, options.results_dir, options.label)
+        print(f"Результат сохранён: {path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
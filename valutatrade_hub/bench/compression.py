@@ -0,0 +1,229 @@
+"""
+Сравнение кодеков сжатия на файлах данных: степень сжатия против затрат
+процессора. Каждая группа файлов (история курсов, журналы сделок,
+состояния P&L, снимок rates.json) сжимается и распаковывается потоком,
+как при хранении; скорость считается по исходному объёму. Для журналов
+отдельно оценивается дописывание: каждая запись - свой сжатый блок.
+Без каталога данных используется сгенерированный набор со случайными
+сделками.
+"""
+
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from valutatrade_hub.bench.dataset import BASE_RATES_USD, DatasetSpec, generate_dataset
+from valutatrade_hub.core.ledger import PnLEngine, TradeLedger
+from valutatrade_hub.infra.compression import (
+    CHUNK_SIZE,
+    CODEC_SUFFIXES,
+    available_codecs,
+    check_codec,
+    codec_for,
+    codec_stream,
+    compress,
+    open_file,
+)
+
+# Кодеки и уровни по умолчанию; недоступный zstd пропускается
+DEFAULT_CODECS = "gzip:1,gzip:6,gzip:9,lzma:0,lzma:6,zstd:3,zstd:19"
+
+
+def parse_codecs(spec: str) -> list[tuple[str, int | None]]:
+    """
+    "gzip:6,lzma" -> [("gzip", 6), ("lzma", None)]
+    """
+    explicit = spec != DEFAULT_CODECS
+    result = []
+    for item in spec.split(","):
+        name, _, level = item.strip().partition(":")
+        if not name:
+            continue
+        if not explicit and name not in available_codecs():
+            continue
+        check_codec(name)
+        if name == "none":
+            raise ValueError("Укажите кодек сжатия: none не сравнивается")
+        try:
+            result.append((name, int(level) if level else None))
+        except ValueError:
+            raise ValueError(f"Некорректный уровень сжатия '{item}'") from None
+    if not result:
+        raise ValueError("Не указано ни одного кодека")
+    return result
+
+
+def _synthetic_trades(data_dir: Path, users: int, trades: int, seed: int) -> None:
+    """
+    Журналы сделок и состояния P&L для случайных покупок и продаж
+    """
+    rng = random.Random(f"{seed}:trades")
+    ledger_dir = data_dir / "ledger"
+    ledger = TradeLedger(ledger_dir)
+    codes = list(BASE_RATES_USD)
+    for _ in range(trades):
+        code = rng.choice(codes)
+        rate = BASE_RATES_USD[code] * (1 + rng.gauss(0, 0.01))
+        amount = round(rng.uniform(0.001, 1.0), 6) * rng.choice((1, 1, -1))
+        ledger.append(rng.randint(1, users), f"{code}_USD", amount, rate)
+    pnl = PnLEngine(ledger, ledger_dir)
+    for user_id in range(1, users + 1):
+        pnl.get_state(user_id)
+
+
+def data_groups(data_dir) -> dict[str, list[Path]]:
+    """
+    Файлы каталога данных по группам (несжатые или сжатые - любые)
+    """
+    data_dir = Path(data_dir)
+    ledger_dir = data_dir / "ledger"
+
+    def files(directory: Path, pattern: str) -> list[Path]:
+        return sorted(directory.glob(pattern)) if directory.is_dir() else []
+
+    return {
+        "history": files(data_dir, "exchange_rates.json*"),
+        "journals": files(ledger_dir, "*.jsonl*"),
+        "pnl_states": files(ledger_dir, "*.pnl.json*"),
+        "rates": files(data_dir, "rates.json*"),
+    }
+
+
+def _measure(
+    files: list[Path], codec: str, level: int | None, work_dir: Path
+) -> dict:
+    original = compressed = 0
+    compress_ns = decompress_ns = 0
+    for path in files:
+        target = work_dir / f"{path.name}{CODEC_SUFFIXES[codec]}"
+        started = time.perf_counter_ns()
+        with open_file(path, "rb") as src, open(target, "wb") as raw:
+            with codec_stream(raw, codec, "w", level) as dst:
+                while chunk := src.read(CHUNK_SIZE):
+                    original += len(chunk)
+                    dst.write(chunk)
+        compress_ns += time.perf_counter_ns() - started
+        compressed += target.stat().st_size
+
+        started = time.perf_counter_ns()
+        with open(target, "rb") as raw, codec_stream(raw, codec, "r") as src:
+            while src.read(CHUNK_SIZE):
+                pass
+        decompress_ns += time.perf_counter_ns() - started
+        target.unlink()
+    return {
+        "original_bytes": original,
+        "compressed_bytes": compressed,
+        "compress_ns": compress_ns,
+        "decompress_ns": decompress_ns,
+    }
+
+
+def _measure_appends(files: list[Path], codec: str) -> dict:
+    """
+    Журналы в режиме дописывания: каждая запись сжимается отдельно
+    """
+    original = compressed = 0
+    started = time.perf_counter_ns()
+    for path in files:
+        with open_file(path, "rb") as f:
+            for line in f:
+                original += len(line)
+                compressed += len(compress(line, codec))
+    return {
+        "original_bytes": original,
+        "compressed_bytes": compressed,
+        "compress_ns": time.perf_counter_ns() - started,
+        "decompress_ns": 0,
+    }
+
+
+def run_compression(
+    codecs: str = DEFAULT_CODECS,
+    data_dir: str | None = None,
+    users: int = 1_000,
+    history: int = 100_000,
+    trades: int = 20_000,
+    seed: int = 0,
+    work_dir: str | None = None,
+) -> dict:
+    """
+    Степень сжатия и скорость кодеков по группам файлов каталога данных
+    """
+    plan = parse_codecs(codecs)
+    root = Path(tempfile.mkdtemp(prefix="valutatrade-compress-", dir=work_dir))
+    try:
+        if data_dir is None:
+            data_dir = root / "data"
+            generate_dataset(
+                data_dir,
+                DatasetSpec(users=users, history=history, pairs=10, seed=seed),
+            )
+            _synthetic_trades(data_dir, users, trades, seed)
+        output_dir = root / "out"
+        output_dir.mkdir()
+
+        rows = []
+        for group, files in data_groups(data_dir).items():
+            if not files:
+                continue
+            for codec, level in plan:
+                row = _measure(files, codec, level, output_dir)
+                rows.append({"group": group, "codec": codec, "level": level, **row})
+            if group == "journals" and all(codec_for(p) is None for p in files):
+                for codec in dict.fromkeys(codec for codec, _ in plan):
+                    row = _measure_appends(files, codec)
+                    rows.append(
+                        {"group": "journal_appends", "codec": codec, "level": None}
+                        | row
+                    )
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    for row in rows:
+        original = row["original_bytes"]
+        row["ratio"] = (
+            original / row["compressed_bytes"] if row["compressed_bytes"] else 0
+        )
+        row["compress_mb_s"] = (
+            original / 1e6 / (row["compress_ns"] / 1e9) if row["compress_ns"] else 0.0
+        )
+        row["decompress_mb_s"] = (
+            original / 1e6 / (row["decompress_ns"] / 1e9)
+            if row["decompress_ns"]
+            else 0.0
+        )
+    return {
+        "data_dir": str(data_dir) if data_dir else None,
+        "codecs": [f"{codec}:{level}" for codec, level in plan],
+        "results": rows,
+    }
+
+
+def format_compression(report: dict) -> str:
+    """
+    Результаты сравнения кодеков для терминала
+    """
+    lines = [
+        f"{'Файлы':<16} {'Кодек':<8} {'Исходно':>10} {'Сжато':>10} {'Коэф.':>6} "
+        f"{'Сжатие':>9} {'Распак.':>9}"
+    ]
+    for row in report["results"]:
+        codec = row["codec"]
+        if row["level"] is not None:
+            codec = f"{codec}:{row['level']}"
+        decompress = (
+            f"{row['decompress_mb_s']:>9.1f}" if row["decompress_ns"] else f"{'-':>9}"
+        )
+        lines.append(
+            f"{row['group']:<16} {codec:<8} {row['original_bytes'] / 1e6:>8.2f}MB "
+            f"{row['compressed_bytes'] / 1e6:>8.2f}MB {row['ratio']:>6.1f} "
+            f"{row['compress_mb_s']:>9.1f} {decompress}"
+        )
+    lines.append(
+        "Скорость - МБ/с исходных данных; journal_appends - журналы, "
+        "дописанные по одной записи."
+    )
+    return "\n".join(lines)
@@ -0,0 +1,232 @@
+"""
+Генератор синтетических наборов данных для бенчмарков и нагрузочных тестов.
+Результат полностью определяется DatasetSpec (включая seed): одинаковые
+параметры дают побайтно одинаковые файлы. Записи пишутся в файлы по мере
+генерации, поэтому в памяти держатся только текущие курсы пар - набор
+на миллионы пользователей и записей истории не требует гигабайтов ОЗУ.
+Создаются users.json, portfolios.json, rates.json и exchange_rates.json.
+"""
+
+import hashlib
+import json
+import math
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable
+
+from valutatrade_hub.core.currencies import CURRENCY_CODES
+from valutatrade_hub.core.money import scale_of
+
+BENCH_PASSWORD = "bench-password"
+# Начальные курсы к USD для случайного блуждания
+BASE_RATES_USD = {"EUR": 1.08, "RUB": 0.0127, "BTC": 94140.0, "ETH": 3300.0}
+WALLET_DISTRIBUTIONS = ("fixed", "uniform", "geometric")
+# Начало временной шкалы набора: регистрации и история курсов
+EPOCH = datetime(2025, 1, 1)
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    """
+    Параметры набора данных.
+    - users - число пользователей (пароль у всех BENCH_PASSWORD).
+    - wallets - распределение числа дополнительных кошельков:
+      "fixed:N", "uniform:A-B" или "geometric:P" (P - вероятность остановки).
+    - base_wallets - кошельки, которые есть у каждого пользователя.
+    - currencies - валюты кошельков (подмножество поддерживаемых).
+    - pairs - число пар в rates.json: пары валют currencies к USD в обе
+      стороны, дополненные синтетическими X00000_USD.
+    - history - число записей истории курсов (по парам по очереди).
+    - history_step - шаг истории по времени в секундах.
+    - volatility - стандартное отклонение шага случайного блуждания.
+    """
+
+    users: int = 1_000
+    wallets: str = "uniform:0-2"
+    base_wallets: tuple[str, ...] = ("USD", "BTC")
+    currencies: tuple[str, ...] = CURRENCY_CODES
+    pairs: int = 10
+    history: int = 1_000
+    history_step: int = 60
+    volatility: float = 0.001
+    seed: int = 0
+
+    def __post_init__(self) -> None:
+        unknown = [
+            code
+            for code in self.currencies + self.base_wallets
+            if code not in CURRENCY_CODES
+        ]
+        if unknown:
+            raise ValueError(f"Неподдерживаемая валюта кошелька: {unknown[0]}")
+        if self.users < 0 or self.pairs < 0 or self.history < 0:
+            raise ValueError("Размеры набора данных не могут быть отрицательными")
+        _parse_wallets(self.wallets)
+
+
+def _parse_wallets(spec: str) -> tuple[str, float, float]:
+    """
+    Разбирает распределение числа кошельков: (вид, параметр1, параметр2)
+    """
+    kind, _, value = spec.partition(":")
+    try:
+        if kind == "fixed":
+            return kind, int(value), int(value)
+        if kind == "uniform":
+            low, _, high = value.partition("-")
+            return kind, int(low), int(high or low)
+        if kind == "geometric":
+            probability = float(value)
+            if 0 < probability <= 1:
+                return kind, probability, probability
+    except ValueError:
+        pass
+    raise ValueError(
+        f"Некорректное распределение кошельков '{spec}'. "
+        f"Ожидается одно из: fixed:N, uniform:A-B, geometric:P"
+    )
+
+
+def _wallet_count(rng: random.Random, kind: str, first: float, second: float) -> int:
+    if kind == "uniform":
+        return rng.randint(int(first), int(second))
+    if kind == "geometric":
+        count = 0
+        while rng.random() > first:
+            count += 1
+        return count
+    return int(first)
+
+
+def _write_json_array(path: Path, records: Iterable[dict]) -> int:
+    """
+    Пишет JSON-массив по одной записи; возвращает число записей
+    """
+    count = 0
+    with path.open("w", encoding="utf-8") as f:
+        f.write("[")
+        for record in records:
+            f.write(",\n" if count else "\n")
+            f.write(json.dumps(record, ensure_ascii=False))
+            count += 1
+        f.write("\n]\n")
+    return count
+
+
+def pair_universe(spec: DatasetSpec) -> dict[str, float]:
+    """
+    Пары rates.json и их начальные курсы
+    """
+    rng = random.Random(f"{spec.seed}:pairs")
+    rates = {}
+    for code in spec.currencies:
+        if code == "USD":
+            continue
+        rate = BASE_RATES_USD.get(code, 1.0)
+        rates[f"{code}_USD"] = rate
+        rates[f"USD_{code}"] = 1 / rate
+    for index in range(max(spec.pairs - len(rates), 0)):
+        rates[f"X{index:05d}_USD"] = round(rng.lognormvariate(0, 2), 6)
+    return dict(list(rates.items())[: spec.pairs])
+
+
+def _user_records(spec: DatasetSpec) -> Iterable[dict]:
+    rng = random.Random(f"{spec.seed}:users")
+    for user_id in range(1, spec.users + 1):
+        salt = f"{rng.getrandbits(32):08x}"
+        registered = EPOCH + timedelta(seconds=rng.randrange(365 * 86400))
+        yield {
+            "user_id": user_id,
+            "username": f"user{user_id}",
+            "hashed_password": hashlib.sha256(
+                (BENCH_PASSWORD + salt).encode()
+            ).hexdigest(),
+            "salt": salt,
+            "registration_date": registered.isoformat(),
+        }
+
+
+def _portfolio_records(spec: DatasetSpec) -> Iterable[dict]:
+    rng = random.Random(f"{spec.seed}:portfolios")
+    kind, first, second = _parse_wallets(spec.wallets)
+    optional = [code for code in spec.currencies if code not in spec.base_wallets]
+
+    for user_id in range(1, spec.users + 1):
+        extra = min(_wallet_count(rng, kind, first, second), len(optional))
+        codes = list(spec.base_wallets) + rng.sample(optional, extra)
+        wallets = {}
+        for code in codes:
+            # Стоимость кошелька в USD - логнормальная, от ~1 тыс. до ~100 тыс.
+            value_usd = max(rng.lognormvariate(math.log(10_000), 1.0), 1_000.0)
+            amount = value_usd / BASE_RATES_USD.get(code, 1.0)
+            scale = scale_of(code)
+            wallets[code] = {
+                "currency_code": code,
+                "balance_minor": round(amount * 10**scale),
+                "scale": scale,
+            }
+        yield {"user_id": user_id, "wallets": wallets}
+
+
+def generate_dataset(path, spec: DatasetSpec) -> dict:
+    """
+    Создаёт набор данных в каталоге path; возвращает сводку с числом записей
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    users = _write_json_array(path / "users.json", _user_records(spec))
+    portfolios = _write_json_array(path / "portfolios.json", _portfolio_records(spec))
+
+    # История: геометрическое случайное блуждание, пары по очереди
+    rng = random.Random(f"{spec.seed}:history")
+    current = pair_universe(spec)
+    names = list(current)
+    updated = dict.fromkeys(names, EPOCH)
+    with (path / "exchange_rates.json").open("w", encoding="utf-8") as f:
+        f.write("{")
+        for index in range(spec.history if names else 0):
+            pair = names[index % len(names)]
+            current[pair] *= math.exp(rng.gauss(0, spec.volatility))
+            timestamp = EPOCH + timedelta(seconds=index * spec.history_step)
+            updated[pair] = timestamp
+            from_code, to_code = pair.split("_")
+            record_id = f"{pair}_{timestamp.isoformat()}"
+            record = {
+                "id": record_id,
+                "from_currency": from_code,
+                "to_currency": to_code,
+                "rate": current[pair],
+                "timestamp": timestamp.isoformat(),
+                "source": "Synthetic",
+                "meta": {"raw_id": None},
+            }
+            f.write(",\n" if index else "\n")
+            f.write(f"{json.dumps(record_id)}: {json.dumps(record)}")
+        f.write("\n}\n")
+
+    # Кэш курсов - последние значения блуждания
+    last_refresh = max(updated.values(), default=EPOCH).isoformat()
+    rates = {
+        "pairs": {
+            pair: {
+                "rate": rate,
+                "updated_at": updated[pair].isoformat(),
+                "source": "Synthetic",
+            }
+            for pair, rate in current.items()
+        },
+        "last_refresh": last_refresh,
+        "version": 1,
+    }
+    with (path / "rates.json").open("w", encoding="utf-8") as f:
+        json.dump(rates, f)
+
+    return {
+        "users": users,
+        "portfolios": portfolios,
+        "pairs": len(current),
+        "history": spec.history if names else 0,
+    }
@@ -0,0 +1,319 @@
+"""
+Нагрузочный тест: несколько процессов торгуют над одним каталогом данных.
+Каждый процесс-воркер создаёт свой TradingEngine, как отдельный запуск
+CLI, и выполняет смесь операций buy/sell/get_rate/portfolio. Воркеры
+возвращают задержки и подтверждённые сделки в минимальных единицах.
+После прогона проверяются инварианты:
+- сумма каждой валюты в portfolios.json равна начальной плюс
+  подтверждённые изменения (иначе часть сделок потеряна при
+  перезаписи файла другим процессом);
+- нет отрицательных балансов;
+- в журналах сделок (ledger) столько записей, сколько подтверждено сделок.
+"""
+
+import logging
+import multiprocessing
+import random
+import shutil
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from valutatrade_hub.bench.dataset import BASE_RATES_USD, DatasetSpec, generate_dataset
+from valutatrade_hub.core.currencies import CURRENCY_CODES
+from valutatrade_hub.core.repository import PortfolioRepository
+from valutatrade_hub.core.utils import load_json
+from valutatrade_hub.infra.compression import open_file
+
+OPERATIONS = ("buy", "sell", "get_rate", "portfolio")
+DEFAULT_MIX = "buy=40,sell=30,get_rate=20,portfolio=10"
+TRADE_AMOUNT = 0.0001
+TRADE_CURRENCY = "BTC"
+
+
+def parse_mix(mix: str) -> dict[str, int]:
+    """
+    Смесь операций "buy=40,sell=30,..." -> {операция: вес}
+    """
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(
+                f"Неизвестная операция '{name}'. Доступны: {', '.join(OPERATIONS)}"
+            )
+        try:
+            weights[name] = int(weight or 1)
+        except ValueError:
+            raise ValueError(f"Некорректный вес операции '{item}'") from None
+    if not any(weights.values()):
+        raise ValueError("Смесь операций пуста")
+    return weights
+
+
+def _percentile(sorted_values: list[int], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(len(sorted_values) * percent / 100))
+    return sorted_values[min(rank, len(sorted_values)) - 1] / 1e6
+
+
+def _worker(
+    worker_id: int,
+    data_dir: str,
+    weights: dict[str, int],
+    users: int,
+    ops: int,
+    seconds: float,
+    start_at: float,
+    seed: int,
+) -> dict:
+    """
+    Выполняет операции в отдельном процессе и возвращает замеры
+    """
+    from valutatrade_hub import stats
+    from valutatrade_hub.core.engine import TradingEngine
+    from valutatrade_hub.core.money import to_minor
+    from valutatrade_hub.logging_config import LOGGER_NAME
+
+    # Ошибки операций учитываются в отчёте, журнал их не дублирует
+    logging.getLogger(LOGGER_NAME).setLevel(logging.CRITICAL)
+    engine = TradingEngine(data_dir, rates_ttl=10**9)
+    rng = random.Random(f"{seed}:{worker_id}")
+    names = list(weights)
+    weight_values = list(weights.values())
+    rate = BASE_RATES_USD[TRADE_CURRENCY]
+
+    latencies: dict[str, list[int]] = {name: [] for name in names}
+    errors: Counter = Counter()
+    deltas: Counter = Counter()
+    trades = 0
+
+    time.sleep(max(start_at - time.time(), 0))
+    deadline = time.perf_counter() + seconds
+    for _ in range(ops):
+        if time.perf_counter() >= deadline:
+            break
+        name = rng.choices(names, weight_values)[0]
+        user_id = rng.randint(1, users)
+        started = time.perf_counter_ns()
+        try:
+            if name == "buy":
+                result = engine.buy(
+                    user_id=user_id,
+                    currency_code=TRADE_CURRENCY,
+                    amount=TRADE_AMOUNT,
+                    rate=rate,
+                )
+            elif name == "sell":
+                result = engine.sell(
+                    user_id=user_id,
+                    currency_code=TRADE_CURRENCY,
+                    amount=TRADE_AMOUNT,
+                    rate=rate,
+                )
+            elif name == "get_rate":
+                result = engine.get_rate(from_code=TRADE_CURRENCY, to_code="USD")
+            else:
+                result = engine.get_portfolio_summary(user_id)
+        except Exception as e:
+            latencies[name].append(time.perf_counter_ns() - started)
+            errors[f"{name}:{type(e).__name__}"] += 1
+            continue
+        latencies[name].append(time.perf_counter_ns() - started)
+
+        if name in ("buy", "sell"):
+            sign = 1 if name == "buy" else -1
+            code = result["currency"]
+            deltas[code] += sign * to_minor(result["amount"], code)
+            deltas["USD"] -= sign * to_minor(result["value_usd"], "USD")
+            trades += 1
+
+    stats.STATS.clear()
+    return {
+        "latencies": latencies,
+        "errors": dict(errors),
+        "deltas": dict(deltas),
+        "trades": trades,
+    }
+
+
+def _portfolio_totals(data_dir: Path) -> tuple[Counter, int]:
+    """
+    Суммы балансов по валютам в минимальных единицах и число отрицательных
+    балансов
+    """
+    portfolios = PortfolioRepository(data_dir / "portfolios.json")
+    totals = Counter(
+        {code: portfolios.total_units(code) for code in CURRENCY_CODES}
+    )
+    negative = sum(
+        units < 0
+        for portfolio in portfolios.load_all()
+        for _, units in portfolio.iter_units()
+    )
+    return totals, negative
+
+
+def _ledger_records(data_dir: Path) -> int:
+    ledger_dir = data_dir / "ledger"
+    if not ledger_dir.is_dir():
+        return 0
+    count = 0
+    for path in ledger_dir.glob("*.jsonl*"):
+        with open_file(path, "rb") as f:
+            count += sum(1 for line in f if line.strip())
+    return count
+
+
+def run_load(
+    workers: int = 4,
+    mix: str = DEFAULT_MIX,
+    ops: int = 1000,
+    seconds: float = 10.0,
+    users: int = 100,
+    data_dir: str | None = None,
+    work_dir: str | None = None,
+    seed: int = 0,
+) -> dict:
+    """
+    Запускает workers процессов над копией набора данных и проверяет инварианты
+    data_dir - исходный набор (иначе генерируется на users пользователей);
+    ops и seconds ограничивают каждого воркера.
+    """
+    weights = parse_mix(mix)
+    if workers < 1:
+        raise ValueError("Число воркеров должно быть больше 0")
+
+    tmp = Path(tempfile.mkdtemp(prefix="valutatrade-load-", dir=work_dir))
+    try:
+        target = tmp / "data"
+        if data_dir:
+            shutil.copytree(data_dir, target)
+            users = len(load_json(target / "portfolios.json"))
+        else:
+            generate_dataset(target, DatasetSpec(users=users, seed=seed))
+        initial, _ = _portfolio_totals(target)
+        initial_ledger = _ledger_records(target)
+
+        context = multiprocessing.get_context("spawn")
+        start_at = time.time() + 1.0 + workers * 0.2
+        with ProcessPoolExecutor(workers, mp_context=context) as pool:
+            futures = [
+                pool.submit(
+                    _worker,
+                    worker_id,
+                    str(target),
+                    weights,
+                    users,
+                    ops,
+                    seconds,
+                    start_at,
+                    seed,
+                )
+                for worker_id in range(workers)
+            ]
+            results = [future.result() for future in futures]
+        elapsed = max(time.time() - start_at, 1e-9)
+
+        final, negative = _portfolio_totals(target)
+        ledger = _ledger_records(target) - initial_ledger
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    latencies: dict[str, list[int]] = {name: [] for name in weights}
+    errors: Counter = Counter()
+    deltas: Counter = Counter()
+    trades = 0
+    for result in results:
+        for name, values in result["latencies"].items():
+            latencies[name].extend(values)
+        errors.update(result["errors"])
+        deltas.update(result["deltas"])
+        trades += result["trades"]
+
+    operations = {}
+    for name, values in latencies.items():
+        values.sort()
+        operations[name] = {
+            "count": len(values),
+            "p50_ms": _percentile(values, 50),
+            "p95_ms": _percentile(values, 95),
+            "p99_ms": _percentile(values, 99),
+            "max_ms": values[-1] / 1e6 if values else 0.0,
+        }
+
+    drift = {}
+    for code in sorted(set(initial) | set(final) | set(deltas)):
+        expected = initial[code] + deltas[code]
+        if final[code] != expected:
+            drift[code] = {
+                "expected_units": expected,
+                "actual_units": final[code],
+                "lost_units": expected - final[code],
+            }
+
+    total_ops = sum(len(values) for values in latencies.values())
+    return {
+        "workers": workers,
+        "users": users,
+        "mix": weights,
+        "elapsed_s": elapsed,
+        "throughput_ops": total_ops / elapsed,
+        "operations": operations,
+        "errors": dict(sorted(errors.items())),
+        "trades_acknowledged": trades,
+        "invariants": {
+            "balance_drift": drift,
+            "negative_balances": negative,
+            "ledger_records": ledger,
+            "lost_trades": trades - ledger,
+            "ok": not drift and not negative and ledger == trades,
+        },
+    }
+
+
+def format_load(report: dict) -> str:
+    """
+    Итог нагрузочного теста для терминала
+    """
+    lines = [
+        f"Воркеров: {report['workers']}, пользователей: {report['users']}, "
+        f"время: {report['elapsed_s']:.1f} с, "
+        f"пропускная способность: {report['throughput_ops']:.1f} опер./с",
+        f"{'Операция':<10} {'Вызовов':>8} {'p50':>8} {'p95':>8} {'p99':>8} "
+        f"{'Макс.':>8}  (мс)",
+    ]
+    for name, row in report["operations"].items():
+        lines.append(
+            f"{name:<10} {row['count']:>8} {row['p50_ms']:>8.2f} "
+            f"{row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['max_ms']:>8.2f}"
+        )
+    for key, count in report["errors"].items():
+        lines.append(f"Ошибка {key}: {count}")
+
+    invariants = report["invariants"]
+    lines.append(
+        f"Подтверждено сделок: {report['trades_acknowledged']}, "
+        f"записей в журналах: {invariants['ledger_records']}"
+    )
+    for code, row in invariants["balance_drift"].items():
+        lines.append(
+            f"НАРУШЕНИЕ: {code} - ожидалось {row['expected_units']}, "
+            f"в портфелях {row['actual_units']} "
+            f"(потеряно {row['lost_units']} мин. единиц)"
+        )
+    if invariants["negative_balances"]:
+        lines.append(
+            f"НАРУШЕНИЕ: отрицательных балансов: {invariants['negative_balances']}"
+        )
+    if invariants["lost_trades"]:
+        lines.append(
+            f"НАРУШЕНИЕ: сделок без записи в журнале: {invariants['lost_trades']}"
+        )
+    lines.append(
+        "Инварианты выполнены." if invariants["ok"] else "Инварианты нарушены."
+    )
+    return "\n".join(lines)
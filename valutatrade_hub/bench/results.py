@@ -0,0 +1,366 @@
+"""
+Хранилище результатов бенчмарков и сравнение прогонов.
+Каждый отчёт сохраняется в каталог результатов (bench-results или
+VALUTATRADE_BENCH_DIR) вместе с описанием окружения: версия Python,
+процессор, ОС, коммит. compare() сопоставляет сценарии двух отчётов:
+средняя задержка и пропускная способность проверяются t-критерием Уэлча
+(для пропускной способности нужны повторы, --repeat), пиковая память -
+только порогом. Изменение считается регрессией, если оно хуже порога и
+статистически значимо.
+"""
+
+import json
+import math
+import os
+import platform
+import re
+import statistics
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+# Параметры набора данных в строке результата
+DATASET_KEYS = ("users", "pairs", "history")
+
+
+def results_dir(path=None) -> Path:
+    return Path(path or os.getenv("VALUTATRADE_BENCH_DIR") or "bench-results")
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def _git_commit() -> str | None:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return completed.stdout.strip() or None
+
+
+def environment() -> dict:
+    """
+    Описание окружения, в котором выполнялся прогон
+    """
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu": _cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "commit": _git_commit(),
+    }
+
+
+def save_result(report: dict, directory=None, label: str | None = None) -> Path:
+    """
+    Сохраняет отчёт с описанием окружения; возвращает путь к файлу
+    """
+    directory = results_dir(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    report = {**report, "environment": report.get("environment") or environment()}
+    label = label or report["environment"].get("commit") or "run"
+    created = datetime.fromisoformat(report["created_at"])
+    stem = f"{created:%Y%m%d-%H%M%S}-{re.sub(r'[^A-Za-z0-9._-]+', '_', label)}"
+    path = directory / f"{stem}.json"
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2), "utf-8")
+    return path
+
+
+def list_results(directory=None) -> list[Path]:
+    """
+    Сохранённые отчёты от старых к новым
+    """
+    directory = results_dir(directory)
+    if not directory.is_dir():
+        return []
+    return sorted(directory.glob("*.json"))
+
+
+def load_result(ref: str, directory=None) -> dict:
+    """
+    Отчёт по пути к файлу, id (имени файла без .json), его началу, метке
+    (последний результат с ней), либо latest / previous - последний и
+    предпоследний сохранённый.
+    """
+    if Path(ref).is_file():
+        path = Path(ref)
+    else:
+        stored = list_results(directory)
+        aliases = {"latest": -1, "previous": -2}
+        if ref in aliases:
+            if len(stored) < -aliases[ref]:
+                raise ValueError(f"Недостаточно сохранённых результатов для '{ref}'")
+            path = stored[aliases[ref]]
+        else:
+            labelled = [p for p in stored if p.stem.endswith(f"-{ref}")]
+            matches = (
+                [p for p in stored if p.stem == ref]
+                or labelled[-1:]
+                or [p for p in stored if p.stem.startswith(ref)]
+            )
+            if len(matches) != 1:
+                raise ValueError(
+                    f"Результат '{ref}' не найден"
+                    if not matches
+                    else f"Результат '{ref}' неоднозначен: {len(matches)} совпадений"
+                )
+            path = matches[0]
+    report = json.loads(path.read_text("utf-8"))
+    report.setdefault("id", path.stem)
+    return report
+
+
+# t-критерий Уэлча
+
+
+def _beta_fraction(a: float, b: float, x: float) -> float:
+    """
+    Цепная дробь неполной бета-функции (метод Лентца)
+    """
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, 300):
+        for numerator in (
+            m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+            -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1)),
+        ):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            result *= d * c
+        if abs(d * c - 1.0) < 1e-14:
+            break
+    return result
+
+
+def _incomplete_beta(a: float, b: float, x: float) -> float:
+    """
+    Регуляризованная неполная бета-функция I_x(a, b)
+    """
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    front = math.exp(
+        math.lgamma(a + b)
+        - math.lgamma(a)
+        - math.lgamma(b)
+        + a * math.log(x)
+        + b * math.log1p(-x)
+    )
+    if x < (a + 1) / (a + b + 2):
+        return front * _beta_fraction(a, b, x) / a
+    return 1.0 - front * _beta_fraction(b, a, 1 - x) / b
+
+
+def welch_test(
+    mean1: float, stdev1: float, n1: int, mean2: float, stdev2: float, n2: int
+) -> tuple[float, float, float]:
+    """
+    t-критерий Уэлча для двух выборок: (t, степени свободы, двусторонний p)
+    """
+    if n1 < 2 or n2 < 2:
+        raise ValueError("Для t-критерия нужно минимум по два наблюдения")
+    var1, var2 = stdev1**2 / n1, stdev2**2 / n2
+    if var1 + var2 == 0:
+        return 0.0, float(n1 + n2 - 2), 1.0 if mean1 == mean2 else 0.0
+    t = (mean2 - mean1) / math.sqrt(var1 + var2)
+    df = (var1 + var2) ** 2 / (var1**2 / (n1 - 1) + var2**2 / (n2 - 1))
+    return t, df, _incomplete_beta(df / 2, 0.5, df / (df + t * t))
+
+
+# Сравнение
+
+
+def _verdict(worsening: float, p: float | None, threshold: float, alpha: float) -> str:
+    """
+    worsening - относительное ухудшение метрики (> 0 - хуже)
+    """
+    if abs(worsening) <= threshold:
+        return "ok"
+    if p is not None and p >= alpha:
+        return "noise"
+    return "regression" if worsening > 0 else "improvement"
+
+
+def _relative(base: float, candidate: float) -> float:
+    if base == 0:
+        return 0.0 if candidate == 0 else math.inf
+    return candidate / base - 1
+
+
+def compare(
+    baseline: dict, candidate: dict, threshold: float = 0.1, alpha: float = 0.05
+) -> dict:
+    """
+    Сравнивает общие сценарии двух отчётов
+    Для каждой метрики: значения, относительное изменение, p-значение
+    (None - без проверки значимости) и вердикт: ok, noise, regression,
+    improvement.
+    """
+    for report in (baseline, candidate):
+        if report.get("schema", 0) < 2:
+            raise ValueError(
+                f"Отчёт '{report.get('id')}' в старом формате: нет разброса задержек"
+            )
+
+    base_rows = {(row["scale"], row["case"]): row for row in baseline["results"]}
+    rows = []
+    skipped = []
+    for candidate_row in candidate["results"]:
+        key = (candidate_row["scale"], candidate_row["case"])
+        base_row = base_rows.get(key)
+        if base_row is None:
+            continue
+        # Сравнимы только замеры на наборах одного размера
+        if any(base_row.get(name) != candidate_row.get(name) for name in DATASET_KEYS):
+            skipped.append(f"{key[0]}/{key[1]}")
+            continue
+
+        metrics = {}
+        base_latency = base_row["latency_ms"]
+        new_latency = candidate_row["latency_ms"]
+        p = None
+        if base_row["ops"] >= 2 and candidate_row["ops"] >= 2:
+            _, _, p = welch_test(
+                base_latency["mean"],
+                base_latency["stdev"],
+                base_row["ops"],
+                new_latency["mean"],
+                new_latency["stdev"],
+                candidate_row["ops"],
+            )
+        # (база, кандидат, p-значение, больше - лучше)
+        metrics["latency_mean_ms"] = (
+            base_latency["mean"],
+            new_latency["mean"],
+            p,
+            False,
+        )
+
+        base_runs = base_row.get("throughput_runs", [])
+        new_runs = candidate_row.get("throughput_runs", [])
+        p = None
+        if len(base_runs) >= 2 and len(new_runs) >= 2:
+            _, _, p = welch_test(
+                statistics.fmean(base_runs),
+                statistics.stdev(base_runs),
+                len(base_runs),
+                statistics.fmean(new_runs),
+                statistics.stdev(new_runs),
+                len(new_runs),
+            )
+        metrics["throughput_ops"] = (
+            base_row["throughput_ops"],
+            candidate_row["throughput_ops"],
+            p,
+            True,
+        )
+        metrics["peak_alloc_bytes"] = (
+            base_row["peak_alloc_bytes"],
+            candidate_row["peak_alloc_bytes"],
+            None,
+            False,
+        )
+
+        rows.append(
+            {
+                "scale": key[0],
+                "case": key[1],
+                "metrics": {
+                    name: {
+                        "baseline": base_value,
+                        "candidate": new_value,
+                        "change": _relative(base_value, new_value),
+                        "p_value": p,
+                        "verdict": _verdict(
+                            _relative(base_value, new_value) * (-1 if higher else 1),
+                            p,
+                            threshold,
+                            alpha,
+                        ),
+                    }
+                    for name, (base_value, new_value, p, higher) in metrics.items()
+                },
+            }
+        )
+
+    regressions = [
+        f"{row['scale']}/{row['case']}/{name}"
+        for row in rows
+        for name, metric in row["metrics"].items()
+        if metric["verdict"] == "regression"
+    ]
+    return {
+        "baseline": baseline.get("id"),
+        "candidate": candidate.get("id"),
+        "threshold": threshold,
+        "alpha": alpha,
+        "environment_differs": baseline.get("environment")
+        != candidate.get("environment"),
+        "rows": rows,
+        "skipped": skipped,
+        "regressions": regressions,
+    }
+
+
+def format_comparison(comparison: dict, baseline: dict, candidate: dict) -> str:
+    """
+    Результат сравнения для терминала
+    """
+    lines = [f"База: {comparison['baseline']}, кандидат: {comparison['candidate']}"]
+    base_env = baseline.get("environment") or {}
+    new_env = candidate.get("environment") or {}
+    for key in sorted(set(base_env) | set(new_env)):
+        if key != "commit" and base_env.get(key) != new_env.get(key):
+            lines.append(
+                f"ВНИМАНИЕ: окружение различается ({key}): "
+                f"{base_env.get(key)} -> {new_env.get(key)}"
+            )
+
+    labels = {
+        "ok": "",
+        "noise": "незначимо",
+        "regression": "РЕГРЕССИЯ",
+        "improvement": "улучшение",
+    }
+    lines.append(
+        f"{'Масштаб':<8} {'Сценарий':<16} {'Метрика':<17} {'База':>12} "
+        f"{'Кандидат':>12} {'Изм.':>8} {'p':>7}"
+    )
+    for row in comparison["rows"]:
+        for name, metric in row["metrics"].items():
+            p = metric["p_value"]
+            lines.append(
+                f"{row['scale']:<8} {row['case']:<16} {name:<17} "
+                f"{metric['baseline']:>12.4g} {metric['candidate']:>12.4g} "
+                f"{metric['change']:>+8.1%} {'-' if p is None else f'{p:.3f}':>7} "
+                f"{labels[metric['verdict']]}"
+            )
+    if comparison["skipped"]:
+        lines.append(
+            "Пропущены (разный размер набора данных): "
+            + ", ".join(comparison["skipped"])
+        )
+    if comparison["regressions"]:
+        lines.append(f"Регрессий: {len(comparison['regressions'])}.")
+    else:
+        lines.append("Регрессий нет.")
+    return "\n".join(lines)
@@ -0,0 +1,414 @@
+"""
+Бенчмарки сценариев использования на данных реалистичного масштаба.
+Каждый сценарий выполняется на своей копии набора данных и новом
+TradingEngine: первый вызов (с загрузкой данных) учитывается отдельно
+как cold_ms, остальные - в задержках и пропускной способности. Пиковая
+память измеряется tracemalloc в отдельном прогоне, чтобы трассировка не
+искажала задержки. Журнал операций на время замеров приглушается.
+"""
+
+import contextlib
+import io
+import logging
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable
+
+from valutatrade_hub import stats
+from valutatrade_hub.bench.dataset import (
+    BASE_RATES_USD,
+    BENCH_PASSWORD,
+    EPOCH,
+    DatasetSpec,
+    generate_dataset,
+    pair_universe,
+)
+from valutatrade_hub.core.engine import TradingEngine
+from valutatrade_hub.core.history import HistoryFile, convert_history, from_micros
+from valutatrade_hub.logging_config import LOGGER_NAME
+
+SCHEMA_VERSION = 2
+
+SCALES = {
+    "small": {"users": 1_000, "pairs": 10, "history": 1_000},
+    "medium": {"users": 100_000, "pairs": 1_000, "history": 100_000},
+    "large": {"users": 1_000_000, "pairs": 10_000, "history": 1_000_000},
+}
+# Сколько операций выполняется под tracemalloc для оценки пиковой памяти
+MEMORY_OPS = 10
+
+
+@dataclass
+class BenchContext:
+    """
+    Состояние одного прогона сценария
+    """
+
+    data_dir: Path
+    scale: dict
+    rng: random.Random
+    engine: TradingEngine | None = None
+    extra: dict = field(default_factory=dict)
+
+    def random_user_id(self) -> int:
+        return self.rng.randint(1, self.scale["users"])
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    op: Callable[[BenchContext, int], object]
+    setup: Callable[[BenchContext], None] | None = None
+
+
+CASES: dict[str, Case] = {}
+
+
+def case(name: str, setup: Callable[[BenchContext], None] | None = None):
+    """
+    Регистрирует операцию сценария: op(ctx, i) - i-й вызов
+    """
+
+    def decorator(op: Callable[[BenchContext, int], object]):
+        CASES[name] = Case(name, op, setup)
+        return op
+
+    return decorator
+
+
+# Сценарии
+
+
+def _engine_setup(ctx: BenchContext) -> None:
+    ctx.engine = TradingEngine(ctx.data_dir, rates_ttl=10**9)
+
+
+@case("register", _engine_setup)
+def _register(ctx: BenchContext, i: int):
+    return ctx.engine.register_user(f"bench{i}", BENCH_PASSWORD)
+
+
+@case("login", _engine_setup)
+def _login(ctx: BenchContext, i: int):
+    return ctx.engine.login_user(f"user{ctx.random_user_id()}", BENCH_PASSWORD)
+
+
+@case("buy", _engine_setup)
+def _buy(ctx: BenchContext, i: int):
+    return ctx.engine.buy(
+        user_id=ctx.random_user_id(),
+        currency_code="BTC",
+        amount=0.0001,
+        rate=BASE_RATES_USD["BTC"],
+    )
+
+
+@case("sell", _engine_setup)
+def _sell(ctx: BenchContext, i: int):
+    return ctx.engine.sell(
+        user_id=ctx.random_user_id(),
+        currency_code="BTC",
+        amount=0.0001,
+        rate=BASE_RATES_USD["BTC"],
+    )
+
+
+@case("get_rate", _engine_setup)
+def _get_rate(ctx: BenchContext, i: int):
+    return ctx.engine.get_rate(from_code="BTC", to_code="USD")
+
+
+@case("show_rates", _engine_setup)
+def _show_rates(ctx: BenchContext, i: int):
+    return list(ctx.engine.show_rates(top=10)["rates"])
+
+
+@case("portfolio", _engine_setup)
+def _portfolio(ctx: BenchContext, i: int):
+    return ctx.engine.get_portfolio_summary(ctx.random_user_id(), "USD")
+
+
+@case("history", _engine_setup)
+def _history(ctx: BenchContext, i: int):
+    return sum(1 for _ in ctx.engine.iter_history(pair="BTC_USD"))
+
+
+def _columnar_setup(ctx: BenchContext) -> None:
+    _engine_setup(ctx)
+    convert_history(
+        ctx.engine.config["HISTORY_FILE"], ctx.engine.config["HISTORY_COLUMNAR_FILE"]
+    )
+    # Узкий период: последние записи пары
+    with HistoryFile(ctx.engine.config["HISTORY_COLUMNAR_FILE"]) as history:
+        segment = history.segments.get("BTC_USD")
+        timestamps = segment.timestamps if segment else []
+        if len(timestamps):
+            ctx.extra["since"] = from_micros(timestamps[-min(len(timestamps), 10)])
+
+
+@case("history_columnar", _columnar_setup)
+def _history_columnar(ctx: BenchContext, i: int):
+    return sum(1 for _ in ctx.engine.iter_history(pair="BTC_USD"))
+
+
+@case("history_range", _columnar_setup)
+def _history_range(ctx: BenchContext, i: int):
+    since = ctx.extra.get("since")
+    return sum(1 for _ in ctx.engine.iter_history(pair="BTC_USD", since=since))
+
+
+class _StubProvider:
+    """
+    Провайдер курсов без сети: каждый вызов - новая отметка времени
+    """
+
+    def __init__(self, source: str, pairs: dict[str, float]) -> None:
+        self.source = source
+        self.pairs = pairs
+        self.calls = 0
+
+    def fetch_rates(self) -> dict:
+        self.calls += 1
+        # Полсекунды: id записей истории не совпадают с записями набора данных
+        updated_at = (
+            EPOCH + timedelta(seconds=self.calls, milliseconds=500)
+        ).isoformat()
+        return {
+            pair: {"rate": rate, "updated_at": updated_at, "source": self.source}
+            for pair, rate in self.pairs.items()
+        }
+
+
+def _updater_setup(ctx: BenchContext) -> None:
+    # RatesUpdater тянет за собой клиентов API (requests)
+    from valutatrade_hub.parser_service.config import ParserConfig
+    from valutatrade_hub.parser_service.storage import StorageUpdater
+    from valutatrade_hub.parser_service.updater import RatesUpdater
+
+    pairs = list(pair_universe(DatasetSpec(pairs=ctx.scale["pairs"])).items())
+    half = len(pairs) // 2
+    storage = StorageUpdater()
+    storage.cfg = ParserConfig(
+        RATES_FILE_PATH=str(ctx.data_dir / "rates.json"),
+        HISTORY_FILE_PATH=str(ctx.data_dir / "exchange_rates.json"),
+    )
+    ctx.engine = TradingEngine(ctx.data_dir, rates_ttl=10**9)
+    ctx.extra["updater"] = RatesUpdater(
+        _StubProvider("CoinGecko", dict(pairs[:half])),
+        _StubProvider("ExchangeRate-API", dict(pairs[half:])),
+        storage,
+        engine=ctx.engine,
+    )
+
+
+@case("run_update", _updater_setup)
+def _run_update(ctx: BenchContext, i: int):
+    with contextlib.redirect_stdout(io.StringIO()):
+        ctx.extra["updater"].run_update()
+
+
+# Запуск
+
+
+def _percentile(sorted_values: list[int], percent: float) -> int:
+    if not sorted_values:
+        return 0
+    rank = max(1, round(len(sorted_values) * percent / 100))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _prepare(spec: Case, base_dir: Path, work_dir: Path, scale: dict, seed: int):
+    data_dir = Path(tempfile.mkdtemp(prefix=f"{spec.name}-", dir=work_dir))
+    shutil.copytree(base_dir, data_dir, dirs_exist_ok=True)
+    ctx = BenchContext(data_dir, scale, random.Random(seed))
+    if spec.setup is not None:
+        spec.setup(ctx)
+    return ctx
+
+
+def _timed_run(
+    spec: Case,
+    base_dir: Path,
+    work_dir: Path,
+    scale: dict,
+    max_ops: int,
+    max_seconds: float,
+    seed: int,
+) -> tuple[int, list[int], int]:
+    """
+    Один прогон: (cold-вызов, задержки операций, общее время цикла) в нс
+    """
+    ctx = _prepare(spec, base_dir, work_dir, scale, seed)
+    try:
+        started = time.perf_counter_ns()
+        spec.op(ctx, 0)
+        cold_ns = time.perf_counter_ns() - started
+
+        latencies = []
+        deadline = time.perf_counter() + max_seconds
+        loop_started = time.perf_counter_ns()
+        for i in range(1, max_ops + 1):
+            started = time.perf_counter_ns()
+            spec.op(ctx, i)
+            latencies.append(time.perf_counter_ns() - started)
+            if time.perf_counter() >= deadline:
+                break
+        elapsed_ns = time.perf_counter_ns() - loop_started
+    finally:
+        shutil.rmtree(ctx.data_dir, ignore_errors=True)
+    return cold_ns, latencies, elapsed_ns
+
+
+def run_case(
+    spec: Case,
+    base_dir: Path,
+    work_dir: Path,
+    scale: dict,
+    max_ops: int,
+    max_seconds: float,
+    seed: int,
+    repeat: int = 1,
+) -> dict:
+    """
+    Замер одного сценария: cold-вызов, задержки, пропускная способность, память
+    При repeat > 1 сценарий повторяется на свежих копиях данных: задержки
+    объединяются, пропускная способность сохраняется по каждому прогону.
+    """
+    cold = []
+    latencies = []
+    throughputs = []
+    for _ in range(repeat):
+        cold_ns, run_latencies, elapsed_ns = _timed_run(
+            spec, base_dir, work_dir, scale, max_ops, max_seconds, seed
+        )
+        cold.append(cold_ns / 1e6)
+        latencies.extend(run_latencies)
+        throughputs.append(
+            len(run_latencies) / (elapsed_ns / 1e9) if elapsed_ns else 0.0
+        )
+
+    ctx = _prepare(spec, base_dir, work_dir, scale, seed)
+    tracemalloc.start()
+    try:
+        for i in range(min(MEMORY_OPS, max_ops + 1)):
+            spec.op(ctx, i)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        shutil.rmtree(ctx.data_dir, ignore_errors=True)
+
+    latencies.sort()
+    ops = len(latencies)
+    return {
+        "case": spec.name,
+        "ops": ops,
+        "repeat": repeat,
+        "cold_ms": statistics.fmean(cold),
+        "throughput_ops": statistics.fmean(throughputs),
+        "throughput_runs": throughputs,
+        "latency_ms": {
+            "mean": statistics.fmean(latencies) / 1e6 if ops else 0.0,
+            "stdev": statistics.stdev(latencies) / 1e6 if ops > 1 else 0.0,
+            "p50": _percentile(latencies, 50) / 1e6,
+            "p95": _percentile(latencies, 95) / 1e6,
+            "p99": _percentile(latencies, 99) / 1e6,
+            "max": (latencies[-1] if ops else 0) / 1e6,
+        },
+        "peak_alloc_bytes": peak,
+    }
+
+
+def run_suite(
+    scales: dict[str, dict],
+    cases: list[str] | None = None,
+    max_ops: int = 1000,
+    max_seconds: float = 5.0,
+    seed: int = 0,
+    repeat: int = 1,
+    work_dir: str | None = None,
+    progress: Callable[[str], None] | None = None,
+) -> dict:
+    """
+    Выполняет сценарии cases (по умолчанию все) на каждом масштабе scales
+    Возвращает отчёт в стабильном JSON-формате (см. SCHEMA_VERSION).
+    """
+    names = cases or list(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if repeat < 1:
+        raise ValueError("Число повторов должно быть больше 0")
+    if unknown:
+        raise ValueError(
+            f"Неизвестный сценарий '{unknown[0]}'. Доступны: {', '.join(CASES)}"
+        )
+
+    logger = logging.getLogger(LOGGER_NAME)
+    previous_level = logger.level
+    logger.setLevel(logging.WARNING)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(
+            prefix="valutatrade-bench-", dir=work_dir
+        ) as tmp:
+            tmp = Path(tmp)
+            for scale_name, scale in scales.items():
+                base_dir = tmp / f"dataset-{scale_name}"
+                if progress:
+                    progress(f"{scale_name}: подготовка набора данных {scale}")
+                generate_dataset(base_dir, DatasetSpec(seed=seed, **scale))
+                for name in names:
+                    if progress:
+                        progress(f"{scale_name}: {name}")
+                    result = run_case(
+                        CASES[name],
+                        base_dir,
+                        tmp,
+                        scale,
+                        max_ops,
+                        max_seconds,
+                        seed,
+                        repeat,
+                    )
+                    results.append({"scale": scale_name, **scale, **result})
+    finally:
+        logger.setLevel(previous_level)
+        # Замеры бенчмарка не смешиваются со статистикой приложения
+        stats.STATS.clear()
+
+    return {
+        "schema": SCHEMA_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "params": {
+            "max_ops": max_ops,
+            "max_seconds": max_seconds,
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def format_results(report: dict) -> str:
+    """
+    Таблица результатов для терминала
+    """
+    lines = [
+        f"{'Масштаб':<8} {'Сценарий':<16} {'Опер.':>6} {'Опер./с':>10} "
+        f"{'cold':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'Память':>10}",
+    ]
+    for row in report["results"]:
+        latency = row["latency_ms"]
+        lines.append(
+            f"{row['scale']:<8} {row['case']:<16} {row['ops']:>6} "
+            f"{row['throughput_ops']:>10.1f} {row['cold_ms']:>9.2f} "
+            f"{latency['p50']:>8.3f} {latency['p95']:>8.3f} {latency['p99']:>8.3f} "
+            f"{row['peak_alloc_bytes'] / 2**20:>8.1f}MB"
+        )
+    lines.append("Задержки и cold - в миллисекундах.")
+    return "\n".join(lines)
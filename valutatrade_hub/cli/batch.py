@@ -0,0 +1,66 @@
+"""
+Пакетный режим CLI: выполнение списка команд в одном процессе.
+Кэши (портфели, пользователи, таблица курсов) остаются загруженными
+между командами. Время каждой команды выводится в поток отчёта.
+"""
+
+import sys
+import time
+from typing import Iterable, TextIO
+
+from valutatrade_hub.cli.interface import execute_line
+
+
+def run_batch(
+    lines: Iterable[str], fail_fast: bool = False, report: TextIO = sys.stderr
+) -> int:
+    """
+    Выполняет команды построчно. Пустые строки и строки с '#' пропускаются,
+    'exit' завершает выполнение.
+    Возвращает код завершения: 0 - все команды успешны, 1 - были ошибки.
+    """
+    executed = 0
+    failed = 0
+    started = time.perf_counter()
+
+    for number, raw_line in enumerate(lines, start=1):
+        command_line = raw_line.strip()
+        if not command_line or command_line.startswith("#"):
+            continue
+        command = command_line.split()[0]
+        if command == "exit":
+            break
+
+        command_started = time.perf_counter()
+        ok = execute_line(command_line)
+        elapsed_ms = (time.perf_counter() - command_started) * 1000
+
+        executed += 1
+        if not ok:
+            failed += 1
+        # Аргументы не выводятся: в них могут быть пароли
+        print(
+            f"[{number}] {command} {'OK' if ok else 'ERROR'} {elapsed_ms:.2f} ms",
+            file=report,
+        )
+        if not ok and fail_fast:
+            print(f"Остановка на строке {number} (--fail-fast).", file=report)
+            break
+
+    total_ms = (time.perf_counter() - started) * 1000
+    print(
+        f"Выполнено команд: {executed}, ошибок: {failed}, "
+        f"общее время: {total_ms:.2f} ms",
+        file=report,
+    )
+    return 1 if failed else 0
+
+
+def run_script(path: str, fail_fast: bool = False) -> int:
+    """
+    Выполняет команды из файла; путь '-' означает стандартный ввод.
+    """
+    if path == "-":
+        return run_batch(sys.stdin, fail_fast)
+    with open(path, "r", encoding="utf-8") as f:
+        return run_batch(f, fail_fast)
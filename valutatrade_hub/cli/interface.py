@@ -1,220 +1,774 @@
-import hashlib
-import random
 import shlex
-import string
-from datetime import datetime
+from pathlib import Path
 
-import valutatrade_hub.parser_service.api_clients as api_clients
-import valutatrade_hub.parser_service.storage as storage
-import valutatrade_hub.parser_service.updater as updater
-
-
-from valutatrade_hub.core.utils import save_json, load_json
+from valutatrade_hub.core.currencies import CURRENCIES
 from valutatrade_hub.core.exceptions import (
     ApiRequestError,
     CurrencyNotFoundError,
+    QuoteExpiredError,
 )
-from valutatrade_hub.core.usecases import buy, get_rate, sell, show_rates
+from valutatrade_hub.core.ledger import PNL_METHODS
+from valutatrade_hub.core.orders import ORDER_KINDS, ORDER_SIDES
+from valutatrade_hub.core.utils import load_json, save_json
+from valutatrade_hub.cli.output import (
+    OUTPUT_FORMATS,
+    emit_error,
+    emit_record,
+    emit_records,
+)
+from valutatrade_hub.cli.registry import COMMANDS, Arg, CommandArgsError, command
 from valutatrade_hub.infra.settings import SettingsLoader
+from valutatrade_hub.service.protocol import ServiceError
 
 
 settings = SettingsLoader()
 
 USERS_FILE = settings.get("USERS_FILE")
 PORTFOLIOS_FILE = settings.get("PORTFOLIOS_FILE")
+# Токен текущей сессии CLI: переживает перезапуск процесса
+SESSION_FILE = settings.get("SESSION_FILE")
 
 CURRENT_USER: dict | None = None
+OUTPUT_FORMAT = "text"
+# Клиент сервиса: если задан, команды выполняются в нём, а не в этом процессе
+SERVICE = None
+
+
+def set_output_format(fmt: str) -> None:
+    """
+    Формат вывода по умолчанию: text, json или ndjson.
+    """
+    global OUTPUT_FORMAT
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Неизвестный формат вывода '{fmt}'")
+    OUTPUT_FORMAT = fmt
 
 
-def register(args: list[str]) -> None:
+def _error(message: str, error: BaseException | str = "ValueError") -> None:
+    """
+    Сообщение об ошибке команды в текущем формате вывода
+    error - исключение или тип ошибки для записи json/ndjson.
+    """
+    if isinstance(error, ServiceError):
+        # Тип исключения на стороне сервиса
+        error = error.type
+    elif isinstance(error, BaseException):
+        error = type(error).__name__
+    emit_error(message, error, OUTPUT_FORMAT)
+
+
+def connect_service(address: str | None = None) -> None:
+    """
+    Переводит CLI в режим тонкого клиента сервиса ValutaTrade.
+    """
+    from valutatrade_hub.service.client import ServiceClient
+
+    global SERVICE
+    SERVICE = ServiceClient(address or settings.get("SERVICE_ADDRESS"))
+
+
+def _saved_token() -> str | None:
+    return load_json(SESSION_FILE).get("token")
+
+
+def _ensure_current_user() -> bool:
+    """
+    Восстанавливает пользователя из сохранённой сессии, если вход не выполнен
+    в этом процессе. Проверяется только подпись и срок токена: users.json
+    не читается.
+    """
+    global CURRENT_USER
+    if CURRENT_USER is None and SERVICE is None:
+        token = _saved_token()
+        if token:
+            from valutatrade_hub.core.usecases import resolve_session
+
+            CURRENT_USER = resolve_session(token)
+    return CURRENT_USER is not None
+
+
+def _currency_arg(name: str, required: bool = False, default=None) -> Arg:
+    return Arg(
+        name,
+        required=required,
+        type=str.upper,
+        choices=CURRENCIES,
+        default=default,
+    )
+
+
+@command(
+    "register",
+    Arg("--username", required=True),
+    Arg("--password", required=True),
+    remote=True,
+)
+def register(options: dict) -> bool:
     """
     Метод регистрации нового пользователя.
     Принимает аргумент формата: register --username <str> --password <str>
     """
+    username = options["username"]
+    password = options["password"]
 
-    try:
-        args_dict = {}
-        for i in range(0, len(args), 2):
-            key, value = args[i], args[i + 1]
-            args_dict[key] = value
-    except (IndexError, ValueError):
-        print(
-            "Ошибка: неправильный формат. "
-            "Пример: register --username alice --password 1234"
-        )
-        return
+    # Проверка на ошибки
+    if not username.strip():
+        _error("Ошибка: имя пользователя не указано.")
+        return False
+    if len(password) <= 3:
+        _error("Ошибка: пароль должен быть не короче 4 символов.")
+        return False
 
-    username = args_dict.get("--username")
-    password = args_dict.get("--password")
+    try:
+        if SERVICE is not None:
+            SERVICE.call("register", username=username, password=password)
+        else:
+            from valutatrade_hub.core.usecases import register_user
 
-    # Проверка на ошибки
-    if not username:
-        print("Ошибка: имя пользователя не указано.")
-        return
-    if not password or len(password) <= 3:
-        print("Ошибка: пароль должен быть не короче 4 символов.")
-        return
-
-    users = load_json(USERS_FILE)
-
-    # Проверка на уникальность
-    if any(u["username"] == username for u in users):
-        print(f"Имя пользователя '{username}' уже занято.")
-        return
-
-    # Генерация id и соли
-    new_id = max((u["user_id"] for u in users), default=0) + 1
-    salt = "".join(random.choices(string.ascii_letters + string.digits, k=8))
-    hashed_password = hashlib.sha256((password + salt).encode()).hexdigest()
-
-    # Создание пользователя
-    user = {
-        "user_id": new_id,
-        "username": username,
-        "hashed_password": hashed_password,
-        "salt": salt,
-        "registration_date": datetime.now().isoformat(),
-    }
-    users.append(user)
-    save_json(USERS_FILE, users)
-
-    # Создание портфеля с начальным USD балансом
-    portfolios = load_json(PORTFOLIOS_FILE)
-    portfolios.append(
-        {
-            "user_id": new_id,
-            "wallets": {
-                "USD": {"currency_code": "USD", "balance": 1000.0}  # начальный баланс
-            },
-        }
-    )
-    save_json(PORTFOLIOS_FILE, portfolios)
+            register_user(username, password)
+    except ValueError as e:
+        _error(str(e), e)
+        return False
 
     # Сообщение об успешной регистрации
     print(
         f"Регистрация проведена успешно. Аккаунт {username} создан."
         f"Войдите: login --username {username} --password ****"
     )
+    return True
 
 
-def login(args: list[str]) -> None:
+@command(
+    "login",
+    Arg("--username", required=True),
+    Arg("--password", required=True),
+    remote=True,
+)
+def login(options: dict) -> bool:
     """
     Авторизация пользователя.
     Принимает аргумент формата: login --username <str> --password <str>
     """
+    username = options["username"]
+    password = options["password"]
 
+    global CURRENT_USER
     try:
-        args_dict = {}
-        for i in range(0, len(args), 2):
-            key, value = args[i], args[i + 1]
-            args_dict[key] = value
-    except (IndexError, ValueError):
+        if SERVICE is not None:
+            CURRENT_USER = SERVICE.call(
+                "login", username=username, password=password
+            )
+        else:
+            from valutatrade_hub.core.usecases import create_session, login_user
+
+            user = login_user(username, password)
+            save_json(SESSION_FILE, {"token": create_session(user)})
+            CURRENT_USER = {"user_id": user.user_id, "username": user.username}
+    except ValueError as e:
+        _error(str(e), e)
+        return False
+
+    # Сообщение об успехе
+    print(f"Вы вошли как '{username}'")
+    return True
+
+
+@command("logout", remote=True)
+def logout(options: dict) -> bool:
+    """
+    Завершение сессии: токен отзывается и удаляется.
+    """
+    global CURRENT_USER
+    if not _ensure_current_user():
+        _error("Вы не выполнили вход.", "LoginRequired")
+        return False
+
+    if SERVICE is not None:
+        SERVICE.call("logout")
+    else:
+        token = _saved_token()
+        if token:
+            from valutatrade_hub.core.usecases import revoke_session
+
+            revoke_session(token)
+        Path(SESSION_FILE).unlink(missing_ok=True)
+
+    print(f"Вы вышли из аккаунта '{CURRENT_USER['username']}'.")
+    CURRENT_USER = None
+    return True
+
+
+@command(
+    "show-portfolio",
+    _currency_arg("--base", default="USD"),
+    requires_login=True,
+    remote=True,
+)
+def show_portfolio(options: dict) -> bool:
+    """
+    Показывает портфель пользователя.
+    Пример: show-portfolio --base USD
+    """
+    base_currency = options["base"]
+
+    # Загрузка портфеля
+    if SERVICE is not None:
+        summary = SERVICE.call("portfolio", base=base_currency)
+    else:
+        from valutatrade_hub.core.usecases import get_portfolio_summary
+
+        summary = get_portfolio_summary(CURRENT_USER["user_id"], base_currency)
+
+    if OUTPUT_FORMAT != "text":
+        emit_record(summary)
+        return True
+
+    if summary is None or not summary["wallets"]:
+        print("У вас пока нет кошельков.")
+        return True
+
+    print(
+        f"Портфель пользователя '{CURRENT_USER['username']}' "
+        f"(база: {base_currency}):"
+    )
+
+    for wallet in summary["wallets"]:
         print(
-            "Ошибка: неправильный формат."
-            "Пример: login --username alice --password 1234"
+            f"- {wallet['currency']}: {wallet['balance']:.4f}  ->  "
+            f"{wallet['value']:.2f} {base_currency}"
         )
-        return
 
-    username = args_dict.get("--username")
-    password = args_dict.get("--password")
+    print("-" * 50)
+    print(f"ИТОГО: {summary['total']:,.2f} {base_currency}")
+    return True
 
-    if not username or not password:
-        print("Ошибка: укажите и имя пользователя, и пароль.")
-        return
 
-    # Загрузка пользователей ---
-    users = load_json(USERS_FILE)
-    user = next((u for u in users if u["username"] == username), None)
+def _trade(action: str, options: dict) -> dict | None:
+    """
+    Общая часть buy и sell: котировка и исполнение сделки.
+    Ошибки выводятся, в этом случае возвращается None.
+    """
+    currency = options["currency"]
+    try:
+        if SERVICE is not None:
+            return SERVICE.call(action, currency=currency, amount=options["amount"])
+        from valutatrade_hub.core import usecases
+
+        # Котировка фиксирует курс: сделка не запрашивает его повторно
+        quote = usecases.get_quote(currency, "USD")
+        return getattr(usecases, action)(
+            user_id=CURRENT_USER["user_id"],
+            currency_code=currency,
+            amount=options["amount"],
+            username=CURRENT_USER["username"],
+            currency=currency,
+            quote=quote,
+        )
+    except ValueError as e:
+        _error(f"Ошибка ввода: {e}", e)
+    except (CurrencyNotFoundError, QuoteExpiredError) as e:
+        _error(str(e), e)
+    except ApiRequestError as e:
+        _error(f"Не удалось получить курс: {e}", e)
+    return None
+
+
+@command(
+    "buy",
+    _currency_arg("--currency", required=True),
+    Arg("--amount", required=True, type=float),
+    requires_login=True,
+    remote=True,
+)
+def buy_command(options: dict) -> bool:
+    """
+    Покупка валюты за USD.
+    Пример: buy --currency BTC --amount 0.01
+    """
+    trade = _trade("buy", options)
+    if trade is None:
+        return False
+    if OUTPUT_FORMAT != "text":
+        emit_record(trade)
+    else:
+        print(
+            f"Покупка {options['amount']:.2f} {options['currency']} "
+            "успешно выполнена."
+        )
+    return True
 
-    if not user:
-        print(f"Пользователь '{username}' не найден.")
-        return
 
-    # Проверка пароля
-    hashed_input = hashlib.sha256((password + user["salt"]).encode()).hexdigest()
-    if hashed_input != user["hashed_password"]:
-        print("Неверный пароль.")
-        return
+@command(
+    "sell",
+    _currency_arg("--currency", required=True),
+    Arg("--amount", required=True, type=float),
+    requires_login=True,
+    remote=True,
+)
+def sell_command(options: dict) -> bool:
+    """
+    Продажа валюты за USD.
+    Пример: sell --currency BTC --amount 0.01
+    """
+    # Проверка кошелька реализована внутри метода sell
+    trade = _trade("sell", options)
+    if trade is None:
+        return False
+    if OUTPUT_FORMAT != "text":
+        emit_record(trade)
+    else:
+        print(
+            f"Продажа {options['amount']:.4f} {options['currency']} "
+            "успешно выполнена."
+        )
+    return True
 
-    # Сообщение об успехе
-    print(f"Вы вошли как '{username}'")
 
-    global CURRENT_USER
-    CURRENT_USER = user
+@command(
+    "get-rate",
+    _currency_arg("--from", required=True),
+    _currency_arg("--to", required=True),
+    remote=True,
+)
+def get_rate_command(options: dict) -> bool:
+    """
+    Курс одной валюты к другой.
+    Пример: get-rate --from BTC --to USD
+    """
+    from_curr, to_curr = options["from"], options["to"]
+    try:
+        if SERVICE is not None:
+            record = SERVICE.call("get_rate", from_code=from_curr, to_code=to_curr)
+        else:
+            from valutatrade_hub.core.usecases import get_rate
+
+            rate, updated_at = get_rate(from_code=from_curr, to_code=to_curr)
+            record = {
+                "pair": f"{from_curr}_{to_curr}",
+                "rate": rate,
+                "updated_at": updated_at,
+            }
+    except ApiRequestError as e:
+        _error(f"Ошибка API: {e}. Повторите попытку позже.", e)
+        return False
+
+    if OUTPUT_FORMAT != "text":
+        emit_record(record)
+    else:
+        print(
+            f"Курс {from_curr}→{to_curr}: {record['rate']:.8f} "
+            f"(обновлено: {record['updated_at']})"
+        )
+    return True
 
 
-def show_portfolio(args: list[str]) -> None:
+@command("update-rates", Arg("--source", default=""))
+def update_rates(options: dict) -> bool:
     """
-    Показывает портфель пользователя.
-    Пример: show-portfolio --base USD
+    Обновление курсов из внешних API.
+    Пример: update-rates --source coingecko
     """
-    global CURRENT_USER
+    # Клиенты API тянут за собой requests - импортируем только здесь,
+    # чтобы остальные команды запускались без этих затрат
+    from valutatrade_hub.parser_service.api_clients import (
+        CoinGeckoClient,
+        ExchangeRateApiClient,
+    )
+    from valutatrade_hub.parser_service.storage import StorageUpdater
+    from valutatrade_hub.parser_service.updater import RatesUpdater
+
+    updater_service = RatesUpdater(
+        CoinGeckoClient(),
+        ExchangeRateApiClient(),
+        StorageUpdater(),
+        options["source"],
+    )
+    updater_service.run_update()
+    return True
 
-    # Проверка входа
-    if not CURRENT_USER:
-        print("Сначала выполните login.")
-        return
 
-    base_currency = "USD"
-    if "--base" in args:
-        try:
-            base_currency = args[args.index("--base") + 1].upper()
-        except IndexError:
-            print("Ошибка: не указана базовая валюта после --base.")
-            return
+@command(
+    "show-rates",
+    Arg("--currency"),
+    Arg("--base"),
+    Arg("--top"),
+    remote=True,
+)
+def print_rates(options: dict) -> bool:
+    """
+    Выводит курсы валют в текущем формате вывода.
+    Пример: show-rates --base USD --top 3
+    """
+    try:
+        if SERVICE is not None:
+            result = SERVICE.call("show_rates", **options)
+        else:
+            from valutatrade_hub.core.usecases import show_rates
+
+            result = show_rates(**options)
+    except ValueError as e:
+        _error(f"Ошибка: {e}", e)
+        return False
+
+    if OUTPUT_FORMAT != "text":
+        emit_records(result["rates"], OUTPUT_FORMAT)
+        return True
+
+    if not result["total_pairs"]:
+        print("Кэш валют пуст. Воспользуйтесь командой 'update-rates'.")
+        return True
+    if not result["count"]:
+        print("Нет курсов, соответствующих фильтрам.")
+        return True
+
+    print(f"Курсы валют (всего: {result['count']}):")
+    print()
+    for record in result["rates"]:
+        print(f"{record['from']} → {record['to']}: {record['rate']:.7f}")
+    print(f"Последнее обновление кэша: {result['last_refresh'] or 'неизвестно'}")
+    return True
+
+
+@command(
+    "place-order",
+    _currency_arg("--currency", required=True),
+    Arg("--side", required=True, type=str.lower, choices=ORDER_SIDES),
+    Arg("--type", type=str.lower, choices=ORDER_KINDS, default="limit"),
+    Arg("--amount", required=True, type=float),
+    Arg("--price", required=True, type=float),
+    requires_login=True,
+)
+def place_order_command(options: dict) -> bool:
+    """
+    Выставление отложенной заявки.
+    Пример: place-order --currency BTC --side buy --type limit
+    --amount 0.01 --price 90000
+    """
+    from valutatrade_hub.core.usecases import place_order
 
-    # Проверка известной валюты
-    known_currencies = ["USD", "EUR", "BTC", "ETH", "RUB"]
-    if base_currency not in known_currencies:
-        print(f"Неизвестная базовая валюта '{base_currency}'.")
-        return
+    currency = options["currency"]
+    try:
+        order = place_order(
+            user_id=CURRENT_USER["user_id"],
+            currency_code=currency,
+            side=options["side"],
+            kind=options["type"],
+            amount=options["amount"],
+            price=options["price"],
+            username=CURRENT_USER["username"],
+            currency=currency,
+            rate=options["price"],
+        )
+    except (ValueError, CurrencyNotFoundError) as e:
+        _error(f"Ошибка: {e}", e)
+        return False
 
-    # Загрузка портфеля
-    portfolios = load_json(PORTFOLIOS_FILE)
+    print(
+        f"Заявка #{order.order_id} выставлена: {order.side} {order.kind} "
+        f"{order.amount} {order.currency_code} @ {order.price} USD"
+    )
+    return True
+
+
+@command("cancel-order", Arg("--id", required=True, type=int), requires_login=True)
+def cancel_order_command(options: dict) -> bool:
+    """
+    Отмена отложенной заявки.
+    Пример: cancel-order --id 3
+    """
+    from valutatrade_hub.core.usecases import cancel_order
+
+    order_id = options["id"]
+    try:
+        cancel_order(CURRENT_USER["user_id"], order_id)
+    except ValueError as e:
+        _error(f"Ошибка: {e}", e)
+        return False
+    print(f"Заявка #{order_id} отменена.")
+    return True
+
+
+@command("show-orders", requires_login=True)
+def show_orders(options: dict) -> bool:
+    """
+    Показывает отложенные заявки пользователя.
+    """
+    from valutatrade_hub.core.usecases import list_orders
+
+    orders = list_orders(CURRENT_USER["user_id"])
+    if OUTPUT_FORMAT != "text":
+        emit_records((order.to_dict() for order in orders), OUTPUT_FORMAT)
+        return True
+
+    if not orders:
+        print("У вас нет отложенных заявок.")
+        return True
 
-    portfolio = next(
-        (p for p in portfolios if p["user_id"] == CURRENT_USER["user_id"]),
-        None,
+    print(f"Отложенные заявки (всего: {len(orders)}):")
+    for order in orders:
+        print(
+            f"#{order.order_id} {order.side} {order.kind} "
+            f"{order.amount} {order.currency_code} @ {order.price} USD "
+            f"(создана: {order.created_at})"
+        )
+    return True
+
+
+@command(
+    "show-pnl",
+    Arg("--method", type=str.lower, choices=PNL_METHODS, default="fifo"),
+    requires_login=True,
+)
+def show_pnl(options: dict) -> bool:
+    """
+    Показывает прибыль и убыток по сделкам пользователя.
+    Пример: show-pnl --method avg
+    """
+    from valutatrade_hub.core.usecases import get_pnl
+
+    pnl = get_pnl(CURRENT_USER["user_id"], options["method"])
+
+    if OUTPUT_FORMAT != "text":
+        emit_record(pnl)
+        return True
+
+    if not pnl["positions"]:
+        print("Сделок пока не было.")
+        return True
+
+    print(
+        f"P&L пользователя '{CURRENT_USER['username']}' "
+        f"(метод: {pnl['method']}):"
     )
+    for row in pnl["positions"]:
+        unrealized = (
+            "нет свежего курса"
+            if row["unrealized"] is None
+            else f"{row['unrealized']:+.2f} USD"
+        )
+        print(
+            f"- {row['currency']}: {row['qty']:.8f}  "
+            f"себестоимость {row['cost_basis']:.2f} USD, "
+            f"нереализ. {unrealized}, "
+            f"реализ. {row['realized']:+.2f} USD"
+        )
+    print("-" * 50)
+    print(
+        f"ИТОГО: реализованный {pnl['realized']:+,.2f} USD, "
+        f"нереализованный {pnl['unrealized']:+,.2f} USD"
+    )
+    if pnl["unpriced"]:
+        print(
+            f"Без оценки (нет свежего курса): {', '.join(pnl['unpriced'])}. "
+            "Обновите курсы командой update-rates."
+        )
+    return True
 
-    if not portfolio or not portfolio["wallets"]:
-        print("У вас пока нет кошельков.")
-        return
 
-    exchange_rates = {
-        "USD": 1.0,
-        "EUR": 1.07,
-        "BTC": 59337.21,
-        "ETH": 3720.00,
-        "RUB": 0.01016,
-    }
+@command("show-history", Arg("--pair"), Arg("--since"), Arg("--until"))
+def show_history(options: dict) -> bool:
+    """
+    Показывает историю курсов.
+    Пример: show-history --pair BTC_USD --since 2026-01-01 --until 2026-02-01
+    """
+    from valutatrade_hub.core.usecases import iter_history
+
+    try:
+        records = iter_history(
+            pair=options["pair"], since=options["since"], until=options["until"]
+        )
+        if OUTPUT_FORMAT != "text":
+            emit_records(records, OUTPUT_FORMAT)
+            return True
+
+        count = 0
+        for record in records:
+            print(
+                f"{record['timestamp']} {record['pair']}: {record['rate']:.8f} "
+                f"({record['source']})"
+            )
+            count += 1
+    except ValueError as e:
+        _error(f"Ошибка: {e}", e)
+        return False
+
+    if not count:
+        print("Нет записей истории, соответствующих фильтрам.")
+    return True
+
+
+@command("convert-history", Arg("--source"), Arg("--target"))
+def convert_history_command(options: dict) -> bool:
+    """
+    Строит колоночный файл истории курсов из exchange_rates.json.
+    Пример: convert-history --target data/exchange_rates.vth
+    """
+    from valutatrade_hub.core.history import convert_history
+    from valutatrade_hub.core.usecases import history_path
 
-    total_value = 0.0
+    source = options["source"] or history_path()
+    target = options["target"] or settings.get("HISTORY_COLUMNAR_FILE")
+    try:
+        summary = convert_history(source, target)
+    except (OSError, ValueError) as e:
+        _error(f"Ошибка: {e}", e)
+        return False
 
     print(
-        f"Портфель пользователя '{CURRENT_USER['username']}' "
-        f"(база: {base_currency}):"
+        f"История сохранена в {target}: записей {summary['records']}, "
+        f"пар {summary['pairs']}, пропущено {summary['skipped']}."
     )
+    return True
 
-    for code, data in portfolio["wallets"].items():
-        balance = data.get("balance", 0.0)
-        rate = exchange_rates.get(code, 0)
-        base_rate = exchange_rates.get(base_currency, 1)
-        value_in_base = (balance * rate) / base_rate if base_rate != 0 else 0
 
-        print(f"- {code}: {balance:.4f}  ->  {value_in_base:.2f} {base_currency}")
-        total_value += value_in_base
+@command(
+    "import-rates",
+    Arg("--file", required=True),
+    # Формат проверяет import_history: модуль импорта не грузится при старте
+    Arg("--input-format", type=str.lower),
+    Arg("--source"),
+    Arg("--chunk-size", type=int),
+)
+def import_rates_command(options: dict) -> bool:
+    """
+    Импортирует исторические курсы из CSV или NDJSON в историю курсов.
+    Пример: import-rates --file rates_2025.csv --source ecb
+    """
+    from valutatrade_hub.core.usecases import import_rates
 
-    print("-" * 50)
-    print(f"ИТОГО: {total_value:,.2f} {base_currency}")
+    extra = {}
+    if options["chunk_size"]:
+        extra["chunk_size"] = options["chunk_size"]
+    try:
+        summary = import_rates(
+            options["file"],
+            fmt=options["input_format"],
+            source=options["source"],
+            **extra,
+        )
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        _error(f"Ошибка: {e}", e)
+        return False
+
+    per_minute = summary["read"] / summary["seconds"] * 60 if summary["seconds"] else 0
+    print(
+        f"Импортировано записей: {summary['imported']} из {summary['read']}, "
+        f"дубликатов {summary['duplicates']}, с ошибками {summary['invalid']} "
+        f"({per_minute:,.0f} записей/мин)."
+    )
+    for number, reason in summary["errors"]:
+        print(f"WARNING: запись {number}: {reason}.")
+    if summary["imported"] and Path(settings.get("HISTORY_COLUMNAR_FILE")).exists():
+        print("Колоночный файл истории устарел: обновите его командой convert-history.")
+    return True
 
 
-def show_help():
+@command("compress-data")
+def compress_data(options: dict) -> bool:
+    """
+    Переводит историю курсов, журналы сделок и состояния P&L в режим
+    сжатия VALUTATRADE_COMPRESSION (none, gzip, lzma или zstd).
+    Пример: compress-data (при VALUTATRADE_COMPRESSION=gzip)
+    """
+    from valutatrade_hub.core.usecases import compress_storage
+
+    try:
+        summary = compress_storage()
+    except (OSError, ValueError) as e:
+        _error(f"Ошибка: {e}", e)
+        return False
+
+    mode = settings.get("DATA_COMPRESSION") or "без сжатия"
+    print(
+        f"Режим хранения: {mode}. Переписано файлов: история "
+        f"{summary['history']}, журналы {summary['journals']}, "
+        f"состояния P&L {summary['states']}."
+    )
+    return True
+
+
+@command("stats")
+def show_stats(options: dict) -> bool:
+    """
+    Показывает задержки операций (p50/p95/p99), ошибки и попадания в кэши.
+    Учитываются завершённые процессы (logs/stats.json) и текущий.
+    """
+    from valutatrade_hub.stats import current_stats
+
+    report = current_stats().report()
+    if OUTPUT_FORMAT != "text":
+        emit_record(report)
+        return True
+
+    if not report["actions"] and not report["cache"]:
+        print("Статистика пока не собрана.")
+        return True
+
+    if report["actions"]:
+        print(
+            f"{'Операция':<12} {'Вызовов':>8} {'Среднее':>9} {'p50':>9} "
+            f"{'p95':>9} {'p99':>9} {'Макс.':>9}  (мс)"
+        )
+        for action, row in report["actions"].items():
+            print(
+                f"{action:<12} {row['count']:>8} {row['mean_ms']:>9.3f} "
+                f"{row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f} "
+                f"{row['p99_ms']:>9.3f} {row['max_ms']:>9.3f}"
+            )
+    if report["errors"]:
+        print("Ошибки:")
+        for key, count in report["errors"].items():
+            print(f"- {key}: {count}")
+    if report["cache"]:
+        print("Кэши:")
+        for name, row in report["cache"].items():
+            print(
+                f"- {name}: попаданий {row['hit']}, промахов {row['miss']} "
+                f"({row['hit_ratio']:.1%})"
+            )
+    return True
+
+
+@command("metrics", Arg("--out"))
+def show_metrics(options: dict) -> bool:
+    """
+    Выводит метрики процесса в текстовом формате Prometheus
+    или записывает их в файл.
+    Пример: metrics --out logs/metrics.prom
+    """
+    from valutatrade_hub import metrics
+    from valutatrade_hub.core.usecases import get_engine
+
+    # Метрики движка (возраст курсов, заявки, объём данных) собираются при
+    # экспорте: движок по умолчанию должен быть создан
+    get_engine()
+    if options["out"]:
+        metrics.write_metrics(options["out"])
+        print(f"Метрики записаны в {options['out']}.")
+        return True
+    print(metrics.REGISTRY.render(), end="")
+    return True
+
+
+@command("reset-stats")
+def reset_stats_command(options: dict) -> bool:
+    """
+    Удаляет накопленную статистику операций.
+    """
+    from valutatrade_hub.stats import reset_stats
+
+    reset_stats()
+    print("Статистика операций сброшена.")
+    return True
+
+
+@command("help", remote=True)
+def show_help(options: dict | None = None) -> bool:
     print(
         "Вызов команд:\n"
         "<command> <--argument1> <input> <--argument2> <input> ...\n"
         "\n"
-        "Поддерживаемые коды валют: USD, EUR, RUB, BTC, ETH.\n"
+        f"Поддерживаемые коды валют: {', '.join(CURRENCIES.codes)}.\n"
         "\n"
         "Список команд:\n"
         "\n"
@@ -227,6 +781,9 @@ def show_help():
         "Обязательные аргументы:\n"
         "--username <name> - имя пользователя.\n"
         "--password <pass> - пароль.\n"
+        "Вход сохраняется между запусками до истечения сессии или logout.\n"
+        "\n"
+        "- logout - выйти из аккаунта и завершить сессию.\n"
         "\n"
         "- show-portfolio <--argument> <input> - информация о ваших кошельках. "
         "Требует авторизации.\n"
@@ -262,9 +819,124 @@ def show_help():
         "Необязательные аргументы:\n"
         "--source <api> - один из сервисов API (coingecko или exchangerate). "
         "Если не указывать, будут задействованы оба сервиса.\n"
+        "После обновления исполняются сработавшие отложенные заявки.\n"
+        "\n"
+        "- place-order <--argument> <input> - выставить отложенную заявку к USD. "
+        "Требует авторизации.\n"
+        "Обязательные аргументы:\n"
+        "--currency <currency> - код валюты (например: BTC).\n"
+        "--side <buy|sell> - покупка или продажа.\n"
+        "--amount <value> - объем заявки в штуках.\n"
+        "--price <value> - цена срабатывания в USD.\n"
+        "Необязательные аргументы:\n"
+        "--type <limit|stop> - лимитная (по умолчанию) или стоп-заявка.\n"
+        "\n"
+        "- cancel-order --id <number> - отменить отложенную заявку.\n"
+        "\n"
+        "- show-orders - показать ваши отложенные заявки.\n"
+        "\n"
+        "- show-pnl <--argument> <input> - прибыль и убыток по сделкам. "
+        "Требует авторизации.\n"
+        "Необязательные аргументы:\n"
+        "--method <fifo|avg> - метод учёта себестоимости (по умолчанию fifo).\n"
+        "\n"
+        "- show-history <--argument> <input> - история курсов.\n"
+        "Необязательные аргументы:\n"
+        "--pair <pair> - валютная пара (например: BTC_USD).\n"
+        "--since <time>, --until <time> - границы периода в ISO-формате.\n"
+        "\n"
+        "- convert-history <--argument> <input> - колоночный файл истории.\n"
+        "Необязательные аргументы:\n"
+        "--source <path> - файл истории JSON (по умолчанию из настроек).\n"
+        "--target <path> - колоночный файл (по умолчанию из настроек).\n"
+        "\n"
+        "- import-rates <--argument> <input> - импорт исторических курсов.\n"
+        "Обязательные аргументы:\n"
+        "--file <path> - CSV с заголовком (pair или from_currency/to_currency,\n"
+        "rate, timestamp, source) или NDJSON с теми же полями.\n"
+        "Необязательные аргументы:\n"
+        "--input-format <csv|ndjson> - формат файла (по умолчанию по расширению).\n"
+        "--source <name> - источник для записей без своего (import).\n"
+        "--chunk-size <value> - записей в пачке обработки.\n"
+        "Записи с уже известной парой и временем пропускаются.\n"
+        "\n"
+        "- compress-data - перевести историю, журналы и состояния P&L в режим\n"
+        "сжатия VALUTATRADE_COMPRESSION (none, gzip, lzma, zstd).\n"
+        "- stats - задержки операций (p50/p95/p99), ошибки и попадания в кэши.\n"
+        "- reset-stats - сбросить накопленную статистику.\n"
+        "- metrics [--out <file>] - метрики в формате Prometheus (или запись\n"
+        "в файл для textfile-коллектора).\n"
+        "\n"
+        "Любая команда принимает --format <text|json|ndjson> - формат вывода.\n"
         "\n"
         "- exit - выход."
     )
+    return True
+
+
+def dispatch(command: str, args: list[str]) -> bool:
+    """
+    Выполняет одну команду. Возвращает False, если команда завершилась ошибкой.
+    Аргумент --format <text|json|ndjson> меняет формат вывода для этой команды.
+    """
+    global OUTPUT_FORMAT
+
+    if "--format" in args:
+        position = args.index("--format")
+        fmt = args[position + 1] if position + 1 < len(args) else ""
+        if fmt not in OUTPUT_FORMATS:
+            _error(
+                f"Ошибка: формат вывода должен быть одним из {OUTPUT_FORMATS}.",
+                "CommandArgsError",
+            )
+            return False
+        args = args[:position] + args[position + 2 :]
+
+        previous_format, OUTPUT_FORMAT = OUTPUT_FORMAT, fmt
+        try:
+            return dispatch(command, args)
+        finally:
+            OUTPUT_FORMAT = previous_format
+
+    spec = COMMANDS.get(command)
+    if spec is None:
+        _error(f"Неизвестная команда: {command}", "UnknownCommand")
+        return False
+
+    if SERVICE is not None and not spec.remote:
+        _error(
+            f"Команда '{command}' недоступна в режиме клиента сервиса.",
+            "CommandUnavailable",
+        )
+        return False
+
+    try:
+        options = spec.parse(args)
+    except CommandArgsError as e:
+        _error(f"Ошибка: {e}", e)
+        return False
+
+    # Проверка входа
+    if spec.requires_login and not _ensure_current_user():
+        _error("Сначала выполните login.", "LoginRequired")
+        return False
+
+    from valutatrade_hub import profiling
+
+    return profiling.run(command, spec.handler, options) is not False
+
+
+def execute_line(command_line: str) -> bool:
+    """
+    Разбирает и выполняет строку команды.
+    Исключения команды перехватываются и выводятся как ошибка.
+    """
+    try:
+        parts = shlex.split(command_line)
+        return dispatch(parts[0], parts[1:])
+    except Exception as e:
+        _error(f"Ошибка: {e}", e)
+        return False
 
 
 def run_cli() -> None:
@@ -277,235 +949,11 @@ def run_cli() -> None:
             if not command_line:
                 continue
 
-            parts = shlex.split(command_line)
-            command, args = parts[0], parts[1:]
-
-            if command == "exit":
+            if command_line.split()[0] == "exit":
                 print("Выход из программы...")
                 break
 
-            elif command == "help":
-                show_help()
-
-            elif command == "register":
-                register(args)
-
-            elif command == "login":
-                login(args)
-
-            elif command == "show-portfolio":
-                show_portfolio(args)
-
-            elif command == "buy":
-
-                try:
-                    args_dict = {}
-                    i = 0
-                    while i < len(args):
-                        if args[i].startswith("--"):
-                            key = args[i]
-                            if i + 1 < len(args) and not args[i + 1].startswith("--"):
-                                args_dict[key] = args[i + 1]
-                                i += 2
-                            else:
-                                args_dict[key] = True
-                                i += 1
-                        else:
-                            i += 1
-
-                    currency = args_dict.get("--currency")
-                    amount_str = args_dict.get("--amount")
-
-                    if not currency:
-                        print("Ошибка: укажите валюту через --currency")
-                        continue
-
-                    if not amount_str:
-                        print("Ошибка: укажите количество через --amount")
-                        continue
-
-                    try:
-                        amount = float(amount_str)
-                    except ValueError:
-                        print(
-                            f"Ошибка: количество должно быть числом, получено '{amount_str}'"
-                        )
-                        continue
-
-                    # Проверка логина
-                    if not CURRENT_USER:
-                        print("Сначала выполните login.")
-                        continue
-
-                    # Проверка валюты
-                    known_currencies = ["USD", "EUR", "BTC", "ETH", "RUB"]
-                    if currency.upper() not in known_currencies:
-                        print(f"Неизвестная базовая валюта '{currency}'.")
-                        continue
-
-                    rate = None
-
-                    if rate is None:
-                        rate, _ = get_rate(
-                            from_code=currency.upper(),
-                            to_code="USD",
-                            user_id=CURRENT_USER["user_id"],
-                            currency_code=currency.upper(),
-                            amount=amount,
-                            username=CURRENT_USER["username"],
-                            currency=currency.upper(),
-                            rate=rate,
-                        )
-
-                    buy(
-                        user_id=CURRENT_USER["user_id"],
-                        currency_code=currency.upper(),
-                        amount=amount,
-                        username=CURRENT_USER["username"],
-                        currency=currency.upper(),
-                        rate=rate,
-                    )
-
-                    print(f"Покупка {amount:.2f} {currency} успешно выполнена.")
-
-                except ValueError as e:
-                    print(f"Ошибка ввода: {e}")
-                except CurrencyNotFoundError as e:
-                    print(str(e))
-                except ApiRequestError as e:
-                    print(f"Не удалось получить курс: {e}")
-                except Exception as e:
-                    print(f"Неожиданная ошибка: {e}")
-
-            elif command == "sell":
-                try:
-                    args_dict = {args[i]: args[i + 1] for i in range(0, len(args), 2)}
-                    currency = args_dict.get("--currency")
-                    amount = float(args_dict.get("--amount", 0))
-
-                    # Проверка логина
-                    if not CURRENT_USER:
-                        print("Сначала выполните login.")
-                        continue
-
-                    # Проверка валюты
-                    known_currencies = ["USD", "EUR", "BTC", "ETH", "RUB"]
-                    if currency not in known_currencies:
-                        print(f"Неизвестная базовая валюта '{currency}'.")
-                        continue
-
-                    rate = None
-
-                    if rate is None:
-                        rate, _ = get_rate(
-                            from_code=currency.upper(),
-                            to_code="USD",
-                            user_id=CURRENT_USER["user_id"],
-                            currency_code=currency.upper(),
-                            amount=amount,
-                            username=CURRENT_USER["username"],
-                            currency=currency.upper(),
-                            rate=rate,
-                        )
-
-                    # Проверка кошелька реализована внутри метода sell
-                    sell(
-                        user_id=CURRENT_USER["user_id"],
-                        currency_code=currency.upper(),
-                        amount=amount,
-                        username=CURRENT_USER["username"],
-                        currency=currency.upper(),
-                        rate=rate,
-                    )
-                    print(f"Продажа {amount:.4f} {currency} успешно выполнена.")
-
-                except ValueError as e:
-                    print(f"Ошибка ввода: {e}")
-                except CurrencyNotFoundError as e:
-                    print(str(e))
-                except ApiRequestError as e:
-                    print(f"Не удалось получить курс: {e}")
-                except Exception as e:
-                    print(f"Неожиданная ошибка: {e}")
-
-            elif command == "get-rate":
-                try:
-                    args_dict = {args[i]: args[i + 1] for i in range(0, len(args), 2)}
-                    from_curr = args_dict.get("--from")
-                    to_curr = args_dict.get("--to")
-
-                    if not from_curr or not to_curr:
-                        print("Ошибка: укажите валюты через --from и --to.")
-                        continue
-
-                    rate, updated_at = get_rate(from_code=from_curr, to_code=to_curr)
-                    print(
-                        f"Курс {from_curr}→{to_curr}: {rate:.8f} "
-                        f"(обновлено: {updated_at})"
-                    )
-
-                except ApiRequestError as e:
-                    print(f"Ошибка API: {e}. Повторите попытку позже.")
-                except Exception as e:
-                    print(f"Неожиданная ошибка: {e}")
-
-            elif command == "update-rates":
-                input_source = ""
-                special_args = ["--source"]
-                for i in range(1, len(args)):
-                    if i % 2 == 0 and args[i - 1] not in special_args:
-                        raise IOError(
-                            args[i - 1] + " " + args[i] + ". "
-                            "Чтобы получить справку, вызовите 'help'."
-                        )
-                    elif args[i - 1] in special_args and args[i] not in special_args:
-                        match args[i - 1]:
-                            case "--source":
-                                input_source = args[i]
-                                special_args.remove("--source")
-                    elif args[i - 1] in special_args and args[i] in special_args:
-                        raise IOError(
-                            args[i - 1] + " " + args[i] + ". "
-                            "Чтобы получить справку, вызовите 'help'."
-                        )
-                crypto_service = api_clients.CoinGeckoClient()
-                fiat_service = api_clients.ExchangeRateApiClient()
-                storage_service = storage.StorageUpdater()
-                updater_service = updater.RatesUpdater(
-                    crypto_service, fiat_service, storage_service, input_source
-                )
-                updater_service.run_update()
-            elif command == "show-rates":
-                input_currency = None
-                input_top = None
-                input_base = None
-                special_args = ["--currency", "--top", "--base"]
-                for i in range(1, len(args)):
-                    if i % 2 == 0 and args[i - 1] not in special_args:
-                        raise IOError(
-                            args[i - 1] + " " + args[i] + ". "
-                            "Чтобы получить справку, вызовите 'help'."
-                        )
-                    elif args[i - 1] in special_args and args[i] not in special_args:
-                        match args[i - 1]:
-                            case "--currency":
-                                input_currency = args[i]
-                                special_args.remove("--currency")
-                            case "--top":
-                                input_top = args[i]
-                                special_args.remove("--top")
-                            case "--base":
-                                input_base = args[i]
-                                special_args.remove("--base")
-                    elif args[i - 1] in special_args and args[i] in special_args:
-                        raise IOError(
-                            args[i - 1] + " " + args[i] + ". "
-                            "Чтобы получить справку, вызовите 'help'."
-                        )
-                show_rates(input_currency, input_top, input_base)
-
-            else:
-                print(f"Неизвестная команда: {command}")
+            execute_line(command_line)
 
         except (KeyboardInterrupt, EOFError):
             print("\nВыход из программы.")
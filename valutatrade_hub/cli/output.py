@@ -0,0 +1,62 @@
+"""
+Машиночитаемый вывод CLI.
+- json - один JSON-документ на команду (списки - массивом);
+- ndjson - по одной JSON-записи в строке.
+Списки записей сериализуются потоково, по одной записи за раз. Ошибки
+команд в этих форматах - тоже записи: {"error": сообщение, "type": тип}.
+"""
+
+import json
+import sys
+from typing import Any, Iterable, TextIO
+
+OUTPUT_FORMATS = ("text", "json", "ndjson")
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def emit_record(record: Any, stream: TextIO | None = None) -> None:
+    """
+    Выводит один объект (в json и ndjson одинаково - одной строкой)
+    """
+    stream = stream or sys.stdout
+    stream.write(_dumps(record) + "\n")
+
+
+def emit_error(
+    message: str, error_type: str, fmt: str, stream: TextIO | None = None
+) -> None:
+    """
+    Выводит ошибку команды: в text - строкой, иначе - записью
+    {"error": message, "type": error_type}
+    """
+    stream = stream or sys.stdout
+    if fmt == "text":
+        stream.write(message + "\n")
+    else:
+        stream.write(_dumps({"error": message, "type": error_type}) + "\n")
+
+
+def emit_records(
+    records: Iterable[Any], fmt: str, stream: TextIO | None = None
+) -> int:
+    """
+    Выводит последовательность записей, не собирая её в памяти
+    Возвращает число выведенных записей.
+    """
+    stream = stream or sys.stdout
+    count = 0
+    if fmt == "ndjson":
+        for record in records:
+            stream.write(_dumps(record) + "\n")
+            count += 1
+        return count
+
+    stream.write("[")
+    for record in records:
+        stream.write(("\n  " if count == 0 else ",\n  ") + _dumps(record))
+        count += 1
+    stream.write("\n]\n" if count else "]\n")
+    return count
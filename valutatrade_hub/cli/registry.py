@@ -0,0 +1,113 @@
+"""
+Реестр команд CLI.
+Каждая команда описывается декларативно: имя, обработчик и спецификация
+аргументов. Разбор аргументов общий для всех команд, а поиск команды -
+обращение к словарю, поэтому новые команды не удлиняют цепочку проверок.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Collection
+
+
+class CommandArgsError(ValueError):
+    """
+    Ошибка разбора аргументов команды.
+    """
+
+
+@dataclass(frozen=True)
+class Arg:
+    """
+    Спецификация аргумента вида --name <value>.
+    - type - функция преобразования значения (str, int, float, ...).
+    - choices - допустимые значения (проверяются после преобразования type);
+      подойдёт любая коллекция с быстрым in, например реестр валют.
+    """
+
+    name: str
+    required: bool = False
+    type: Callable[[str], Any] = str
+    choices: Collection[str] | None = None
+    default: Any = None
+
+    @property
+    def key(self) -> str:
+        return self.name.lstrip("-").replace("-", "_")
+
+
+@dataclass(frozen=True)
+class Command:
+    """
+    Команда CLI: обработчик получает словарь разобранных аргументов
+    и возвращает False при ошибке.
+    - remote - команда доступна в режиме клиента сервиса.
+    """
+
+    name: str
+    handler: Callable[[dict], bool | None]
+    args: tuple[Arg, ...] = ()
+    requires_login: bool = False
+    remote: bool = False
+    by_name: dict[str, Arg] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "by_name", {arg.name: arg for arg in self.args})
+
+    def parse(self, argv: list[str]) -> dict:
+        """
+        Разбирает список аргументов по спецификации команды.
+        """
+        options = {arg.key: arg.default for arg in self.args}
+        seen = set()
+
+        if len(argv) % 2:
+            raise CommandArgsError(
+                f"у аргумента '{argv[-1]}' нет значения. "
+                "Чтобы получить справку, вызовите 'help'."
+            )
+        for i in range(0, len(argv), 2):
+            name, raw_value = argv[i], argv[i + 1]
+            arg = self.by_name.get(name)
+            if arg is None:
+                raise CommandArgsError(
+                    f"неизвестный аргумент '{name}' для команды '{self.name}'. "
+                    "Чтобы получить справку, вызовите 'help'."
+                )
+            if name in seen:
+                raise CommandArgsError(f"аргумент '{name}' указан дважды.")
+            seen.add(name)
+
+            try:
+                value = arg.type(raw_value)
+            except ValueError:
+                raise CommandArgsError(
+                    f"некорректное значение {name}: '{raw_value}'."
+                ) from None
+            if arg.choices is not None and value not in arg.choices:
+                raise CommandArgsError(
+                    f"{name} должен быть одним из: {', '.join(arg.choices)}; "
+                    f"получено '{raw_value}'."
+                )
+            options[arg.key] = value
+
+        for arg in self.args:
+            if arg.required and arg.name not in seen:
+                raise CommandArgsError(f"укажите аргумент {arg.name}.")
+        return options
+
+
+COMMANDS: dict[str, Command] = {}
+
+
+def command(
+    name: str, *args: Arg, requires_login: bool = False, remote: bool = False
+):
+    """
+    Декоратор регистрации обработчика команды в реестре.
+    """
+
+    def decorator(handler: Callable[[dict], bool | None]):
+        COMMANDS[name] = Command(name, handler, args, requires_login, remote)
+        return handler
+
+    return decorator
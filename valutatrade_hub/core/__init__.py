@@ -1,15 +1,29 @@
-from .usecases import buy, sell, get_rate
-from .exceptions import (
-    ApiRequestError,
-    CurrencyNotFoundError,
-    InsufficientFundsError,
-)
-
-__all__ = [
-    "buy",
-    "sell",
-    "get_rate",
-    "ApiRequestError",
-    "CurrencyNotFoundError",
-    "InsufficientFundsError",
-]
+"""
+Ядро ValutaTrade Hub.
+Имена пакета загружаются при первом обращении: импорт любого модуля ядра
+(например, core.currencies) не тянет за собой торговый движок.
+"""
+
+from importlib import import_module
+
+# Имя -> модуль пакета, из которого оно берётся
+_EXPORTS = {
+    "TradingEngine": "engine",
+    "buy": "usecases",
+    "sell": "usecases",
+    "get_rate": "usecases",
+    "get_quote": "usecases",
+    "ApiRequestError": "exceptions",
+    "CurrencyNotFoundError": "exceptions",
+    "InsufficientFundsError": "exceptions",
+    "QuoteExpiredError": "exceptions",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(f".{module}", __name__), name)
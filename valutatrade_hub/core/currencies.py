@@ -1,19 +1,55 @@
+"""
+Валюты и их реестр.
+Реестр строится один раз при импорте: встроенные валюты дополняются
+(или переопределяются по коду) записями файла CURRENCIES_FILE
+(data/currencies.json или VALUTATRADE_CURRENCIES). Объекты валют
+неизменяемы и не пересоздаются при обращении, поиск по коду и по
+идентификатору у провайдера курсов - обращение к словарю.
+Порядок валют в реестре фиксирован: индекс используется портфелями
+для хранения балансов в компактном массиве.
+"""
+
+import json
+import os
+import re
 from abc import ABC, abstractmethod
+from typing import Iterable, Iterator
+
 from valutatrade_hub.core.exceptions import CurrencyNotFoundError
+from valutatrade_hub.infra.settings import SettingsLoader
+
+CURRENCY_KINDS = ("fiat", "crypto")
+# Допустимый код валюты: латинские буквы и цифры
+_CODE_PATTERN = re.compile(r"[A-Z0-9]{2,12}")
 
 
 class Currency(ABC):
     """
     Абстрактный базовый класс валюты.
+    - scale - число знаков после запятой в минимальной единице валюты.
+    - provider_id - идентификатор валюты у провайдера курсов (CoinGecko).
     """
 
-    name: str
-    code: str
+    __slots__ = ("name", "code", "scale", "provider_id")
+    kind = ""
 
-    def __init__(self, name: str, code: str):
+    def __init__(
+        self, name: str, code: str, scale: int = 2, provider_id: str | None = None
+    ):
         super().__init__()
-        self.name = name
-        self.code = code
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "code", code)
+        object.__setattr__(self, "scale", scale)
+        object.__setattr__(self, "provider_id", provider_id)
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"Валюта {self.code} неизменяема")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"Валюта {self.code} неизменяема")
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.code!r})"
 
     @abstractmethod
     def get_display_info(self) -> str:
@@ -28,9 +64,20 @@ class FiatCurrency(Currency):
     Фиатная валюта
     """
 
-    def __init__(self, name: str, code: str, issuing_country: str):
-        super().__init__(name, code)
-        self.issuing_country = issuing_country
+    __slots__ = ("issuing_country",)
+    kind = "fiat"
+
+    def __init__(
+        self,
+        name: str,
+        code: str,
+        issuing_country: str,
+        scale: int = 2,
+        provider_id: str | None = None,
+    ):
+        # Фиатные валюты у провайдеров обозначаются кодом в нижнем регистре
+        super().__init__(name, code, scale, provider_id or code.lower())
+        object.__setattr__(self, "issuing_country", issuing_country)
 
     def get_display_info(self) -> str:
         return f"[FIAT] {self.code} — {self.name} (Issuing: {self.issuing_country})"
@@ -41,10 +88,21 @@ class CryptoCurrency(Currency):
     Криптовалюта
     """
 
-    def __init__(self, name: str, code: str, algorithm: str, market_cap: float):
-        super().__init__(name, code)
-        self.algorithm = algorithm
-        self.market_cap = market_cap
+    __slots__ = ("algorithm", "market_cap")
+    kind = "crypto"
+
+    def __init__(
+        self,
+        name: str,
+        code: str,
+        algorithm: str,
+        market_cap: float,
+        scale: int = 8,
+        provider_id: str | None = None,
+    ):
+        super().__init__(name, code, scale, provider_id)
+        object.__setattr__(self, "algorithm", algorithm)
+        object.__setattr__(self, "market_cap", market_cap)
 
     def get_display_info(self) -> str:
         return (
@@ -53,22 +111,165 @@ class CryptoCurrency(Currency):
         )
 
 
-# Реестр валют
+# Встроенные валюты. Число знаков минимальной единицы:
+# центы и копейки для фиата, сатоши для BTC, gwei для ETH.
+DEFAULT_CURRENCIES: tuple[Currency, ...] = (
+    FiatCurrency("US Dollar", "USD", "United States"),
+    FiatCurrency("Euro", "EUR", "Eurozone"),
+    FiatCurrency("Russian Ruble", "RUB", "Russia"),
+    CryptoCurrency("Bitcoin", "BTC", "SHA-256", 1.12e12, provider_id="bitcoin"),
+    CryptoCurrency(
+        "Ethereum", "ETH", "Ethash", 4.45e11, scale=9, provider_id="ethereum"
+    ),
+)
+
+
+def currency_from_dict(record: dict) -> Currency:
+    """
+    Валюта из записи конфигурации:
+    {"code": "SOL", "type": "crypto", "name": "Solana", "scale": 9,
+     "algorithm": "PoH", "market_cap": 8.0e10, "provider_id": "solana"}
+    Для фиата вместо algorithm и market_cap - issuing_country.
+    """
+    code = str(record.get("code", "")).upper()
+    if not _CODE_PATTERN.fullmatch(code):
+        raise ValueError(f"Некорректный код валюты '{record.get('code')}'")
+    kind = record.get("type", "fiat")
+    if kind not in CURRENCY_KINDS:
+        raise ValueError(
+            f"Валюта {code}: тип должен быть одним из {', '.join(CURRENCY_KINDS)}"
+        )
+    scale = record.get("scale", 2 if kind == "fiat" else 8)
+    if not isinstance(scale, int) or not 0 <= scale <= 18:
+        raise ValueError(f"Валюта {code}: scale должен быть целым от 0 до 18")
+
+    name = record.get("name") or code
+    if kind == "fiat":
+        return FiatCurrency(
+            name,
+            code,
+            record.get("issuing_country", ""),
+            scale,
+            record.get("provider_id"),
+        )
+    return CryptoCurrency(
+        name,
+        code,
+        record.get("algorithm", ""),
+        float(record.get("market_cap", 0.0)),
+        scale,
+        record.get("provider_id") or name.lower(),
+    )
+
+
+class CurrencyRegistry:
+    """
+    Реестр валют: поиск по коду и по идентификатору у провайдера курсов
+    """
+
+    __slots__ = ("_by_code", "_by_provider_id", "_index", "codes", "scales")
+
+    def __init__(self, currencies: Iterable[Currency]) -> None:
+        self._by_code: dict[str, Currency] = {}
+        self._by_provider_id: dict[str, Currency] = {}
+        for currency in currencies:
+            if currency.code in self._by_code:
+                raise ValueError(f"Валюта {currency.code} указана дважды")
+            if currency.provider_id in self._by_provider_id:
+                raise ValueError(
+                    f"Идентификатор '{currency.provider_id}' указан у двух валют"
+                )
+            self._by_code[currency.code] = currency
+            if currency.provider_id:
+                self._by_provider_id[currency.provider_id] = currency
+
+        self.codes: tuple[str, ...] = tuple(self._by_code)
+        self.scales: dict[str, int] = {
+            code: currency.scale for code, currency in self._by_code.items()
+        }
+        self._index = {code: index for index, code in enumerate(self.codes)}
+
+    def __contains__(self, code) -> bool:
+        return code in self._by_code
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.codes)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def get(self, code: str) -> Currency:
+        """
+        Валюта по коду (регистр не важен)
+        """
+        currency = self._by_code.get(code)
+        if currency is None:
+            currency = self._by_code.get(code.upper())
+            if currency is None:
+                raise CurrencyNotFoundError(code)
+        return currency
+
+    def by_provider_id(self, provider_id: str) -> Currency:
+        """
+        Валюта по идентификатору у провайдера курсов ("bitcoin", "eur")
+        """
+        try:
+            return self._by_provider_id[provider_id]
+        except KeyError:
+            raise CurrencyNotFoundError(provider_id) from None
+
+    def index(self, code: str) -> int:
+        """
+        Позиция валюты в массиве балансов портфеля
+        """
+        try:
+            return self._index[code]
+        except KeyError:
+            return self._index[self.get(code).code]
+
+    def of_kind(self, kind: str) -> tuple[Currency, ...]:
+        return tuple(
+            currency for currency in self._by_code.values() if currency.kind == kind
+        )
+
+
+def load_currencies(path: str | None = None) -> CurrencyRegistry:
+    """
+    Встроенные валюты, дополненные записями JSON-файла (список объектов)
+    Записи с кодом встроенной валюты заменяют её, не меняя порядка.
+    """
+    currencies = {currency.code: currency for currency in DEFAULT_CURRENCIES}
+    path = path or SettingsLoader().get("CURRENCIES_FILE")
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            try:
+                records = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Некорректный файл валют {path}: {e}") from None
+        if not isinstance(records, list):
+            raise ValueError(f"Файл валют {path} должен содержать список записей")
+        for record in records:
+            currency = currency_from_dict(record)
+            currencies[currency.code] = currency
+    return CurrencyRegistry(currencies.values())
+
+
+CURRENCIES = load_currencies()
+
+# Совместимые представления реестра
+CURRENCY_CODES: tuple[str, ...] = CURRENCIES.codes
+CURRENCY_SCALES: dict[str, int] = CURRENCIES.scales
+
+
 def get_currency(code: str) -> Currency:
     """
     Возвращает экземпляр валюты по коду.
     """
+    return CURRENCIES.get(code)
 
-    code = code.upper()
-    registry = {
-        "USD": FiatCurrency("US Dollar", "USD", "United States"),
-        "EUR": FiatCurrency("Euro", "EUR", "Eurozone"),
-        "RUB": FiatCurrency("Russian Ruble", "RUB", "Russia"),
-        "BTC": CryptoCurrency("Bitcoin", "BTC", "SHA-256", 1.12e12),
-        "ETH": CryptoCurrency("Ethereum", "ETH", "Ethash", 4.45e11),
-    }
 
-    if code not in registry:
-        raise CurrencyNotFoundError(f"Неизвестная валюта: {code}")
-
-    return registry[code]
+def currency_index(code: str) -> int:
+    """
+    Возвращает позицию валюты в массиве балансов портфеля.
+    """
+    return CURRENCIES.index(code)
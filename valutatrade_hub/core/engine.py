@@ -0,0 +1,1020 @@
+"""
+Торговое ядро ValutaTrade Hub.
+TradingEngine владеет своими хранилищами, кэшем курсов и конфигурацией,
+поэтому несколько движков над разными каталогами данных работают в одном
+процессе независимо друг от друга. Методы потокобезопасны: операции
+одного пользователя выполняются под его блокировкой, операции разных
+пользователей - параллельно.
+"""
+
+import heapq
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from valutatrade_hub.core.currencies import (
+    CURRENCY_CODES,
+    currency_index,
+    get_currency,
+)
+from valutatrade_hub.core.exceptions import (
+    CurrencyNotFoundError,
+    InsufficientFundsError,
+    QuoteExpiredError,
+)
+from valutatrade_hub.core.history import HistoryFile, from_micros, to_micros
+from valutatrade_hub.core.history_import import DEFAULT_CHUNK_SIZE, import_history
+from valutatrade_hub.core.ledger import PNL_METHODS, PnLEngine, TradeLedger
+from valutatrade_hub.core.models import Portfolio, Quote, User
+from valutatrade_hub.core.money import convert_minor, from_minor, to_minor
+from valutatrade_hub.core.orders import ORDER_KINDS, ORDER_SIDES, Order, OrderStore
+from valutatrade_hub.core.rates import CODES, RateTable, pair_key, split_pair
+from valutatrade_hub.core.repository import PortfolioRepository, UserRepository
+from valutatrade_hub.core.sessions import SessionStore, load_secret
+from valutatrade_hub.core.utils import load_json, save_json
+from valutatrade_hub.decorators import log_action
+from valutatrade_hub.infra.compression import (
+    codec_for,
+    compressed_path,
+    merge_files,
+    path_variants,
+    plain_path,
+    recompress,
+    stored_path,
+    stored_variants,
+)
+from valutatrade_hub.infra.settings import SettingsLoader
+from valutatrade_hub.logging_config import setup_logger
+from valutatrade_hub.metrics import TRADES, Family
+from valutatrade_hub.stats import STATS
+
+logger = setup_logger()
+
+INITIAL_USD_BALANCE = 1000.0
+
+# Фиксированные курсы к USD для оценки портфеля
+PORTFOLIO_RATES_USD = {
+    "USD": 1.0,
+    "EUR": 1.07,
+    "BTC": 59337.21,
+    "ETH": 3720.00,
+    "RUB": 0.01016,
+}
+# Курсы оценки для всех валют реестра: валюта без фиксированного курса
+# оценивается в 0
+_PORTFOLIO_RATES = dict.fromkeys(CURRENCY_CODES, 0.0) | PORTFOLIO_RATES_USD
+
+
+def _refresh_rate(pair_key: str) -> dict | None:
+    """
+    Фейковое обновление курса.
+    Возвращает dict с новой структурой.
+    """
+    now = datetime.now().isoformat(timespec="seconds") + "Z"  # добавляем Z для UTC
+
+    fake_rates = {
+        "USD_BTC": {"rate": 1 / 59337.21, "updated_at": now, "source": "fake_rates"},
+        "BTC_USD": {"rate": 59337.21, "updated_at": now, "source": "fake_rates"},
+        "EUR_USD": {"rate": 1.0786, "updated_at": now, "source": "fake_rates"},
+        "USD_EUR": {
+            "rate": 1 / 1.0786,
+            "updated_at": now,
+            "source": "fake_rates",
+        },
+        "RUB_USD": {"rate": 0.01016, "updated_at": now, "source": "fake_rates"},
+        "USD_RUB": {"rate": 98.42, "updated_at": now, "source": "fake_rates"},
+        "ETH_USD": {"rate": 3720.00, "updated_at": now, "source": "fake_rates"},
+        "USD_ETH": {"rate": 1 / 3720.00, "updated_at": now, "source": "fake_rates"},
+    }
+
+    if pair_key in fake_rates:
+        return fake_rates[pair_key]
+    return None
+
+
+def _oldest_first(paths) -> list[Path]:
+    """
+    Файлы по времени изменения, от старых к новым
+    """
+    return sorted(paths, key=lambda path: path.stat().st_mtime_ns)
+
+
+def _engine_config(data_dir, rates_ttl, quote_ttl) -> dict:
+    """
+    Конфигурация движка: пути к файлам и TTL.
+    Без data_dir используются значения SettingsLoader.
+    """
+    settings = SettingsLoader()
+    if data_dir is None:
+        config = {
+            key: settings.get(key)
+            for key in (
+                "DATA_DIR",
+                "USERS_FILE",
+                "PORTFOLIOS_FILE",
+                "RATES_FILE",
+                "HISTORY_FILE",
+                "HISTORY_COLUMNAR_FILE",
+                "ORDERS_FILE",
+                "LEDGER_DIR",
+                "DATA_COMPRESSION",
+                "SESSIONS_FILE",
+                "SESSION_SECRET_FILE",
+            )
+        }
+    else:
+        data_dir = Path(data_dir)
+        data_dir.mkdir(parents=True, exist_ok=True)
+        compression = settings.get("DATA_COMPRESSION")
+        config = {
+            "DATA_DIR": str(data_dir),
+            "USERS_FILE": str(data_dir / "users.json"),
+            "PORTFOLIOS_FILE": str(data_dir / "portfolios.json"),
+            "RATES_FILE": str(data_dir / "rates.json"),
+            "HISTORY_FILE": compressed_path(
+                data_dir / "exchange_rates.json", compression
+            ),
+            "HISTORY_COLUMNAR_FILE": str(data_dir / "exchange_rates.vth"),
+            "ORDERS_FILE": str(data_dir / "orders.json"),
+            "LEDGER_DIR": str(data_dir / "ledger"),
+            "DATA_COMPRESSION": compression,
+            "SESSIONS_FILE": str(data_dir / "sessions.json"),
+            "SESSION_SECRET_FILE": str(data_dir / ".session_secret"),
+        }
+    config["RATES_TTL_SECONDS"] = (
+        settings.get("RATES_TTL_SECONDS", 600) if rates_ttl is None else rates_ttl
+    )
+    config["QUOTE_TTL_SECONDS"] = (
+        settings.get("QUOTE_TTL_SECONDS", 30) if quote_ttl is None else quote_ttl
+    )
+    config["SESSION_TTL_SECONDS"] = settings.get("SESSION_TTL_SECONDS", 86400)
+    return config
+
+
+class TradingEngine:
+    """
+    Фасад торговых операций над одним каталогом данных.
+    - data_dir - каталог с users.json, portfolios.json, rates.json и т.д.;
+      по умолчанию берётся из SettingsLoader.
+    - rates_ttl, quote_ttl - срок жизни курса и котировки в секундах.
+    Пример: TradingEngine("/tmp/bench").buy(user_id=1, currency_code="BTC", ...)
+    """
+
+    def __init__(
+        self,
+        data_dir=None,
+        *,
+        rates_ttl: int | None = None,
+        quote_ttl: int | None = None,
+        initial_usd_balance: float = INITIAL_USD_BALANCE,
+    ) -> None:
+        self.config = _engine_config(data_dir, rates_ttl, quote_ttl)
+        self.initial_usd_balance = initial_usd_balance
+
+        self.users = UserRepository(self.config["USERS_FILE"])
+        self.portfolios = PortfolioRepository(self.config["PORTFOLIOS_FILE"])
+        self.orders = OrderStore(self.config["ORDERS_FILE"])
+        ledger_dir = self.config["LEDGER_DIR"]
+        self.ledger = TradeLedger(ledger_dir, self.config["DATA_COMPRESSION"])
+        self.pnl = PnLEngine(self.ledger, ledger_dir)
+
+        self._rates_cache: RateTable | None = None
+        self._rates_mtime_ns: int | None = None
+        self._rates_lock = threading.RLock()
+
+        self._history_cache: HistoryFile | None = None
+        self._history_stat: tuple | None = None
+        self._history_lock = threading.Lock()
+
+        # Регистрации выполняются по одной: проверка имени и выдача id атомарны
+        self._register_lock = threading.Lock()
+        self._user_locks: dict[int, threading.Lock] = {}
+        self._user_locks_guard = threading.Lock()
+
+        self._sessions: SessionStore | None = None
+        self._sessions_guard = threading.Lock()
+
+    def _user_lock(self, user_id: int) -> threading.Lock:
+        """
+        Блокировка операций пользователя (создаётся при первом обращении)
+        """
+        lock = self._user_locks.get(user_id)
+        if lock is None:
+            with self._user_locks_guard:
+                lock = self._user_locks.setdefault(user_id, threading.Lock())
+        return lock
+
+    # Пользователи и портфели
+
+    def get_user_portfolio(self, user_id: int) -> Portfolio | None:
+        return self.portfolios.get(user_id)
+
+    def get_portfolio_summary(
+        self, user_id: int, base_currency: str = "USD"
+    ) -> dict | None:
+        """
+        Балансы кошельков и их стоимость в базовой валюте
+        Стоимость считается в минимальных единицах базовой валюты, итог -
+        точная сумма портфеля (Portfolio.get_total_units).
+        Возвращает None, если у пользователя нет портфеля.
+        """
+        base_currency = base_currency.upper()
+        with self._user_lock(user_id):
+            portfolio = self.portfolios.get(user_id)
+            if portfolio is None:
+                return None
+            values = portfolio.get_wallet_values(base_currency, _PORTFOLIO_RATES)
+            total = portfolio.get_total_units(base_currency, _PORTFOLIO_RATES)
+
+        return {
+            "user_id": user_id,
+            "base": base_currency,
+            "wallets": [
+                {
+                    "currency": code,
+                    "balance": from_minor(units, code),
+                    "value": from_minor(value, base_currency),
+                }
+                for code, units, value in values
+            ],
+            "total": from_minor(total, base_currency),
+        }
+
+    def register_user(self, username: str, password: str) -> User:
+        """
+        Регистрация пользователя и создание портфеля со стартовым балансом USD
+        """
+        with self._register_lock:
+            if self.users.find_by_username(username) is not None:
+                raise ValueError(f"Имя пользователя '{username}' уже занято.")
+
+            user = User(self.users.next_id(), username, password)
+            self.users.add(user)
+            self.users.save()
+
+        portfolio = Portfolio(user.user_id)
+        portfolio.get_or_create_wallet("USD").deposit(self.initial_usd_balance)
+        with self._user_lock(user.user_id):
+            self.portfolios.add(portfolio)
+            self.portfolios.save()
+        return user
+
+    def login_user(self, username: str, password: str) -> User:
+        """
+        Проверка имени и пароля пользователя
+        """
+        user = self.users.find_by_username(username)
+        if user is None:
+            raise ValueError(f"Пользователь '{username}' не найден.")
+        if not user.verify_password(password):
+            raise ValueError("Неверный пароль.")
+        return user
+
+    # Сессии
+
+    @property
+    def sessions(self) -> SessionStore:
+        """
+        Хранилище сессий; ключ подписи загружается при первом обращении
+        """
+        if self._sessions is None:
+            with self._sessions_guard:
+                if self._sessions is None:
+                    self._sessions = SessionStore(
+                        self.config["SESSIONS_FILE"],
+                        load_secret(self.config["SESSION_SECRET_FILE"]),
+                        self.config["SESSION_TTL_SECONDS"],
+                    )
+        return self._sessions
+
+    def create_session(self, user: User) -> str:
+        """
+        Выдаёт токен сессии вошедшему пользователю
+        """
+        return self.sessions.issue(user.user_id, user.username)
+
+    def resolve_session(self, token: str) -> dict | None:
+        """
+        Пользователь {"user_id", "username"} по токену или None, если
+        токен подделан, истёк или отозван. users.json не читается.
+        """
+        return self.sessions.resolve(token)
+
+    def revoke_session(self, token: str) -> bool:
+        return self.sessions.revoke(token)
+
+    # Сделки
+
+    @log_action("BUY")
+    def buy(
+        self,
+        user_id: int,
+        currency_code: str,
+        amount: float,
+        rate: float | None = None,
+        quote: Quote | None = None,
+        **kwargs,
+    ) -> dict:
+        """
+        Покупка валюты с логированием и валидацией
+        Курс берётся из котировки quote (см. get_quote) либо из rate.
+        """
+        if amount <= 0:
+            raise ValueError("'amount' должен быть положительным числом")
+
+        rate = self._resolve_trade_rate(currency_code, rate, quote)
+
+        try:
+            get_currency(currency_code)
+        except CurrencyNotFoundError as e:
+            logger.error("%s", e)
+            raise
+
+        currency_code = currency_code.upper()
+        if currency_code == "USD":
+            raise ValueError(
+                "USD - базовая валюта кошелька. "
+                "Для получения USD продайте другую валюту (sell)"
+            )
+
+        amount_units = to_minor(amount, currency_code)
+        cost_units = convert_minor(amount_units, currency_code, "USD", rate)
+        if amount_units <= 0 or cost_units <= 0:
+            raise ValueError("Сумма сделки меньше минимальной единицы валюты")
+        estimated_value = from_minor(cost_units, "USD")
+
+        with self._user_lock(user_id):
+            self.ledger.ensure_writable(user_id)
+            portfolio = self.portfolios.get_or_create(user_id)
+
+            # Сначала списываем USD: при нехватке средств портфель не меняется
+            usd_wallet = portfolio.get_wallet("USD")
+            if usd_wallet is None:
+                raise InsufficientFundsError(0.0, estimated_value, "USD")
+            usd_wallet.withdraw_units(cost_units)
+            portfolio.get_or_create_wallet(currency_code).deposit_units(amount_units)
+
+            self.portfolios.save()
+            self.pnl.record(
+                user_id,
+                f"{currency_code}_USD",
+                from_minor(amount_units, currency_code),
+                rate,
+            )
+
+        logger.info(
+            "Покупка %s: %s @ %s → %.2f USD (user_id=%s)",
+            currency_code,
+            amount,
+            rate,
+            estimated_value,
+            user_id,
+        )
+        TRADES.labels("buy", currency_code).inc()
+        return {
+            "action": "buy",
+            "user_id": user_id,
+            "currency": currency_code,
+            "amount": from_minor(amount_units, currency_code),
+            "rate": rate,
+            "value_usd": estimated_value,
+        }
+
+    @log_action("SELL")
+    def sell(
+        self,
+        user_id: int,
+        currency_code: str,
+        amount: float,
+        rate: float | None = None,
+        quote: Quote | None = None,
+        **kwargs,
+    ) -> dict:
+        """
+        Продажа валюты с валидацией и логированием
+        Курс берётся из котировки quote (см. get_quote) либо из rate.
+        """
+        if amount <= 0:
+            raise ValueError("'amount' должен быть положительным числом")
+
+        rate = self._resolve_trade_rate(currency_code, rate, quote)
+
+        try:
+            get_currency(currency_code)
+        except CurrencyNotFoundError as e:
+            logger.error("%s", e)
+            raise
+
+        with self._user_lock(user_id):
+            self.ledger.ensure_writable(user_id)
+            portfolio = self.portfolios.get(user_id)
+            if portfolio is None:
+                raise ValueError(f"Портфель для user_id={user_id} не найден")
+
+            wallet = portfolio.get_wallet(currency_code)
+            if wallet is None:
+                raise CurrencyNotFoundError(f"У вас нет кошелька '{currency_code}'")
+
+            code = wallet.currency_code
+            amount_units = to_minor(amount, code)
+            revenue_units = convert_minor(amount_units, code, "USD", rate)
+            if amount_units <= 0 or revenue_units <= 0:
+                raise ValueError("Сумма сделки меньше минимальной единицы валюты")
+            estimated_revenue = from_minor(revenue_units, "USD")
+
+            wallet.withdraw_units(amount_units)
+            portfolio.get_or_create_wallet("USD").deposit_units(revenue_units)
+
+            self.portfolios.save()
+            self.pnl.record(
+                user_id, f"{code}_USD", -from_minor(amount_units, code), rate
+            )
+
+        logger.info(
+            "Продажа %s: %s @ %s → %.2f USD (user_id=%s)",
+            currency_code,
+            amount,
+            rate,
+            estimated_revenue,
+            user_id,
+        )
+        TRADES.labels("sell", code).inc()
+        return {
+            "action": "sell",
+            "user_id": user_id,
+            "currency": code,
+            "amount": from_minor(amount_units, code),
+            "rate": rate,
+            "value_usd": estimated_revenue,
+        }
+
+    def get_pnl(self, user_id: int, method: str = "fifo") -> dict:
+        """
+        Реализованный и нереализованный P&L пользователя в USD
+        method - метод учёта себестоимости: fifo или avg (средняя цена).
+        Использует кэшированное состояние, поэтому не зависит от длины истории.
+        Курсы не обновляются: у позиции без свежего курса рыночная оценка и
+        нереализованный результат - None, её валюта попадает в "unpriced",
+        а итог нереализованного результата считается без неё.
+        """
+        method = method.lower()
+        if method not in PNL_METHODS:
+            raise ValueError(f"Неизвестный метод учёта '{method}' (fifo или avg)")
+
+        cost_key = "cost_fifo" if method == "fifo" else "cost_total"
+        with self._user_lock(user_id):
+            state = self.pnl.get_state(user_id)
+            positions = [
+                (
+                    code,
+                    position["qty"],
+                    position[cost_key],
+                    position[f"realized_{method}"],
+                )
+                for code, position in state["positions"].items()
+            ]
+
+        rows = []
+        for code, qty, cost, realized in positions:
+            # Отчёт только читает: устаревший курс не обновляется, и без
+            # свежего курса рыночная оценка позиции недоступна
+            market_value = 0.0
+            if qty > 0:
+                found = self.get_rate(from_code=code, to_code="USD", refresh=False)
+                market_value = qty * float(found[0]) if found else None
+
+            rows.append(
+                {
+                    "currency": code,
+                    "qty": qty,
+                    "cost_basis": cost,
+                    "market_value": market_value,
+                    "unrealized": (
+                        None if market_value is None else market_value - cost
+                    ),
+                    "realized": realized,
+                }
+            )
+
+        return {
+            "method": method,
+            "positions": rows,
+            "realized": sum(row["realized"] for row in rows),
+            "unrealized": sum(
+                row["unrealized"] for row in rows if row["unrealized"] is not None
+            ),
+            "unpriced": [
+                row["currency"] for row in rows if row["market_value"] is None
+            ],
+        }
+
+    # Отложенные заявки
+
+    @log_action("PLACE_ORDER")
+    def place_order(
+        self,
+        user_id: int,
+        currency_code: str,
+        side: str,
+        kind: str,
+        amount: float,
+        price: float,
+        **kwargs,
+    ) -> Order:
+        """
+        Выставление отложенной лимитной или стоп-заявки к USD
+        """
+        side = side.lower()
+        kind = kind.lower()
+        if side not in ORDER_SIDES:
+            raise ValueError(f"Неизвестная сторона заявки '{side}' (buy или sell)")
+        if kind not in ORDER_KINDS:
+            raise ValueError(f"Неизвестный тип заявки '{kind}' (limit или stop)")
+        if amount <= 0:
+            raise ValueError("'amount' должен быть положительным числом")
+        if price <= 0:
+            raise ValueError("'price' должен быть положительным числом")
+
+        currency_code = get_currency(currency_code).code
+        if currency_code == "USD":
+            raise ValueError("Заявки выставляются на валюты к USD, а не на сам USD")
+
+        return self.orders.add(user_id, currency_code, side, kind, amount, price)
+
+    def cancel_order(self, user_id: int, order_id: int) -> Order:
+        """
+        Отмена отложенной заявки пользователя
+        """
+        with self.orders.locked():
+            order = self.orders.get(order_id)
+            if order is None or order.user_id != user_id:
+                raise ValueError(f"Заявка #{order_id} не найдена")
+            self.orders.remove(order_id)
+        return order
+
+    def list_orders(self, user_id: int) -> list[Order]:
+        return self.orders.list_for_user(user_id)
+
+    def match_orders(self, pairs: dict) -> list[tuple[Order, str]]:
+        """
+        Исполняет заявки, цена срабатывания которых пересечена новыми курсами
+        pairs - курсы в формате rates.json: {"BTC_USD": {"rate": ...}, ...}
+        Возвращает список (заявка, результат): "filled" или текст ошибки.
+        Сработавшая заявка, которую не удалось исполнить (не хватает
+        средств, нет кошелька), отменяется: она снимается с книги и при
+        следующих курсах не повторяется. Снятие каждой заявки записывается
+        до сделки, поэтому заявка не исполняется дважды - ни после сбоя, ни
+        параллельным обновлением курсов.
+        """
+        rates = {pair: float(info["rate"]) for pair, info in pairs.items()}
+        results = []
+        # Книга заблокирована на всё исполнение: сработавшие заявки не
+        # достанутся параллельному обновлению курсов
+        with self.orders.locked():
+            triggered = self.orders.pop_triggered(rates)
+            try:
+                for order, rate in triggered:
+                    # Снятие заявки записывается до сделки: после сбоя между
+                    # ними заявка не исполнится повторно
+                    self.orders.remove(order.order_id)
+                    trade = self.buy if order.side == "buy" else self.sell
+                    try:
+                        trade(
+                            user_id=order.user_id,
+                            currency_code=order.currency_code,
+                            amount=order.amount,
+                            rate=rate,
+                            currency=order.currency_code,
+                        )
+                        results.append((order, "filled"))
+                    except (
+                        ValueError,
+                        CurrencyNotFoundError,
+                        InsufficientFundsError,
+                    ) as e:
+                        results.append((order, str(e)))
+            finally:
+                if len(results) < len(triggered):
+                    # Исполнение прервано: книги строятся заново, и
+                    # неисполненные заявки снова ждут курса
+                    self.orders.reload()
+        return results
+
+    # Курсы
+
+    def _load_rates(self) -> RateTable:
+        """
+        Возвращает таблицу курсов rates.json, перечитывая файл только при изменении
+        """
+        rates_file = self.config["RATES_FILE"]
+        with self._rates_lock:
+            try:
+                mtime_ns = os.stat(rates_file).st_mtime_ns
+            except FileNotFoundError:
+                mtime_ns = None
+            if self._rates_cache is None or mtime_ns != self._rates_mtime_ns:
+                STATS.cache_miss("rates_file")
+                self._rates_cache = RateTable.from_json(load_json(rates_file))
+                self._rates_mtime_ns = mtime_ns
+            else:
+                STATS.cache_hit("rates_file")
+            return self._rates_cache
+
+    def _save_rates(self, table: RateTable) -> None:
+        rates_file = self.config["RATES_FILE"]
+        with self._rates_lock:
+            save_json(rates_file, table.to_json())
+            self._rates_cache = table
+            self._rates_mtime_ns = os.stat(rates_file).st_mtime_ns
+
+    def _lookup_rate(
+        self, from_id: int, to_id: int, refresh: bool = True
+    ) -> tuple[RateTable, int]:
+        """
+        Находит свежий курс пары по id валют (или обновляет устаревший)
+        Возвращает таблицу курсов и номер ячейки пары в ней. При
+        refresh=False устаревший курс не обновляется, ячейка равна -1.
+        """
+        with self._rates_lock:
+            table = self._load_rates()
+            cell = table.cell(from_id, to_id)
+
+            # Если курса нет или он устарел
+            if (
+                cell < 0
+                or time.time() - table.updated[cell]
+                > self.config["RATES_TTL_SECONDS"]
+            ):
+                if not refresh:
+                    return table, -1
+                STATS.cache_miss("rate_ttl")
+                key = pair_key(from_id, to_id)
+                new_info = _refresh_rate(key)
+                if not new_info:
+                    from_code, to_code = split_pair(key)
+                    raise ValueError(f"Курс {from_code}->{to_code} недоступен.")
+
+                # Кэш заменяется копией только после записи файла: при ошибке
+                # записи он остаётся согласованным с rates.json
+                table = table.copy()
+                cell = table.set(
+                    from_id,
+                    to_id,
+                    new_info["rate"],
+                    new_info["updated_at"],
+                    new_info["source"],
+                )
+                table.last_refresh = datetime.now().isoformat(timespec="seconds") + "Z"
+                table.version += 1
+                self._save_rates(table)
+            else:
+                STATS.cache_hit("rate_ttl")
+
+            return table, cell
+
+    @log_action("GET_RATE")
+    def get_rate(
+        self, from_code: str, to_code: str, refresh: bool = True, **kwargs
+    ) -> tuple[float, str] | None:
+        """
+        Получение и обновление курса валют с логированием
+        refresh=False - устаревший или отсутствующий курс не обновляется
+        (rates.json не записывается), вместо курса возвращается None.
+        """
+        table, cell = self._lookup_rate(
+            currency_index(from_code), currency_index(to_code), refresh
+        )
+        if cell < 0:
+            return None
+        return table.rates[cell], table.updated_at[cell]
+
+    def get_quote(self, from_code: str, to_code: str = "USD") -> Quote:
+        """
+        Котировка для сделки: курс, версия снимка курсов и срок действия
+        Передаётся в buy/sell, чтобы сделка прошла ровно по показанному курсу.
+        """
+        from_id = currency_index(from_code)
+        to_id = currency_index(to_code)
+        table, cell = self._lookup_rate(from_id, to_id)
+        return Quote(
+            from_code=CURRENCY_CODES[from_id],
+            to_code=CURRENCY_CODES[to_id],
+            rate=table.rates[cell],
+            updated_at=table.updated_at[cell],
+            version=table.version,
+            expires_at=time.time() + self.config["QUOTE_TTL_SECONDS"],
+        )
+
+    @staticmethod
+    def _resolve_trade_rate(
+        currency_code: str, rate: float | None, quote: Quote | None
+    ) -> float:
+        """
+        Курс сделки: из котировки (с проверкой срока и пары) или явно переданный
+        """
+        if quote is None:
+            if rate is None:
+                raise ValueError("Не указан курс сделки")
+            return rate
+        if (quote.from_code, quote.to_code) != (currency_code.upper(), "USD"):
+            raise ValueError(
+                f"Котировка {quote.from_code}->{quote.to_code} не подходит "
+                f"для сделки с {currency_code.upper()}"
+            )
+        if quote.is_expired():
+            raise QuoteExpiredError(quote.from_code, quote.to_code, quote.expires_at)
+        return quote.rate
+
+    @log_action("SHOW_RATES")
+    def show_rates(
+        self,
+        currency: Optional[str] = None,
+        base: Optional[str] = None,
+        top: Optional[int] = None,
+        **kwargs,
+    ) -> dict:
+        """
+        Курсы валют с фильтрацией
+        currency: показывать курсы только для этой валюты
+        base: базовая валюта для отображения
+        top: показать только N лучших курсов
+        Возвращает {"total_pairs", "count", "last_refresh", "rates"}, где rates -
+        генератор записей, создаваемых по одной при выводе.
+        """
+        if top is not None:
+            try:
+                top = int(top)
+            except ValueError:
+                raise ValueError(
+                    f"параметр 'top' должен быть числом, получено '{top}'"
+                ) from None
+
+        # Фильтры переводятся в id один раз; неизвестный код не совпадёт ни с чем
+        currency_id = CODES.find(currency.upper()) if currency else None
+        base_id = CODES.find(base.upper()) if base else None
+
+        with self._rates_lock:
+            table = self._load_rates()
+            last_refresh = table.last_refresh
+            filtered_cells = [
+                cell
+                for from_id, to_id, cell in table
+                if (not currency or currency_id in (from_id, to_id))
+                and (not base or base_id == from_id)
+            ]
+            total_pairs = len(table)
+
+        rates = table.rates
+        if top:
+            sorted_cells = heapq.nlargest(top, filtered_cells, key=rates.__getitem__)
+        else:
+            sorted_cells = sorted(filtered_cells, key=rates.__getitem__, reverse=True)
+
+        def records():
+            for cell in sorted_cells:
+                record = table.record(cell)
+                from_code, to_code = table.pair_codes(cell)
+                yield {
+                    "pair": f"{from_code}_{to_code}",
+                    "from": from_code,
+                    "to": to_code,
+                    **record,
+                }
+
+        return {
+            "total_pairs": total_pairs,
+            "count": len(sorted_cells),
+            "last_refresh": last_refresh,
+            "rates": records(),
+        }
+
+    def history_path(self) -> Path:
+        """
+        Файл истории курсов: в режиме хранения движка или в том, в котором
+        история уже хранится (до перевода командой compress-data)
+        """
+        return stored_path(self.config["HISTORY_FILE"])
+
+    def _load_history_file(self) -> HistoryFile | None:
+        """
+        Колоночный файл истории (отображается один раз, пока файл не заменён)
+        """
+        path = self.config.get("HISTORY_COLUMNAR_FILE")
+        if not path:
+            return None
+        with self._history_lock:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                self._history_cache = None
+                return None
+            key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            if self._history_cache is None or key != self._history_stat:
+                STATS.cache_miss("history_file")
+                # Прежнее отображение не закрывается: им могут пользоваться
+                # незавершённые итераторы, память освободит сборщик мусора
+                self._history_cache = HistoryFile(path)
+                self._history_stat = key
+            else:
+                STATS.cache_hit("history_file")
+            return self._history_cache
+
+    def iter_history(
+        self,
+        pair: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> Iterator[dict]:
+        """
+        Записи истории курсов (exchange_rates.json) с фильтром по паре и времени
+        Записи отдаются по одной, время - в формате "YYYY-MM-DD HH:MM:SS"
+        (UTC), записи без разбираемого времени или курса пропускаются. Если
+        колоночный файл построен из текущей версии истории, записи читаются
+        из него: период ищется бинарным поиском, записи идут по времени.
+        Иначе - в порядке хранения в JSON.
+        """
+        pair_codes = split_pair(pair.upper()) if pair else None
+        since_us = to_micros(since) if since else None
+        until_us = to_micros(until) if until else None
+
+        history = self._load_history_file()
+        history_path = self.history_path()
+        if history is not None and history.is_current(history_path):
+            yield from history.iter_records(
+                pair.upper() if pair else None, since_us, until_us
+            )
+            return
+
+        for record in load_json(history_path).values():
+            if not isinstance(record, dict) or "from_currency" not in record:
+                continue
+            if pair_codes and (
+                record["from_currency"],
+                record["to_currency"],
+            ) != pair_codes:
+                continue
+            # Время и курс разбираются так же, как при построении колоночного
+            # файла: вывод не зависит от того, запускался ли convert-history
+            try:
+                timestamp = to_micros(record["timestamp"])
+                rate = float(record["rate"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if since_us is not None and timestamp < since_us:
+                continue
+            if until_us is not None and timestamp > until_us:
+                continue
+            yield {
+                "pair": f"{record['from_currency']}_{record['to_currency']}",
+                "rate": rate,
+                "timestamp": from_micros(timestamp),
+                "source": record.get("source"),
+            }
+
+    def import_rates(
+        self,
+        path,
+        fmt: Optional[str] = None,
+        source: Optional[str] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> dict:
+        """
+        Импортирует исторические курсы из CSV или NDJSON в историю курсов
+        Записи с уже известной парой и временем пропускаются; source -
+        источник для записей без своего. Сводка - как у import_history.
+        Вызывается, пока обновление курсов не пишет историю.
+        """
+        options = {"fmt": fmt, "chunk_size": chunk_size}
+        if source:
+            options["default_source"] = source
+        return import_history(path, self.history_path(), **options)
+
+    # Хранение
+
+    def compress_storage(self) -> dict:
+        """
+        Переводит историю курсов, журналы сделок и состояния P&L в режим
+        хранения движка (DATA_COMPRESSION); возвращает число файлов по видам
+        Файлы одного назначения в разных режимах сливаются: записи истории
+        объединяются, журналы склеиваются от старого файла к новому и
+        перепаковываются в один сжатый блок. Состояния P&L перестроенных
+        журналов удаляются и строятся заново при следующем обращении.
+        Вызывается, пока движок не обслуживает сделки.
+        """
+        summary = {"history": 0, "journals": 0, "states": 0}
+        history = Path(self.config["HISTORY_FILE"])
+        sources = _oldest_first(stored_variants(history))
+        if len(sources) > 1:
+            records = {}
+            for source in sources:
+                records |= load_json(source)
+            save_json(history, records)
+            for source in sources:
+                if source != history:
+                    source.unlink()
+            summary["history"] += len(sources)
+        elif sources and sources[0] != history:
+            recompress(sources[0], history)
+            summary["history"] += 1
+
+        ledger_dir = Path(self.config["LEDGER_DIR"])
+        if not ledger_dir.is_dir():
+            return summary
+        codec, suffix = self.ledger.codec, self.ledger.suffix
+        user_ids = sorted(
+            {
+                Path(plain_path(source)).stem
+                for source in ledger_dir.glob("*.jsonl*")
+                if codec_for(source) is not None or source.name.endswith(".jsonl")
+            }
+        )
+        for user_id in user_ids:
+            target = ledger_dir / f"{user_id}.jsonl{suffix}"
+            sources = _oldest_first(stored_variants(target))
+            if sources == [target] and codec is None:
+                continue
+            merge_files(sources, target)
+            for state in path_variants(ledger_dir / f"{user_id}.pnl.json"):
+                state.unlink(missing_ok=True)
+            summary["journals"] += len(sources)
+
+        for source in sorted(ledger_dir.glob("*.pnl.json*")):
+            if codec_for(source) is None and not source.name.endswith(".pnl.json"):
+                continue
+            target = Path(compressed_path(source, codec))
+            found = stored_variants(target)
+            if len(found) > 1:
+                # Какое из состояний отвечает журналу, неизвестно: оба
+                # удаляются и строятся заново
+                for state in found:
+                    state.unlink()
+            elif found and found[0] != target:
+                recompress(found[0], target)
+                summary["states"] += 1
+        return summary
+
+    # Метрики
+
+    def collect_metrics(self) -> list[Family]:
+        """
+        Метрики, вычисляемые при экспорте: возраст курсов и размеры данных
+        Подключается к metrics.REGISTRY через register_collector.
+        """
+        now = time.time()
+        table = self._load_rates()
+        rate_ages = [
+            ({"pair": pair}, now - updated)
+            for pair, updated in sorted(
+                (pair_key(from_id, to_id), table.updated[cell])
+                for from_id, to_id, cell in table
+            )
+            if updated != -math.inf
+        ]
+
+        ledger_dir = Path(self.config["LEDGER_DIR"])
+        ledger_bytes = (
+            sum(path.stat().st_size for path in ledger_dir.glob("*.jsonl*"))
+            if ledger_dir.is_dir()
+            else 0
+        )
+        try:
+            history_bytes = os.stat(self.history_path()).st_size
+        except FileNotFoundError:
+            history_bytes = 0
+
+        return [
+            (
+                "valutatrade_rate_age_seconds",
+                "gauge",
+                "Возраст курса в кэше rates.json",
+                rate_ages,
+            ),
+            (
+                "valutatrade_rates_cached_pairs",
+                "gauge",
+                "Число пар в кэше курсов",
+                [({}, len(table))],
+            ),
+            (
+                "valutatrade_open_orders",
+                "gauge",
+                "Отложенные заявки",
+                [({}, len(self.orders))],
+            ),
+            (
+                "valutatrade_ledger_bytes",
+                "gauge",
+                "Размер журналов сделок",
+                [({}, ledger_bytes)],
+            ),
+            (
+                "valutatrade_history_bytes",
+                "gauge",
+                "Размер истории курсов",
+                [({}, history_bytes)],
+            ),
+        ]
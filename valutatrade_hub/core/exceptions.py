@@ -32,3 +32,18 @@ class ApiRequestError(Exception):
     def __init__(self, reason: str):
         super().__init__(f"Ошибка при обращении к внешнему API: {reason}")
         self.reason = reason
+
+
+class QuoteExpiredError(Exception):
+    """
+    Ошибка при попытке совершить сделку по котировке с истёкшим сроком.
+    """
+
+    def __init__(self, from_code: str, to_code: str, expires_at: float):
+        super().__init__(
+            f"Котировка {from_code}->{to_code} устарела. "
+            "Запросите курс заново и повторите сделку."
+        )
+        self.from_code = from_code
+        self.to_code = to_code
+        self.expires_at = expires_at
@@ -0,0 +1,295 @@
+"""
+Колоночный формат истории курсов (exchange_rates.vth).
+exchange_rates.json хранит историю одним JSON-объектом, и любой запрос
+разбирает его целиком. В колоночном файле записи сгруппированы по парам,
+внутри пары отсортированы по времени и лежат тремя массивами:
+время (int64, микросекунды Unix, UTC), курс (float64) и id источника
+(uint16). Файл читается через mmap: массивы - memoryview без копирования,
+поиск периода - бинарный поиск по времени, поэтому запрос за период
+затрагивает только нужные страницы файла.
+
+Раскладка файла (little-endian, как и память платформ, где он читается):
+- заголовок: магическое число, смещение и длина индекса;
+- сегменты пар, выровненные по 8 байт;
+- индекс (JSON): источники, пары со смещениями массивов, а также размер и
+  время изменения exchange_rates.json, из которого файл построен.
+Файл создаётся конвертером convert_history и не дописывается: после
+обновления истории его нужно построить заново (до тех пор читается JSON).
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from heapq import merge
+from typing import Iterator
+
+from valutatrade_hub.core.rates import Interner, split_pair
+from valutatrade_hub.core.utils import load_json
+
+MAGIC = b"VTHIST\x00\x01"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sQQ")
+_ALIGN = 8
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_micros(value: str) -> int:
+    """
+    Время ISO-строкой -> микросекунды Unix
+    Время без часового пояса считается UTC, как и "Z" на конце.
+    """
+    moment = datetime.fromisoformat(value.rstrip("Z"))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (moment - _EPOCH) // _MICROSECOND
+
+
+def from_micros(micros: int) -> str:
+    moment = _EPOCH + timedelta(microseconds=micros)
+    return moment.replace(tzinfo=None).isoformat(sep=" ")
+
+
+def _source_stat(path) -> dict | None:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _write_column(f, column: array) -> int:
+    """
+    Пишет массив с выравниванием; возвращает смещение его начала
+    """
+    offset = f.tell()
+    padding = -offset % _ALIGN
+    if padding:
+        f.write(b"\x00" * padding)
+        offset += padding
+    f.write(column.tobytes())
+    return offset
+
+
+def _check_byteorder() -> None:
+    # Массивы читаются memoryview в порядке байтов платформы
+    if sys.byteorder != "little":
+        raise ValueError("Колоночная история поддерживается только на little-endian")
+
+
+def convert_history(source, target) -> dict:
+    """
+    Строит колоночный файл target из exchange_rates.json source
+    Записи без разбираемого времени или курса пропускаются.
+    Возвращает сводку: число записей, пар и пропущенных записей.
+    """
+    _check_byteorder()
+    source_stat = _source_stat(source)
+    sources = Interner()
+    columns: dict[str, tuple[array, array, array]] = {}
+    skipped = 0
+    for record in load_json(source).values():
+        try:
+            pair = f"{record['from_currency']}_{record['to_currency']}"
+            timestamp = to_micros(record["timestamp"])
+            rate = float(record["rate"])
+        except (KeyError, TypeError, ValueError):
+            skipped += 1
+            continue
+        segment = columns.get(pair)
+        if segment is None:
+            segment = columns[pair] = (array("q"), array("d"), array("H"))
+        segment[0].append(timestamp)
+        segment[1].append(rate)
+        segment[2].append(sources.intern(record.get("source")))
+
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    index = {
+        "version": FORMAT_VERSION,
+        "source": source_stat,
+        "sources": sources.values,
+        "pairs": [],
+    }
+    records = 0
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, 0, 0))
+        for pair in sorted(columns):
+            timestamps, rates, source_ids = columns[pair]
+            # История обычно дописывается по времени - сортировка редко нужна
+            if any(a > b for a, b in zip(timestamps, timestamps[1:])):
+                order = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+                timestamps = array("q", (timestamps[i] for i in order))
+                rates = array("d", (rates[i] for i in order))
+                source_ids = array("H", (source_ids[i] for i in order))
+            index["pairs"].append(
+                {
+                    "pair": pair,
+                    "count": len(timestamps),
+                    "timestamps": _write_column(f, timestamps),
+                    "rates": _write_column(f, rates),
+                    "sources": _write_column(f, source_ids),
+                }
+            )
+            records += len(timestamps)
+        index_offset = f.tell()
+        payload = json.dumps(index, ensure_ascii=False).encode("utf-8")
+        f.write(payload)
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, index_offset, len(payload)))
+    os.replace(tmp_path, target)
+    return {"records": records, "pairs": len(columns), "skipped": skipped}
+
+
+class Segment:
+    """
+    История одной пары: массивы-представления над отображённым файлом
+    """
+
+    __slots__ = ("pair", "timestamps", "rates", "sources")
+
+    def __init__(
+        self, pair: str, timestamps: memoryview, rates: memoryview, sources: memoryview
+    ) -> None:
+        self.pair = pair
+        self.timestamps = timestamps
+        self.rates = rates
+        self.sources = sources
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def bounds(
+        self, since: int | None = None, until: int | None = None
+    ) -> tuple[int, int]:
+        """
+        Диапазон индексов записей со временем в [since, until] (микросекунды)
+        """
+        start = 0 if since is None else bisect_left(self.timestamps, since)
+        stop = (
+            len(self.timestamps)
+            if until is None
+            else bisect_right(self.timestamps, until, start)
+        )
+        return start, stop
+
+    def to_numpy(self):
+        """
+        Массивы NumPy поверх тех же страниц (без копирования)
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise ValueError("Для to_numpy требуется пакет numpy") from None
+        return (
+            numpy.frombuffer(self.timestamps, dtype="<i8"),
+            numpy.frombuffer(self.rates, dtype="<f8"),
+            numpy.frombuffer(self.sources, dtype="<u2"),
+        )
+
+    def _release(self) -> None:
+        for view in (self.timestamps, self.rates, self.sources):
+            view.release()
+
+
+class HistoryFile:
+    """
+    Колоночный файл истории, отображённый в память
+    Массивы сегментов действительны до close() (или выхода из with);
+    незакрытый файл освобождается вместе с последней ссылкой на него.
+    """
+
+    def __init__(self, path) -> None:
+        _check_byteorder()
+        self.path = path
+        self.segments: dict[str, Segment] = {}
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        try:
+            magic, index_offset, index_length = _HEADER.unpack_from(self._view)
+            if magic != MAGIC:
+                raise ValueError("неизвестный формат")
+            index = json.loads(
+                bytes(self._view[index_offset : index_offset + index_length])
+            )
+            self.source: dict | None = index.get("source")
+            self.sources: list[str | None] = index["sources"]
+            for entry in index["pairs"]:
+                count = entry["count"]
+                self.segments[entry["pair"]] = Segment(
+                    entry["pair"],
+                    self._column(entry["timestamps"], count, "q"),
+                    self._column(entry["rates"], count, "d"),
+                    self._column(entry["sources"], count, "H"),
+                )
+        except (struct.error, KeyError, TypeError, ValueError) as e:
+            self.close()
+            raise ValueError(f"Повреждённый файл истории {path}: {e}") from None
+
+    def _column(self, offset: int, count: int, typecode: str) -> memoryview:
+        size = struct.calcsize(typecode)
+        return self._view[offset : offset + count * size].cast(typecode)
+
+    def __enter__(self) -> "HistoryFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._mmap is None:
+            return
+        for segment in self.segments.values():
+            segment._release()
+        self._view.release()
+        self._mmap.close()
+        self._mmap = None
+
+    def __len__(self) -> int:
+        return sum(len(segment) for segment in self.segments.values())
+
+    def is_current(self, source) -> bool:
+        """
+        Построен ли файл из текущей версии exchange_rates.json
+        """
+        return self.source == _source_stat(source)
+
+    def _records(
+        self, segment: Segment, since: int | None, until: int | None
+    ) -> Iterator[tuple[int, str, float, str | None]]:
+        start, stop = segment.bounds(since, until)
+        timestamps, rates, sources = segment.timestamps, segment.rates, segment.sources
+        for i in range(start, stop):
+            yield timestamps[i], segment.pair, rates[i], self.sources[sources[i]]
+
+    def iter_records(
+        self,
+        pair: str | None = None,
+        since: int | None = None,
+        until: int | None = None,
+    ) -> Iterator[dict]:
+        """
+        Записи в формате iter_history за период [since, until] (микросекунды)
+        Без пары записи всех пар сливаются по времени.
+        """
+        if pair is not None:
+            split_pair(pair)
+            segment = self.segments.get(pair)
+            streams = [self._records(segment, since, until)] if segment else []
+        else:
+            streams = [
+                self._records(segment, since, until)
+                for segment in self.segments.values()
+            ]
+        for timestamp, pair_name, rate, source in merge(*streams):
+            yield {
+                "pair": pair_name,
+                "rate": rate,
+                "timestamp": from_micros(timestamp),
+                "source": source,
+            }
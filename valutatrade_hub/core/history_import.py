@@ -0,0 +1,434 @@
+"""
+Массовый импорт исторических курсов в exchange_rates.json.
+Входной файл - CSV с заголовком или NDJSON (можно сжатый: .gz, .xz, .zst) -
+читается потоком пачками по chunk_size записей. Пачка проверяется по
+столбцам: коды валют, курсы и время преобразуются одним проходом map по
+столбцу, и только в пачке с ошибкой значения разбираются по одному, чтобы
+найти плохие записи. Дубликаты (пара, момент времени) отсекаются по
+индексу идемпотентности истории (history_index), который пополняется
+ключами импортированных записей; сама история не читается. Новые записи
+дописываются в конец JSON-объекта истории: несжатый файл - на месте,
+сжатый - потоковой перезаписью.
+"""
+
+import csv
+import io
+import json
+import math
+import os
+import re
+import time
+from itertools import islice
+from json.encoder import encode_basestring
+from pathlib import Path
+from typing import Iterator
+
+from valutatrade_hub.core.history import to_micros
+from valutatrade_hub.core.history_index import locked_index, record_key
+from valutatrade_hub.core.rates import PAIR_SEPARATOR
+from valutatrade_hub.infra.compression import (
+    CHUNK_SIZE,
+    codec_for,
+    codec_stream,
+    open_file,
+    plain_path,
+)
+
+IMPORT_FORMATS = ("csv", "ndjson")
+DEFAULT_CHUNK_SIZE = 50_000
+DEFAULT_SOURCE = "import"
+# Сколько ошибочных записей перечислить в сводке
+MAX_REPORTED_ERRORS = 5
+
+_CODE_PATTERN = re.compile(r"[A-Z0-9]{2,12}")
+# Окно в конце файла, в котором ищется закрывающая скобка объекта
+_TAIL_SIZE = 4096
+
+_FORMAT_SUFFIXES = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+# Строка NDJSON, которая не разбирается как объект
+_BROKEN = (None,) * 4
+_COLUMN_ALIASES = {
+    "from": "from_currency",
+    "to": "to_currency",
+    "updated_at": "timestamp",
+}
+
+
+def _split_tail(tail: bytes, path) -> tuple[bytes, bool]:
+    """
+    Конец файла без закрывающей скобки объекта и признак пустого объекта
+    """
+    body = tail.rstrip()
+    if not body.endswith(b"}"):
+        raise ValueError(f"Повреждённый файл истории {path}: нет конца объекта")
+    body = body[:-1].rstrip()
+    if not body:
+        raise ValueError(f"Повреждённый файл истории {path}: нет начала объекта")
+    return body, body.endswith(b"{")
+
+
+class HistoryAppender:
+    """
+    Дописывает записи в конец JSON-объекта истории
+    Несжатый файл дописывается на месте, и после каждой пачки он снова
+    целый JSON. Сжатый переписывается потоком во временный файл, который
+    заменяет исходный при закрытии, а при ошибке удаляется.
+    Записи передаются готовым текстом в раскладке save_json.
+    """
+
+    def __init__(self, path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.codec = codec_for(self.path)
+        if self.codec is None:
+            self._open_plain()
+        else:
+            self._open_compressed()
+
+    def _open_plain(self) -> None:
+        mode = "r+b" if self.path.exists() and self.path.stat().st_size else "w+b"
+        self._file = open(self.path, mode)
+        if mode == "w+b":
+            self._file.write(b"{}")
+            self._position, self._empty = 1, True
+            return
+        end = self._file.seek(0, os.SEEK_END)
+        start = max(0, end - _TAIL_SIZE)
+        self._file.seek(start)
+        body, self._empty = _split_tail(self._file.read(), self.path)
+        self._position = start + len(body)
+
+    def _open_compressed(self) -> None:
+        self._tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        self._file = open(self._tmp_path, "wb")
+        self._stream = codec_stream(self._file, self.codec, "w")
+        if not self.path.exists():
+            self._stream.write(b"{")
+            self._empty = True
+            return
+        # Последние байты придерживаются: в них закрывающая скобка
+        tail = b""
+        with open_file(self.path, "rb") as src:
+            while chunk := src.read(CHUNK_SIZE):
+                tail += chunk
+                if len(tail) > 2 * _TAIL_SIZE:
+                    self._stream.write(tail[:-_TAIL_SIZE])
+                    tail = tail[-_TAIL_SIZE:]
+        if not tail.strip():
+            body, self._empty = b"{", True
+        else:
+            body, self._empty = _split_tail(tail, self.path)
+        self._stream.write(body)
+
+    def write(self, entries: bytes) -> None:
+        if not entries:
+            return
+        data = (b"\n" if self._empty else b",\n") + entries
+        self._empty = False
+        if self.codec is not None:
+            self._stream.write(data)
+            return
+        self._file.seek(self._position)
+        self._file.write(data + b"\n}")
+        self._file.truncate()
+        self._position += len(data)
+
+    def close(self) -> None:
+        if self.codec is not None:
+            self._stream.write(b"\n}")
+            self._stream.close()
+            self._file.close()
+            os.replace(self._tmp_path, self.path)
+        else:
+            self._file.close()
+
+    def abort(self) -> None:
+        """
+        Закрывает файл без замены: сжатая история остаётся прежней
+        """
+        if self.codec is not None:
+            self._stream.close()
+            self._file.close()
+            self._tmp_path.unlink(missing_ok=True)
+        else:
+            self._file.close()
+
+    def __enter__(self) -> "HistoryAppender":
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def format_entry(
+    from_code: str, to_code: str, rate: float, timestamp: str, source: str
+) -> str:
+    """
+    Запись истории в раскладке save_json (indent=4) с ключом верхнего уровня
+    """
+    record_id = encode_basestring(f"{from_code}{PAIR_SEPARATOR}{to_code}_{timestamp}")
+    return (
+        f"    {record_id}: {{\n"
+        f"        \"id\": {record_id},\n"
+        f"        \"from_currency\": \"{from_code}\",\n"
+        f"        \"to_currency\": \"{to_code}\",\n"
+        f"        \"rate\": {rate!r},\n"
+        f"        \"timestamp\": {encode_basestring(timestamp)},\n"
+        f"        \"source\": {encode_basestring(source)},\n"
+        "        \"meta\": {\n"
+        "            \"raw_id\": null\n"
+        "        }\n"
+        "    }"
+    )
+
+
+def format_records(records: dict) -> str:
+    """
+    Записи {id: запись} в раскладке save_json (indent=4) через запятую
+    """
+    return ",\n".join(
+        json.dumps({key: value}, indent=4, ensure_ascii=False)[2:-2]
+        for key, value in records.items()
+    )
+
+
+def detect_format(path) -> str:
+    suffix = os.path.splitext(plain_path(path))[1].lower()
+    fmt = _FORMAT_SUFFIXES.get(suffix)
+    if fmt is None:
+        raise ValueError(
+            f"Не удалось определить формат файла {path}: укажите --input-format "
+            f"({', '.join(IMPORT_FORMATS)})"
+        )
+    return fmt
+
+
+def _csv_batches(f, chunk_size: int) -> Iterator[list[tuple]]:
+    """
+    Пачки записей CSV: (пара, курс, время, источник)
+    """
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = {}
+    for i, name in enumerate(header):
+        name = name.strip().lower()
+        columns[_COLUMN_ALIASES.get(name, name)] = i
+    has_pair = "pair" in columns
+    if not has_pair and not {"from_currency", "to_currency"} <= columns.keys():
+        raise ValueError(
+            "В заголовке CSV нет столбца pair или from_currency/to_currency"
+        )
+    for name in ("rate", "timestamp"):
+        if name not in columns:
+            raise ValueError(f"В заголовке CSV нет столбца {name}")
+
+    width = max(columns.values()) + 1
+    pair_i = columns.get("pair")
+    from_i, to_i = columns.get("from_currency"), columns.get("to_currency")
+    rate_i, time_i = columns["rate"], columns["timestamp"]
+    source_i = columns.get("source")
+    while rows := list(islice(reader, chunk_size)):
+        batch = []
+        for row in rows:
+            if len(row) < width:
+                # Короткая строка: недостающие поля пустые и не пройдут проверку
+                row = row + [""] * (width - len(row))
+            batch.append(
+                (
+                    row[pair_i]
+                    if has_pair
+                    else f"{row[from_i]}{PAIR_SEPARATOR}{row[to_i]}",
+                    row[rate_i],
+                    row[time_i],
+                    row[source_i] if source_i is not None else None,
+                )
+            )
+        yield batch
+
+
+def _ndjson_batches(f, chunk_size: int) -> Iterator[list[tuple]]:
+    """
+    Пачки записей NDJSON в том же виде, что и у CSV
+    """
+    while lines := list(islice(f, chunk_size)):
+        batch = []
+        for line in lines:
+            if not line.strip():
+                batch.append(None)
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = None
+            if not isinstance(record, dict):
+                batch.append(_BROKEN)
+                continue
+            get = record.get
+            pair = get("pair")
+            if pair is None:
+                from_code = get("from_currency", get("from"))
+                to_code = get("to_currency", get("to"))
+                if isinstance(from_code, str) and isinstance(to_code, str):
+                    pair = f"{from_code}{PAIR_SEPARATOR}{to_code}"
+            batch.append(
+                (
+                    pair,
+                    get("rate"),
+                    get("timestamp", get("updated_at")),
+                    get("source"),
+                )
+            )
+        yield batch
+
+
+def _convert_column(convert, values) -> list:
+    """
+    Столбец значений через convert; неразобранные значения -> None
+    Обычно пачка корректна и проходит одним map; по одному значения
+    разбираются, только если в пачке есть ошибка.
+    """
+    try:
+        return list(map(convert, values))
+    except (AttributeError, TypeError, ValueError):
+        pass
+    result = []
+    for value in values:
+        try:
+            result.append(convert(value))
+        except (AttributeError, TypeError, ValueError):
+            result.append(None)
+    return result
+
+
+def _convert_repeated(convert, values) -> list:
+    """
+    Как _convert_column, но каждое различное значение разбирается один раз:
+    пар и источников в пачке немного, а записей - тысячи
+    """
+    try:
+        unique = list(dict.fromkeys(values))
+    except TypeError:
+        # Несравнимые значения (списки и объекты из NDJSON)
+        return _convert_column(convert, values)
+    converted = dict(zip(unique, _convert_column(convert, unique)))
+    return list(map(converted.__getitem__, values))
+
+
+def _pair(value) -> tuple[str, str, str]:
+    """
+    " btc_usd" -> ("BTC_USD", "BTC", "USD")
+    """
+    from_code, _, to_code = value.strip().upper().partition(PAIR_SEPARATOR)
+    if (
+        from_code == to_code
+        or not _CODE_PATTERN.fullmatch(from_code)
+        or not _CODE_PATTERN.fullmatch(to_code)
+    ):
+        raise ValueError(value)
+    return f"{from_code}{PAIR_SEPARATOR}{to_code}", from_code, to_code
+
+
+def _rate(value) -> float:
+    rate = float(value)
+    if not math.isfinite(rate) or rate <= 0:
+        raise ValueError(value)
+    return rate
+
+
+def _timestamp(value) -> str:
+    return value.strip()
+
+
+def import_history(
+    source,
+    history_path,
+    fmt: str | None = None,
+    default_source: str = DEFAULT_SOURCE,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> dict:
+    """
+    Импортирует курсы из файла source в историю history_path
+    Возвращает сводку: прочитано, импортировано, дубликатов, с ошибками,
+    первые ошибки (номер записи, причина) и время в секундах.
+    """
+    started = time.perf_counter()
+    fmt = fmt or detect_format(source)
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(
+            f"Неизвестный формат '{fmt}': допустимы {', '.join(IMPORT_FORMATS)}"
+        )
+    if chunk_size < 1:
+        raise ValueError("Размер пачки должен быть положительным")
+
+    summary = {"read": 0, "imported": 0, "duplicates": 0, "invalid": 0}
+    errors: list[tuple[int, str]] = []
+
+    def reject(number: int, reason: str) -> None:
+        summary["invalid"] += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append((number, reason))
+
+    # Номер первой записи: в CSV строка 1 - заголовок
+    number = 2 if fmt == "csv" else 1
+    batches = _csv_batches if fmt == "csv" else _ndjson_batches
+    with (
+        open_file(source, "rb") as raw,
+        io.TextIOWrapper(raw, "utf-8", newline="") as f,
+        locked_index(history_path) as index,
+        HistoryAppender(history_path) as appender,
+    ):
+        for batch in batches(f, chunk_size):
+            first_number = number
+            number += len(batch)
+            batch = [
+                (first_number + i, row) for i, row in enumerate(batch) if row
+            ]
+            summary["read"] += len(batch)
+            if not batch:
+                continue
+            numbers, rows = zip(*batch)
+            pair_col, rate_col, time_col, source_col = zip(*rows)
+            pairs = _convert_repeated(_pair, pair_col)
+            rates = _convert_column(_rate, rate_col)
+            timestamps = _convert_column(_timestamp, time_col)
+            micros = _convert_column(to_micros, timestamps)
+            sources = _convert_repeated(str, source_col)
+
+            entries = []
+            for i, line in enumerate(numbers):
+                if rows[i] is _BROKEN:
+                    reject(line, "запись не разобрана")
+                    continue
+                if pairs[i] is None:
+                    reject(line, "некорректная пара")
+                    continue
+                if rates[i] is None:
+                    reject(line, "некорректный курс")
+                    continue
+                if micros[i] is None:
+                    reject(line, "некорректное время")
+                    continue
+                pair, from_code, to_code = pairs[i]
+                if not index.add(record_key(pair, micros[i])):
+                    summary["duplicates"] += 1
+                    continue
+                entries.append(
+                    format_entry(
+                        from_code,
+                        to_code,
+                        rates[i],
+                        timestamps[i],
+                        sources[i] if source_col[i] else default_source,
+                    )
+                )
+            appender.write(",\n".join(entries).encode("utf-8"))
+            summary["imported"] += len(entries)
+
+    summary["errors"] = errors
+    summary["seconds"] = time.perf_counter() - started
+    return summary
@@ -0,0 +1,403 @@
+"""
+Индекс идемпотентности истории курсов (exchange_rates.idx).
+Проверка "такая запись уже есть" не читает историю: ключи записей хранятся
+рядом с ней в файле-индексе, отображённом в память. Ключ - пара и момент
+времени (в микросекундах UTC, поэтому разная запись одного времени
+совпадает) - сводится к 64-битному отпечатку blake2b. Отпечаток сначала
+проверяется блочным фильтром Блума (10 бит на ключ, ~2% ложных
+срабатываний) и только при положительном ответе - по хеш-таблице
+отпечатков с открытой адресацией. Новые ключи - обычный случай при
+обновлении и импорте курсов - отсекаются по одному слову фильтра, не
+затрагивая страницы таблицы.
+Совпадение отпечатков разных ключей практически исключено: для миллиона
+записей его вероятность порядка 1e-8.
+
+Раскладка файла (порядок байтов платформы, он записан в магическом числе):
+- заголовок: магическое число, число хешей фильтра, размеры фильтра и
+  таблицы, число ключей, размер и время изменения файла истории, с которым
+  индекс согласован;
+- фильтр Блума;
+- таблица отпечатков (uint64, 0 - пустая ячейка).
+Если индекса нет, он повреждён или история изменена в обход него, индекс
+перестраивается одним потоковым проходом по ключам истории.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from valutatrade_hub.core.history import to_micros
+from valutatrade_hub.core.rates import PAIR_SEPARATOR
+from valutatrade_hub.core.utils import load_json
+from valutatrade_hub.infra.compression import open_file, plain_path
+
+try:
+    import fcntl
+except ImportError:  # Windows: запись истории без межпроцессной блокировки
+    fcntl = None
+
+MAGIC = b"VTIDX\x01" + (b"LE" if sys.byteorder == "little" else b"BE")
+_HEADER = struct.Struct("=8sIQQQqq")
+_HEADER_SIZE = 64
+# Блочный фильтр: все биты ключа - в одном 64-битном слове, и проверка
+# читает одно слово. Номера битов ключа в слове задают 6-битные группы
+# отпечатка выше _BLOOM_SHIFT
+_BLOOM_BITS_PER_KEY = 10
+_BLOOM_HASHES = 7
+_BLOOM_SHIFT = 22
+_BIT = [1 << i for i in range(64)]
+_MIN_CAPACITY = 1024
+_EMPTY = 0
+# Отметки в заголовке вместо размера и времени изменения истории
+_MISSING = (-1, -1)
+_STALE = (-2, -2)
+
+# Ключ записи верхнего уровня в файле, записанном save_json (indent=4):
+# строка '    "ключ": {' (литеральное начало ускоряет поиск)
+_TOP_KEY = re.compile(rb'\n    "([^"\\\n]*(?:\\.[^"\\\n]*)*)": \{\r?\n')
+_SCAN_SIZE = 1 << 20
+
+
+def history_key(record_id: str) -> str:
+    """
+    Ключ идемпотентности записи истории по её id
+    "BTC_USD_2026-01-13T23:35:14Z" -> "BTC_USD_1768347314000000": время
+    приводится к микросекундам UTC. id, не похожий на пару и время,
+    остаётся ключом как есть.
+    """
+    from_code, _, rest = record_id.partition(PAIR_SEPARATOR)
+    to_code, _, timestamp = rest.partition(PAIR_SEPARATOR)
+    try:
+        micros = to_micros(timestamp)
+    except ValueError:
+        return record_id
+    return record_key(f"{from_code}{PAIR_SEPARATOR}{to_code}", micros)
+
+
+def record_key(pair: str, micros: int) -> str:
+    return f"{pair}{PAIR_SEPARATOR}{micros}"
+
+
+def _decode_keys(keys: list[bytes]) -> list[str]:
+    if any(b"\\" in key for key in keys):
+        return [json.loads(b'"' + key + b'"') for key in keys]
+    return [key.decode() for key in keys]
+
+
+def iter_history_ids(path) -> Iterator[str]:
+    """
+    Ключи записей истории потоком, без разбора самих записей
+    Файл в другой раскладке, чем у save_json, читается целиком.
+    """
+    path = Path(path)
+    if not path.exists():
+        return
+    with open_file(path, "rb") as f:
+        first = f.readline()
+        if first.rstrip() != b"{":
+            if first.strip():
+                yield from load_json(path)
+            return
+        # Блоки режутся по переводу строки: он остаётся и в конце блока, и в
+        # начале следующего, поэтому строка ключа не разрывается
+        rest = b"\n"
+        while chunk := f.read(_SCAN_SIZE):
+            data = rest + chunk
+            cut = data.rfind(b"\n")
+            rest = data[cut:]
+            yield from _decode_keys(_TOP_KEY.findall(data, 0, cut + 1))
+        yield from _decode_keys(_TOP_KEY.findall(rest + b"\n"))
+
+
+def fingerprint(key: str) -> int:
+    """
+    64-битный отпечаток ключа (ненулевой: 0 - пустая ячейка таблицы)
+    """
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+def _bloom_mask(value: int) -> int:
+    """
+    Биты отпечатка в слове фильтра (_BLOOM_HASHES групп по 6 бит)
+    """
+    bits = value >> _BLOOM_SHIFT
+    return (
+        _BIT[bits & 63]
+        | _BIT[bits >> 6 & 63]
+        | _BIT[bits >> 12 & 63]
+        | _BIT[bits >> 18 & 63]
+        | _BIT[bits >> 24 & 63]
+        | _BIT[bits >> 30 & 63]
+        | _BIT[bits >> 36 & 63]
+    )
+
+
+def index_path(history_path) -> Path:
+    """
+    Файл индекса рядом с историей: data/exchange_rates.json(.gz) ->
+    data/exchange_rates.idx
+    """
+    return Path(plain_path(history_path)).with_suffix(".idx")
+
+
+def _history_stat(history_path) -> tuple[int, int]:
+    try:
+        stat = os.stat(history_path)
+    except FileNotFoundError:
+        return _MISSING
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _layout(capacity: int) -> tuple[int, int]:
+    """
+    Размер фильтра в байтах и число ячеек таблицы для capacity ключей
+    Таблица заполняется не больше чем наполовину.
+    """
+    slots = 1 << (2 * max(capacity, _MIN_CAPACITY) - 1).bit_length()
+    # Фильтр рассчитан на предельное заполнение таблицы
+    bloom_bytes = -(-(slots // 2) * _BLOOM_BITS_PER_KEY // 64) * 8
+    return bloom_bytes, slots
+
+
+class HistoryIndex:
+    """
+    Отображённый в память индекс ключей истории
+    Изменения попадают в файл сразу. Первое изменение отмечает индекс
+    устаревшим, commit() - согласованным с текущей версией истории;
+    устаревший индекс при следующем открытии перестраивается.
+    """
+
+    def __init__(self, path, history_path) -> None:
+        self.path = Path(path)
+        self.history_path = history_path
+        self.rebuilt = False
+        self._dirty = False
+        self._mmap = None
+        self._open()
+
+    def _open(self) -> None:
+        with open(self.path, "r+b") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0)
+        try:
+            (
+                magic,
+                self.hashes,
+                bloom_bytes,
+                self.slots,
+                self.count,
+                *source,
+            ) = _HEADER.unpack_from(self._mmap)
+            size = _HEADER_SIZE + bloom_bytes + self.slots * 8
+            if (
+                magic != MAGIC
+                or len(self._mmap) != size
+                or self.slots & (self.slots - 1)
+                or self.hashes != _BLOOM_HASHES
+                or not 0 <= self.count <= self.slots // 2
+            ):
+                raise ValueError(f"Повреждённый индекс истории {self.path}")
+        except (struct.error, ValueError):
+            self.close()
+            raise
+        self.source = tuple(source)
+        self._blocks = bloom_bytes // 8
+        view = memoryview(self._mmap)
+        self._bloom = view[_HEADER_SIZE : _HEADER_SIZE + bloom_bytes].cast("Q")
+        self._table = view[_HEADER_SIZE + bloom_bytes :].cast("Q")
+        view.release()
+
+    @classmethod
+    def create(
+        cls, path, history_path, keys=(), capacity: int = 0
+    ) -> "HistoryIndex":
+        """
+        Новый индекс из ключей (или их отпечатков - целых чисел)
+        Файл пишется рядом и атомарно заменяет прежний; индекс устаревший,
+        пока не вызван commit().
+        """
+        fingerprints = {
+            key if isinstance(key, int) else fingerprint(key) for key in keys
+        }
+        bloom_bytes, slots = _layout(max(capacity, 2 * len(fingerprints)))
+        path = Path(path)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.truncate(_HEADER_SIZE + bloom_bytes + slots * 8)
+        with open(tmp_path, "r+b") as f, mmap.mmap(f.fileno(), 0) as mapped:
+            _HEADER.pack_into(
+                mapped, 0, MAGIC, _BLOOM_HASHES, bloom_bytes, slots, 0, *_STALE
+            )
+        index = cls(tmp_path, history_path)
+        try:
+            for value in fingerprints:
+                index._insert(value)
+            index._store_header(_STALE)
+            index.close()
+            os.replace(tmp_path, path)
+        except BaseException:
+            index.close()
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return cls(path, history_path)
+
+    @classmethod
+    def rebuild(cls, history_path, path=None) -> "HistoryIndex":
+        """
+        Индекс по текущей истории, согласованный с ней
+        """
+        path = path or index_path(history_path)
+        stat = _history_stat(history_path)
+        keys = map(history_key, iter_history_ids(history_path))
+        index = cls.create(path, history_path, keys)
+        index.rebuilt = True
+        index.commit(stat)
+        return index
+
+    @classmethod
+    def load(cls, history_path, path=None) -> "HistoryIndex":
+        """
+        Индекс истории; отсутствующий, повреждённый или устаревший
+        перестраивается
+        """
+        path = path or index_path(history_path)
+        try:
+            index = cls(path, history_path)
+        except (OSError, struct.error, ValueError):
+            return cls.rebuild(history_path, path)
+        if index.source != _history_stat(history_path):
+            index.close()
+            return cls.rebuild(history_path, path)
+        return index
+
+    def close(self) -> None:
+        if self._mmap is None:
+            return
+        for view in ("_table", "_bloom"):
+            if hasattr(self, view):
+                getattr(self, view).release()
+                delattr(self, view)
+        self._mmap.close()
+        self._mmap = None
+
+    def __enter__(self) -> "HistoryIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _find(self, value: int) -> tuple[int, bool]:
+        """
+        Ячейка отпечатка в таблице и признак, что он там есть
+        """
+        table, mask = self._table, self.slots - 1
+        slot = value & mask
+        while True:
+            current = table[slot]
+            if current == value:
+                return slot, True
+            if current == _EMPTY:
+                return slot, False
+            slot = (slot + 1) & mask
+
+    def _contains(self, value: int) -> bool:
+        mask = _bloom_mask(value)
+        if self._bloom[value % self._blocks] & mask != mask:
+            return False
+        return self._find(value)[1]
+
+    def __contains__(self, key: str) -> bool:
+        return self._contains(fingerprint(key))
+
+    def _insert(self, value: int) -> bool:
+        slot, found = self._find(value)
+        if found:
+            return False
+        self._table[slot] = value
+        self._bloom[value % self._blocks] |= _bloom_mask(value)
+        self.count += 1
+        return True
+
+    def add(self, key: str) -> bool:
+        """
+        Добавляет ключ; False - ключ уже был
+        Заполненная наполовину таблица переписывается вдвое большей.
+        """
+        value = fingerprint(key)
+        if not self._dirty:
+            self.invalidate()
+        if self.count + 1 > self.slots // 2:
+            if self._contains(value):
+                return False
+            self._grow()
+        return self._insert(value)
+
+    def _grow(self) -> None:
+        # Отпечатки переносятся из таблицы: история не читается
+        values = [value for value in self._table if value != _EMPTY]
+        self.close()
+        HistoryIndex.create(
+            self.path, self.history_path, values, capacity=2 * len(values)
+        ).close()
+        self._open()
+
+    def _store_header(self, source: tuple[int, int]) -> None:
+        _HEADER.pack_into(
+            self._mmap,
+            0,
+            MAGIC,
+            self.hashes,
+            self._blocks * 8,
+            self.slots,
+            self.count,
+            *source,
+        )
+
+    def invalidate(self) -> None:
+        """
+        Отмечает индекс устаревшим до commit (перед изменением истории)
+        """
+        self._dirty = True
+        self._store_header(_STALE)
+        self._mmap.flush()
+
+    def commit(self, source: tuple[int, int] | None = None) -> None:
+        """
+        Отмечает индекс согласованным с текущим состоянием истории
+        """
+        self.source = source or _history_stat(self.history_path)
+        self._store_header(self.source)
+        self._mmap.flush()
+        self._dirty = False
+
+
+@contextmanager
+def locked_index(history_path) -> Iterator[HistoryIndex]:
+    """
+    Индекс истории под межпроцессной блокировкой записи истории
+    Ключи добавляются в индекс до записи в историю. При выходе из блока
+    изменённый индекс отмечается согласованным с историей; если блок
+    завершился ошибкой, он остаётся устаревшим и будет перестроен.
+    """
+    path = index_path(history_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(f"{path}.lock", "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        index = HistoryIndex.load(history_path, path)
+        try:
+            yield index
+            if index._dirty:
+                index.commit()
+        finally:
+            index.close()
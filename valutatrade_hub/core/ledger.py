@@ -0,0 +1,301 @@
+"""
+Журнал сделок пользователя и потоковый расчёт прибыли/убытка (P&L).
+Журнал - файл <user_id>.jsonl, по одной сделке в строке.
+Состояние P&L (<user_id>.pnl.json) обновляется инкрементально с каждой
+сделкой и хранит позицию по каждой валюте сразу для двух методов учёта
+себестоимости: FIFO и средней цены. Поэтому отчёт строится за O(кошельков),
+а не перечитыванием всей истории сделок. Состояние держится в памяти
+процесса и записывается в файл раз в PNL_CHECKPOINT_TRADES сделок: после
+перезапуска дочитывается не больше этого числа записей журнала.
+В режиме сжатия (DATA_COMPRESSION) к именам файлов добавляется расширение
+кодека; каждая сделка дописывается отдельным сжатым блоком, а смещения в
+состоянии P&L указывают на границы блоков. Журнал и состояние, созданные в
+другом режиме, читаются и дописываются в своём кодеке, пока compress-data
+не переведёт их в текущий.
+"""
+
+import json
+import os
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+from valutatrade_hub.core.utils import load_json, save_json
+from valutatrade_hub.infra.compression import (
+    CODEC_SUFFIXES,
+    check_codec,
+    codec_for,
+    compress,
+    iter_members,
+    stored_path,
+    stored_variants,
+)
+
+PNL_METHODS = ("fifo", "avg")
+# Остаток лота меньше этой величины считается погрешностью float
+_LOT_EPSILON = 1e-12
+# Состояние P&L записывается в файл, когда в нём накопилось столько
+# не записанных сделок
+PNL_CHECKPOINT_TRADES = 100
+
+
+class TradeLedger:
+    """
+    Дописываемый журнал сделок по пользователям.
+    Запись: {"timestamp", "pair", "amount", "rate"}, amount > 0 - покупка,
+    amount < 0 - продажа.
+    """
+
+    def __init__(self, ledger_dir, codec: str | None = None) -> None:
+        self._dir = Path(ledger_dir)
+        self.codec = check_codec(codec)
+        self.suffix = CODEC_SUFFIXES[self.codec] if self.codec else ""
+
+    def path(self, user_id: int) -> Path:
+        """
+        Файл журнала пользователя в режиме, в котором журнал уже хранится
+        Журнал в нескольких режимах сразу не читается: отчёт по любому из
+        файлов был бы неполным. Такие файлы сливает compress-data.
+        """
+        path = self._dir / f"{user_id}.jsonl{self.suffix}"
+        found = stored_variants(path)
+        if len(found) > 1:
+            raise ValueError(
+                f"Журнал сделок пользователя {user_id} хранится в нескольких "
+                "режимах сжатия: объедините их командой compress-data"
+            )
+        return found[0] if found else path
+
+    def ensure_writable(self, user_id: int) -> None:
+        """
+        Проверяет, что сделку пользователя можно дописать в журнал: каталог
+        журналов создан, а журнал хранится в одном режиме сжатия (иначе -
+        ValueError). Вызывается до изменения портфеля, чтобы отказ журнала
+        не оставил портфель без записи о сделке.
+        """
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self.path(user_id)
+
+    def append(
+        self, user_id: int, pair: str, amount: float, rate: float
+    ) -> tuple[dict, int]:
+        """
+        Дописывает сделку; возвращает запись и смещение конца журнала
+        """
+        record = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "pair": pair,
+            "amount": amount,
+            "rate": rate,
+        }
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        self._dir.mkdir(parents=True, exist_ok=True)
+        path = self.path(user_id)
+        with path.open("ab") as f:
+            # Одна запись - один вызов write: дописывания процессов не смешиваются
+            f.write(compress(line, codec_for(path)))
+            return record, f.tell()
+
+    def iter_records(self, user_id: int, start: int = 0):
+        """
+        Последовательно читает записи журнала, начиная с байтового смещения start
+        Возвращает пары (запись, смещение конца записи). В сжатом журнале
+        смещение известно только на границе блока: у последней записи блока
+        это конец блока, у остальных - None.
+        """
+        path = self.path(user_id)
+        if not path.exists():
+            return
+        codec = codec_for(path)
+        with path.open("rb") as f:
+            f.seek(start)
+            if codec is None:
+                for line in f:
+                    start += len(line)
+                    if line.strip():
+                        yield json.loads(line), start
+                return
+
+            # Последняя прочитанная запись ждёт, пока не станет ясно,
+            # заканчивается ли на ней блок
+            buffer = b""
+            pending = None
+            for chunk, end in iter_members(f, codec):
+                *lines, buffer = (buffer + chunk).split(b"\n")
+                for line in lines:
+                    if line.strip():
+                        if pending is not None:
+                            yield json.loads(pending), None
+                        pending = line
+                if end is not None and pending is not None:
+                    yield json.loads(pending), end
+                    pending = None
+
+
+def _empty_position() -> dict:
+    """
+    Позиция по валюте: количество, суммарная себестоимость по каждому
+    методу, очередь лотов [количество, курс] для FIFO и реализованный
+    результат по каждому методу
+    """
+    return {
+        "qty": 0.0,
+        "cost_total": 0.0,
+        "cost_fifo": 0.0,
+        "fifo_lots": deque(),
+        "realized_avg": 0.0,
+        "realized_fifo": 0.0,
+    }
+
+
+def _load_state(path) -> dict:
+    state = load_json(path) or {"offset": 0, "byte_offset": 0, "positions": {}}
+    for position in state["positions"].values():
+        # Состояние старого формата хранило суммарную себестоимость в avg_cost
+        if "avg_cost" in position:
+            position["cost_total"] = position.pop("avg_cost")
+        position["fifo_lots"] = deque(position["fifo_lots"])
+        if "cost_fifo" not in position:
+            # Состояние старого формата: себестоимость FIFO считается по лотам
+            lots = position["fifo_lots"]
+            position["cost_fifo"] = sum(qty * rate for qty, rate in lots)
+    return state
+
+
+def _save_state(path, state: dict) -> None:
+    positions = {
+        code: {**position, "fifo_lots": list(position["fifo_lots"])}
+        for code, position in state["positions"].items()
+    }
+    save_json(path, {**state, "positions": positions})
+
+
+def apply_trade(state: dict, record: dict) -> None:
+    """
+    Учитывает одну сделку в состоянии P&L
+    Продажа сверх учтённой в журнале позиции (например, баланс до ведения
+    журнала) считается приобретённой по нулевой себестоимости.
+    """
+    code = record["pair"].split("_")[0]
+    amount = float(record["amount"])
+    rate = float(record["rate"])
+    position = state["positions"].setdefault(code, _empty_position())
+
+    if amount > 0:
+        position["qty"] += amount
+        position["cost_total"] += amount * rate
+        position["cost_fifo"] += amount * rate
+        position["fifo_lots"].append([amount, rate])
+    else:
+        sold = -amount
+        held = position["qty"]
+
+        # Средняя цена
+        matched = min(sold, held)
+        cost_avg = position["cost_total"] * matched / held if held > 0 else 0.0
+        position["cost_total"] -= cost_avg
+        position["realized_avg"] += sold * rate - cost_avg
+
+        # FIFO
+        remaining = sold
+        cost_fifo = 0.0
+        lots = position["fifo_lots"]
+        while remaining > 0 and lots:
+            lot = lots[0]
+            used = min(lot[0], remaining)
+            cost_fifo += used * lot[1]
+            lot[0] -= used
+            remaining -= used
+            if lot[0] <= _LOT_EPSILON:
+                lots.popleft()
+        position["cost_fifo"] -= cost_fifo
+        position["realized_fifo"] += sold * rate - cost_fifo
+
+        position["qty"] = max(held - sold, 0.0)
+        if position["qty"] <= _LOT_EPSILON:
+            position["qty"] = 0.0
+            position["cost_total"] = 0.0
+            position["cost_fifo"] = 0.0
+            position["fifo_lots"] = deque()
+
+    state["offset"] += 1
+
+
+class PnLEngine:
+    """
+    Кэш состояния P&L поверх журнала сделок.
+    Состояние пользователя держится в памяти, пока не заменён файл его
+    журнала (например, командой compress-data); новые записи журнала, в том
+    числе дописанные другими процессами, дочитываются с запомненной позиции.
+    В файл состояние записывается раз в PNL_CHECKPOINT_TRADES сделок.
+    """
+
+    def __init__(self, ledger: TradeLedger, state_dir) -> None:
+        self._ledger = ledger
+        self._dir = Path(state_dir)
+        # user_id -> {"state", "inode" журнала, "unsaved" - сделок с записи}
+        self._cache: dict[int, dict] = {}
+
+    def _path(self, user_id: int) -> Path:
+        return stored_path(self._dir / f"{user_id}.pnl.json{self._ledger.suffix}")
+
+    def _journal_stat(self, user_id: int) -> tuple[int | None, int]:
+        try:
+            stat = os.stat(self._ledger.path(user_id))
+        except FileNotFoundError:
+            return None, 0
+        return stat.st_ino, stat.st_size
+
+    def _entry(self, user_id: int) -> dict:
+        inode, size = self._journal_stat(user_id)
+        entry = self._cache.get(user_id)
+        if (
+            entry is None
+            or entry["inode"] != inode
+            or entry["state"]["byte_offset"] > size
+        ):
+            # Состояние ещё не читалось или журнал заменён
+            entry = {
+                "state": _load_state(self._path(user_id)),
+                "inode": inode,
+                "unsaved": 0,
+            }
+            self._cache[user_id] = entry
+        return entry
+
+    def _checkpoint(self, user_id: int, entry: dict) -> None:
+        if entry["unsaved"] >= PNL_CHECKPOINT_TRADES:
+            _save_state(self._path(user_id), entry["state"])
+            entry["unsaved"] = 0
+
+    def get_state(self, user_id: int) -> dict:
+        """
+        Состояние P&L, догнанное до конца журнала
+        Возвращается кэшированный объект: читать его нужно под той же
+        блокировкой пользователя, что и запись сделок.
+        """
+        entry = self._entry(user_id)
+        state = entry["state"]
+        records = self._ledger.iter_records(user_id, start=state["byte_offset"])
+        for record, byte_offset in records:
+            apply_trade(state, record)
+            if byte_offset is not None:
+                state["byte_offset"] = byte_offset
+            entry["unsaved"] += 1
+        self._checkpoint(user_id, entry)
+        return state
+
+    def record(self, user_id: int, pair: str, amount: float, rate: float) -> None:
+        """
+        Записывает сделку в журнал и сразу учитывает её в состоянии P&L
+        """
+        state = self.get_state(user_id)
+        record, byte_offset = self._ledger.append(user_id, pair, amount, rate)
+        apply_trade(state, record)
+        state["byte_offset"] = byte_offset
+        entry = self._cache[user_id]
+        if entry["inode"] is None:
+            # Первая сделка создала журнал
+            entry["inode"] = self._journal_stat(user_id)[0]
+        entry["unsaved"] += 1
+        self._checkpoint(user_id, entry)
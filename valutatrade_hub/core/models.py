@@ -1,9 +1,22 @@
 import hashlib
+import time
+from array import array
+from dataclasses import dataclass
 from datetime import datetime
 import os
+from typing import Iterator
+from valutatrade_hub.core.currencies import CURRENCY_CODES, currency_index
 from valutatrade_hub.core.exceptions import (
     InsufficientFundsError,
 )
+from valutatrade_hub.core.money import (
+    from_minor,
+    rate_to_fixed,
+    scale_of,
+    shift_round,
+    to_minor,
+    value_minor,
+)
 
 
 class User:
@@ -17,6 +30,14 @@ class User:
     - registration_date <datetime> - дата регистрации.
     """
 
+    __slots__ = (
+        "_user_id",
+        "_username",
+        "_hashed_password",
+        "_salt",
+        "_registration_date",
+    )
+
     def __init__(
         self,
         user_id: int,
@@ -34,6 +55,31 @@ class User:
         self.username = username
         self.password = password
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "User":
+        """
+        Восстанавливает пользователя из записи users.json без повторного хэширования
+        """
+        user = cls.__new__(cls)
+        user._user_id = data["user_id"]
+        user._username = data["username"]
+        user._hashed_password = data["hashed_password"]
+        user._salt = data["salt"]
+        user._registration_date = datetime.fromisoformat(data["registration_date"])
+        return user
+
+    def to_dict(self) -> dict:
+        """
+        Возвращает запись пользователя в формате users.json
+        """
+        return {
+            "user_id": self._user_id,
+            "username": self._username,
+            "hashed_password": self._hashed_password,
+            "salt": self._salt,
+            "registration_date": self._registration_date.isoformat(),
+        }
+
     @property
     def user_id(self):
         return self._user_id
@@ -59,6 +105,11 @@ class User:
         # Хешируем пароль с солью
         self._hashed_password = self._hash_password(plain_password)
 
+    def _hash_password(self, plain_password: str) -> str:
+        if self._salt is None:
+            self._salt = os.urandom(4).hex()
+        return hashlib.sha256((plain_password + self._salt).encode()).hexdigest()
+
     def get_user_info(self) -> dict:
         """
         Возвращает словарь с информацией о пользователе
@@ -91,8 +142,12 @@ class Wallet:
     """
     Класс кошелька для одной конкретной валюты
     Управляет балансом и обеспечивает проверки на корректность операций
+    Баланс хранится целым числом минимальных единиц валюты в ячейке массива:
+    собственного у отдельного кошелька или общего массива балансов портфеля.
     """
 
+    __slots__ = ("currency_code", "_cells", "_index")
+
     def __init__(self, currency_code: str, balance: float = 0.0) -> None:
         if not isinstance(currency_code, str) or not currency_code:
             raise ValueError("Код валюты должен быть непустой строкой.")
@@ -101,11 +156,30 @@ class Wallet:
             raise ValueError("Начальный баланс должен быть числом больше нуля")
 
         self.currency_code = currency_code.upper()
-        self._balance = float(balance)
+        self._cells = array("q", [to_minor(balance, self.currency_code)])
+        self._index = 0
+
+    @classmethod
+    def _bind(cls, currency_code: str, cells: array, index: int) -> "Wallet":
+        """
+        Создаёт кошелёк-представление над ячейкой массива балансов портфеля
+        """
+        wallet = cls.__new__(cls)
+        wallet.currency_code = currency_code
+        wallet._cells = cells
+        wallet._index = index
+        return wallet
+
+    @property
+    def units(self) -> int:
+        """
+        Баланс в минимальных единицах валюты
+        """
+        return self._cells[self._index]
 
     @property
     def balance(self) -> float:
-        return self._balance
+        return from_minor(self._cells[self._index], self.currency_code)
 
     @balance.setter
     def balance(self, value: float) -> None:
@@ -113,7 +187,7 @@ class Wallet:
             raise TypeError("Баланс должен быть числом.")
         if value < 0:
             raise ValueError("Баланс не может быть отрицательным.")
-        self._balance = float(value)
+        self._cells[self._index] = to_minor(value, self.currency_code)
 
     def deposit(self, amount: float) -> None:
         """
@@ -123,9 +197,15 @@ class Wallet:
 
         if not isinstance(amount, (int, float)):
             raise TypeError("Сумма пополнения должна быть числом.")
-        if amount <= 0:
+        self.deposit_units(to_minor(amount, self.currency_code))
+
+    def deposit_units(self, units: int) -> None:
+        """
+        Пополнение баланса на целое число минимальных единиц
+        """
+        if units <= 0:
             raise ValueError("Сумма пополнения должна быть положительной.")
-        self._balance += float(amount)
+        self._cells[self._index] += units
 
     def get_balance_info(self) -> dict:
         """
@@ -133,7 +213,7 @@ class Wallet:
         """
         return {
             "currency_code": self.currency_code,
-            "balance": round(self._balance, 2),
+            "balance": round(self.balance, 2),
         }
 
     def withdraw(self, amount: float) -> None:
@@ -144,19 +224,34 @@ class Wallet:
 
         if not isinstance(amount, (int, float)):
             raise TypeError("Сумма снятия должна быть числом.")
-        if amount <= 0:
+        self.withdraw_units(to_minor(amount, self.currency_code))
+
+    def withdraw_units(self, units: int) -> None:
+        """
+        Снятие целого числа минимальных единиц с баланса
+        """
+        if units <= 0:
             raise ValueError("Сумма снятия должна быть положительной.")
-        if amount > self._balance:
-            raise InsufficientFundsError(self._balance, amount, self.currency_code)
-        self._balance -= float(amount)
+        balance = self._cells[self._index]
+        if units > balance:
+            raise InsufficientFundsError(
+                from_minor(balance, self.currency_code),
+                from_minor(units, self.currency_code),
+                self.currency_code,
+            )
+        self._cells[self._index] = balance - units
 
 
 class Portfolio:
     """
     Класс для управления всеми кошельками пользователя
     Позволяет добавлять валюты и рассчитывать общую стоимость портфеля
+    Балансы хранятся в массиве int64 минимальных единиц по индексам валют
+    (см. CURRENCY_CODES), открытые кошельки отмечаются битовой маской.
     """
 
+    __slots__ = ("_user_id", "_balances", "_opened")
+
     @property
     def user(self) -> int:
         """
@@ -167,48 +262,195 @@ class Portfolio:
     @property
     def wallets(self) -> dict[str, Wallet]:
         """
-        Возвращает копию словаря кошельков
+        Возвращает словарь кошельков
         """
-        return self._wallets.copy()
+        return {
+            code: Wallet._bind(code, self._balances, index)
+            for index, code in enumerate(CURRENCY_CODES)
+            if self._opened >> index & 1
+        }
 
     def __init__(self, user_id: int) -> None:
         if not isinstance(user_id, int) or user_id <= 0:
             raise ValueError("user_id должен быть положительным целым числом.")
 
         self._user_id = user_id
-        self._wallets: dict[str, Wallet] = {}
+        self._balances = array("q")
+        self._opened = 0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Portfolio":
+        """
+        Восстанавливает портфель из записи portfolios.json
+        Поддерживает старый формат с дробным полем balance.
+        Баланс, записанный с другим числом знаков (поле scale), переводится
+        к числу знаков валюты в реестре.
+        """
+        portfolio = cls(data["user_id"])
+        for code, wallet in data.get("wallets", {}).items():
+            portfolio.add_currency(code)
+            if "balance_minor" in wallet:
+                units = int(wallet["balance_minor"])
+                scale = wallet.get("scale", scale_of(code))
+                units = shift_round(units, scale_of(code) - int(scale))
+            else:
+                units = to_minor(wallet["balance"], code)
+            portfolio._balances[currency_index(code)] = units
+        return portfolio
+
+    def to_dict(self) -> dict:
+        """
+        Возвращает запись портфеля в формате portfolios.json
+        """
+        return {
+            "user_id": self._user_id,
+            "wallets": {
+                code: {
+                    "currency_code": code,
+                    "balance_minor": wallet.units,
+                    "scale": scale_of(code),
+                }
+                for code, wallet in self.wallets.items()
+            },
+        }
+
+    def iter_units(self) -> Iterator[tuple[int, int]]:
+        """
+        Открытые кошельки: (индекс валюты, баланс в минимальных единицах)
+        """
+        opened = self._opened
+        for index, units in enumerate(self._balances):
+            if opened >> index & 1:
+                yield index, units
+
+    def units_of(self, currency_code: str) -> int:
+        """
+        Баланс валюты в минимальных единицах (0, если кошелька нет)
+        """
+        index = currency_index(currency_code)
+        return self._balances[index] if index < len(self._balances) else 0
+
+    def has_wallet(self, currency_code: str) -> bool:
+        return bool(self._opened >> currency_index(currency_code) & 1)
+
+    def get_wallet(self, currency_code: str) -> Wallet | None:
+        """
+        Возвращает кошелёк валюты или None, если он не открыт
+        """
+        code = currency_code.upper()
+        index = currency_index(code)
+        if not self._opened >> index & 1:
+            return None
+        return Wallet._bind(code, self._balances, index)
 
     def add_currency(self, currency_code: str) -> None:
         """
         Метод добавления кошелька в портфолио
         """
         code = currency_code.upper()
+        index = currency_index(code)
 
-        if code in self._wallets:
+        if self._opened >> index & 1:
             raise ValueError(f"Кошелёк для валюты {code} уже существует.")
 
-        self._wallets[code] = Wallet(code, 0.0)
+        # Массив растёт только до самой старшей открытой валюты
+        if len(self._balances) <= index:
+            self._balances.extend([0] * (index + 1 - len(self._balances)))
+        self._opened |= 1 << index
+
+    def get_or_create_wallet(self, currency_code: str) -> Wallet:
+        """
+        Возвращает кошелёк валюты, открывая его при необходимости
+        """
+        if not self.has_wallet(currency_code):
+            self.add_currency(currency_code)
+        return self.get_wallet(currency_code)
 
-    def get_total_value(self, base_currency: str = "USD") -> float:
+    def get_total_value(
+        self, base_currency: str = "USD", exchange_rates: dict | None = None
+    ) -> float:
         """
         Метод рассчитывает стоимость всех валют в портфолио переведенную в указанную валюту
-        Использует фиксированные тестовые курсы
+        exchange_rates - курсы валют к USD, по умолчанию фиксированные тестовые курсы
         """
         base_currency = base_currency.upper()
+        return from_minor(
+            self.get_total_units(base_currency, exchange_rates), base_currency
+        )
 
-        exchange_rates = {
-            "USD": 1.0,
-            "EUR": 1.1,
-            "BTC": 65000.0,
-            "ETH": 3200.0,
-        }
-
-        total_value = 0.0
+    def get_total_units(
+        self, base_currency: str = "USD", exchange_rates: dict | None = None
+    ) -> int:
+        """
+        Точная стоимость портфеля в минимальных единицах базовой валюты
+        """
+        base_currency = base_currency.upper()
+        codes, fixed_rates, balances = self._fixed_rates(base_currency, exchange_rates)
+        return value_minor(balances, codes, fixed_rates, base_currency)
 
-        for code, wallet in self._wallets.items():
+    def get_wallet_values(
+        self, base_currency: str = "USD", exchange_rates: dict | None = None
+    ) -> list[tuple[str, int, int]]:
+        """
+        Открытые кошельки: (код, баланс, стоимость в базовой валюте)
+        Баланс и стоимость - в минимальных единицах.
+        """
+        base_currency = base_currency.upper()
+        codes, fixed_rates, balances = self._fixed_rates(base_currency, exchange_rates)
+        return [
+            (code, units, value_minor([units], [code], [fixed_rate], base_currency))
+            for code, fixed_rate, units in zip(codes, fixed_rates, balances)
+        ]
+
+    def _fixed_rates(
+        self, base_currency: str, exchange_rates: dict | None
+    ) -> tuple[list[str], list[int], list[int]]:
+        """
+        Коды, курсы к базовой валюте (rate_to_fixed) и балансы открытых кошельков
+        """
+        if exchange_rates is None:
+            exchange_rates = {
+                "USD": 1.0,
+                "EUR": 1.1,
+                "BTC": 65000.0,
+                "ETH": 3200.0,
+            }
+
+        base_rate = exchange_rates.get(base_currency)
+        if not base_rate:
+            raise ValueError(f"Нет курса для валюты {base_currency}.")
+
+        codes = []
+        fixed_rates = []
+        balances = []
+        for index, code in enumerate(CURRENCY_CODES):
+            if not self._opened >> index & 1:
+                continue
             rate = exchange_rates.get(code)
             if rate is None:
                 raise ValueError(f"Нет курса для валюты {code}.")
-            total_value += wallet.balance * rate
+            codes.append(code)
+            fixed_rates.append(rate_to_fixed(rate / base_rate))
+            balances.append(self._balances[index])
+        return codes, fixed_rates, balances
+
+
+@dataclass(frozen=True, slots=True)
+class Quote:
+    """
+    Котировка курса для сделки
+    - rate - курс from_code -> to_code.
+    - updated_at - время обновления курса в кэше.
+    - version - версия снимка rates.json, из которого взят курс.
+    - expires_at - момент (time.time()), после которого котировка недействительна.
+    """
+
+    from_code: str
+    to_code: str
+    rate: float
+    updated_at: str
+    version: int
+    expires_at: float
 
-        return round(total_value, 2)
+    def is_expired(self, now: float | None = None) -> bool:
+        return (time.time() if now is None else now) >= self.expires_at
@@ -0,0 +1,76 @@
+"""
+Денежная арифметика с фиксированной точкой.
+Балансы хранятся целыми числами в минимальных единицах валюты
+(центы, копейки, сатоши), курсы - целыми числами с RATE_DIGITS знаками.
+Округление выполняется один раз - при переводе в минимальные единицы.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from valutatrade_hub.core.currencies import CURRENCY_SCALES
+from valutatrade_hub.core.exceptions import CurrencyNotFoundError
+
+RATE_DIGITS = 12
+RATE_ONE = 10**RATE_DIGITS
+
+
+def scale_of(code: str) -> int:
+    """Возвращает число знаков минимальной единицы валюты."""
+    try:
+        return CURRENCY_SCALES[code.upper()]
+    except KeyError:
+        raise CurrencyNotFoundError(code) from None
+
+
+def to_minor(amount, code: str) -> int:
+    """Переводит сумму (float, str, Decimal) в минимальные единицы валюты."""
+    units = Decimal(str(amount)).scaleb(scale_of(code))
+    return int(units.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor(units: int, code: str) -> float:
+    """Переводит минимальные единицы валюты в число для вывода."""
+    return units / 10 ** scale_of(code)
+
+
+def rate_to_fixed(rate) -> int:
+    """Переводит курс в целое число с RATE_DIGITS знаками после запятой."""
+    fixed = Decimal(str(rate)).scaleb(RATE_DIGITS)
+    return int(fixed.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def shift_round(value: int, digits: int) -> int:
+    """
+    Умножает целое на 10**digits; при отрицательном digits делит
+    с округлением половины от нуля.
+    """
+    if digits >= 0:
+        return value * 10**digits
+    divisor = 10**-digits
+    quotient, remainder = divmod(abs(value), divisor)
+    if remainder * 2 >= divisor:
+        quotient += 1
+    return quotient if value >= 0 else -quotient
+
+
+def convert_minor(units: int, from_code: str, to_code: str, rate) -> int:
+    """
+    Переводит сумму в минимальных единицах одной валюты в другую по курсу.
+    """
+    digits = scale_of(to_code) - scale_of(from_code) - RATE_DIGITS
+    return shift_round(units * rate_to_fixed(rate), digits)
+
+
+def value_minor(balances, codes, fixed_rates, base_code: str) -> int:
+    """
+    Точная стоимость набора балансов в минимальных единицах базовой валюты.
+    balances - минимальные единицы, fixed_rates - курсы к базе (rate_to_fixed).
+    Все слагаемые приводятся к общему знаменателю, округление одно.
+    """
+    base_scale = scale_of(base_code)
+    max_scale = max((scale_of(code) for code in codes), default=0)
+    total = sum(
+        units * fixed_rate * 10 ** (max_scale - scale_of(code))
+        for units, code, fixed_rate in zip(balances, codes, fixed_rates)
+    )
+    return shift_round(total, base_scale - max_scale - RATE_DIGITS)
@@ -0,0 +1,397 @@
+"""
+Отложенные лимитные и стоп-заявки.
+Заявки каждой пары хранятся в двух кучах по цене срабатывания:
+- "на снижение" (buy limit, sell stop) - срабатывают при курсе <= цены;
+- "на рост" (sell limit, buy stop) - срабатывают при курсе >= цены.
+При обновлении курса из куч снимаются только сработавшие заявки,
+что даёт O(k log n) на k исполнений без перебора всей книги.
+"""
+
+import heapq
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+from valutatrade_hub.core.utils import load_json, save_json
+
+try:
+    import fcntl
+except ImportError:  # Windows: книга заявок без межпроцессной блокировки
+    fcntl = None
+
+ORDER_SIDES = ("buy", "sell")
+ORDER_KINDS = ("limit", "stop")
+# Журнал заявок не сворачивается в снимок, пока в нём меньше записей
+COMPACT_MIN_RECORDS = 1000
+
+
+class Order:
+    """
+    Отложенная заявка пользователя на покупку или продажу валюты за USD
+    """
+
+    __slots__ = (
+        "order_id",
+        "user_id",
+        "currency_code",
+        "side",
+        "kind",
+        "amount",
+        "price",
+        "created_at",
+    )
+
+    def __init__(
+        self,
+        order_id: int,
+        user_id: int,
+        currency_code: str,
+        side: str,
+        kind: str,
+        amount: float,
+        price: float,
+        created_at: str | None = None,
+    ) -> None:
+        self.order_id = order_id
+        self.user_id = user_id
+        self.currency_code = currency_code
+        self.side = side
+        self.kind = kind
+        self.amount = amount
+        self.price = price
+        self.created_at = created_at or datetime.now().isoformat(timespec="seconds")
+
+    @property
+    def pair(self) -> str:
+        return f"{self.currency_code}_USD"
+
+    @property
+    def triggers_on_fall(self) -> bool:
+        """
+        True, если заявка срабатывает при снижении курса до цены
+        """
+        return (self.side == "buy") == (self.kind == "limit")
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Order":
+        return cls(
+            data["order_id"],
+            data["user_id"],
+            data["currency_code"],
+            data["side"],
+            data["kind"],
+            data["amount"],
+            data["price"],
+            data["created_at"],
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "order_id": self.order_id,
+            "user_id": self.user_id,
+            "currency_code": self.currency_code,
+            "side": self.side,
+            "kind": self.kind,
+            "amount": self.amount,
+            "price": self.price,
+            "created_at": self.created_at,
+        }
+
+
+class OrderBook:
+    """
+    Книга заявок одной валютной пары
+    """
+
+    __slots__ = ("pair", "_falls", "_rises")
+
+    def __init__(self, pair: str) -> None:
+        self.pair = pair
+        # (-price, order_id) - максимум цены на вершине
+        self._falls: list[tuple[float, int]] = []
+        # (price, order_id) - минимум цены на вершине
+        self._rises: list[tuple[float, int]] = []
+
+    def __len__(self) -> int:
+        return len(self._falls) + len(self._rises)
+
+    def add(self, order: Order) -> None:
+        if order.triggers_on_fall:
+            heapq.heappush(self._falls, (-order.price, order.order_id))
+        else:
+            heapq.heappush(self._rises, (order.price, order.order_id))
+
+    def extend(self, orders) -> None:
+        """
+        Массовая загрузка заявок за O(n)
+        """
+        for order in orders:
+            if order.triggers_on_fall:
+                self._falls.append((-order.price, order.order_id))
+            else:
+                self._rises.append((order.price, order.order_id))
+        heapq.heapify(self._falls)
+        heapq.heapify(self._rises)
+
+    def pop_triggered(self, rate: float) -> list[int]:
+        """
+        Снимает с книги и возвращает id заявок, сработавших при курсе rate
+        Порядок: сначала лучшие цены, при равной цене - более ранние заявки.
+        """
+        triggered = []
+        falls, rises = self._falls, self._rises
+        while falls and -falls[0][0] >= rate:
+            triggered.append(heapq.heappop(falls)[1])
+        while rises and rises[0][0] <= rate:
+            triggered.append(heapq.heappop(rises)[1])
+        return triggered
+
+
+class OrderStore:
+    """
+    Хранилище отложенных заявок и книги заявок по парам.
+    Состояние - снимок orders.json и дописываемый журнал изменений рядом с
+    ним (orders.jsonl), по одной записи в строке:
+    {"op": "add", "order": {...}} или {"op": "remove", "order_id": n}.
+    Каждое изменение сразу дописывается в журнал - O(изменений), а не
+    O(заявок в книге). Когда записей в журнале становится больше, чем
+    заявок (и не меньше COMPACT_MIN_RECORDS), журнал сворачивается в новый
+    снимок. Изменения выполняются под межпроцессной блокировкой
+    orders.lock (см. locked), под которой сначала дочитываются записи
+    других процессов: номера заявок не повторяются, а заявку, снятую одним
+    процессом, не исполнит другой.
+    Отменённые заявки удаляются из книг лениво - при срабатывании.
+    Методы потокобезопасны.
+    """
+
+    def __init__(self, file_path) -> None:
+        self._path = Path(file_path)
+        self._journal_path = self._path.with_suffix(".jsonl")
+        self._lock_path = self._path.with_suffix(".lock")
+        self._orders: dict[int, Order] = {}
+        self._books: dict[str, OrderBook] = {}
+        self._next_id = 1
+        self._mtime_ns: int | None = None
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._loaded = False
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+
+    def _file_mtime(self) -> int | None:
+        try:
+            return os.stat(self._path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _journal_size(self) -> int:
+        try:
+            return os.stat(self._journal_path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def _ensure_loaded(self) -> None:
+        mtime_ns = self._file_mtime()
+        journal_size = self._journal_size()
+        if (
+            self._loaded
+            and mtime_ns == self._mtime_ns
+            and journal_size >= self._journal_offset
+        ):
+            if journal_size > self._journal_offset:
+                self._replay_journal()
+            return
+
+        # Снимок заменён или журнал свёрнут другим процессом - читаем заново
+        data = load_json(self._path)
+        self._orders = {
+            record["order_id"]: Order.from_dict(record)
+            for record in data.get("orders", [])
+        }
+        self._next_id = data.get("next_id", 1)
+        self._books = {}
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._mtime_ns = mtime_ns
+        self._replay_journal(index=False)
+
+        by_pair: dict[str, list[Order]] = {}
+        for order in self._orders.values():
+            by_pair.setdefault(order.pair, []).append(order)
+        for pair, pair_orders in by_pair.items():
+            book = OrderBook(pair)
+            book.extend(pair_orders)
+            self._books[pair] = book
+        self._loaded = True
+
+    def _replay_journal(self, index: bool = True) -> None:
+        """
+        Применяет записи журнала после последней прочитанной позиции
+        index=False - книги не пополняются (они строятся после загрузки).
+        Недописанная последняя строка остаётся до следующего чтения.
+        """
+        try:
+            with open(self._journal_path, "rb") as f:
+                f.seek(self._journal_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                self._apply(json.loads(line), index)
+                self._journal_records += 1
+        self._journal_offset += end
+
+    def _apply(self, record: dict, index: bool = True) -> None:
+        if record["op"] == "add":
+            order_id = record["order"]["order_id"]
+            if order_id in self._orders:
+                return
+            order = Order.from_dict(record["order"])
+            self._orders[order_id] = order
+            self._next_id = max(self._next_id, order_id + 1)
+            if index:
+                self._book(order.pair).add(order)
+        else:
+            self._orders.pop(record["order_id"], None)
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """
+        Межпроцессная блокировка книги заявок
+        На входе дочитываются изменения других процессов. Вложенный вызов
+        в том же потоке файл повторно не блокирует.
+        """
+        with self._lock:
+            if self._lock_depth:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self._lock_path, "w") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._lock_depth = 1
+                try:
+                    self._ensure_loaded()
+                    yield
+                finally:
+                    self._lock_depth = 0
+
+    def reload(self) -> None:
+        """
+        Сбрасывает состояние в памяти: следующее обращение заново читает
+        снимок и журнал
+        """
+        with self._lock:
+            self._loaded = False
+
+    def _write(self, record: dict) -> None:
+        """
+        Дописывает уже применённое изменение в журнал (под locked)
+        """
+        data = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with open(self._journal_path, "ab") as f:
+            f.write(data)
+            self._journal_offset = f.tell()
+        self._journal_records += 1
+        if self._journal_records > max(COMPACT_MIN_RECORDS, len(self._orders)):
+            self.compact()
+
+    def _book(self, pair: str) -> OrderBook:
+        book = self._books.get(pair)
+        if book is None:
+            book = self._books[pair] = OrderBook(pair)
+        return book
+
+    def add(
+        self,
+        user_id: int,
+        currency_code: str,
+        side: str,
+        kind: str,
+        amount: float,
+        price: float,
+    ) -> Order:
+        with self.locked():
+            order = Order(
+                self._next_id, user_id, currency_code, side, kind, amount, price
+            )
+            self._next_id += 1
+            self._orders[order.order_id] = order
+            self._book(order.pair).add(order)
+            self._write({"op": "add", "order": order.to_dict()})
+            return order
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._orders)
+
+    def get(self, order_id: int) -> Order | None:
+        with self._lock:
+            self._ensure_loaded()
+            return self._orders.get(order_id)
+
+    def remove(self, order_id: int) -> Order | None:
+        with self.locked():
+            order = self._orders.pop(order_id, None)
+            if order is not None:
+                self._write({"op": "remove", "order_id": order_id})
+            return order
+
+    def list_for_user(self, user_id: int) -> list[Order]:
+        with self._lock:
+            self._ensure_loaded()
+            return [
+                order for order in self._orders.values() if order.user_id == user_id
+            ]
+
+    def pop_triggered(self, pairs: dict[str, float]) -> list[tuple[Order, float]]:
+        """
+        Снимает с книг заявки, сработавшие по новым курсам {"BTC_USD": rate}
+        Возвращает пары (заявка, курс исполнения). Из хранилища заявки не
+        удаляются: исполнитель под locked снимает каждую через remove перед
+        сделкой.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            triggered = []
+            for pair, rate in pairs.items():
+                book = self._books.get(pair)
+                if book is None:
+                    continue
+                for order_id in book.pop_triggered(rate):
+                    order = self._orders.get(order_id)
+                    if order is not None:
+                        triggered.append((order, rate))
+            return triggered
+
+    def compact(self) -> None:
+        """
+        Записывает снимок всех заявок и очищает журнал
+        """
+        with self.locked():
+            save_json(
+                self._path,
+                {
+                    "next_id": self._next_id,
+                    "orders": [order.to_dict() for order in self._orders.values()],
+                },
+            )
+            # Журнал очищается после записи снимка: если процесс прервётся
+            # между ними, записи журнала применятся к снимку повторно без
+            # изменений
+            with open(self._journal_path, "wb"):
+                pass
+            self._mtime_ns = self._file_mtime()
+            self._journal_offset = 0
+            self._journal_records = 0
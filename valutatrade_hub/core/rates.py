@@ -0,0 +1,240 @@
+"""
+Курсы валют во внутреннем представлении.
+Коды валют и источников курсов интернируются в небольшие целые числа
+(Interner): валюты реестра получают id, равные их индексу в портфеле,
+прочие коды из файлов курсов - следующие номера. Пара - это (i, j), а
+снимок rates.json хранится в RateTable плотной таблицей size x size
+массивов array: курс, время обновления (Unix) и id источника. Строки
+"FROM_TO" собираются и разбираются только при чтении и записи файлов.
+"""
+
+import math
+import threading
+from array import array
+from datetime import datetime
+from typing import Iterator
+
+from valutatrade_hub.core.currencies import CURRENCIES
+
+PAIR_SEPARATOR = "_"
+
+
+class Interner:
+    """
+    Взаимно однозначное соответствие значений и их номеров (0, 1, ...)
+    """
+
+    __slots__ = ("values", "_ids", "_lock")
+
+    def __init__(self, values=()) -> None:
+        self.values: list = []
+        self._ids: dict = {}
+        self._lock = threading.Lock()
+        for value in values:
+            self.intern(value)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def intern(self, value) -> int:
+        """
+        Номер значения; новое значение получает следующий номер
+        """
+        value_id = self._ids.get(value)
+        if value_id is None:
+            with self._lock:
+                value_id = self._ids.get(value)
+                if value_id is None:
+                    value_id = len(self.values)
+                    self.values.append(value)
+                    self._ids[value] = value_id
+        return value_id
+
+    def find(self, value) -> int | None:
+        """
+        Номер значения или None, если значение не встречалось
+        """
+        return self._ids.get(value)
+
+
+# id валют реестра совпадают с currency_index
+CODES = Interner(CURRENCIES.codes)
+SOURCES = Interner()
+
+
+def split_pair(pair: str) -> tuple[str, str]:
+    """
+    "BTC_USD" -> ("BTC", "USD")
+    """
+    from_code, separator, to_code = pair.partition(PAIR_SEPARATOR)
+    if not separator or not from_code or not to_code:
+        raise ValueError(f"Некорректная пара '{pair}'")
+    return from_code, to_code
+
+
+def pair_ids(pair: str) -> tuple[int, int]:
+    """
+    "BTC_USD" -> (id BTC, id USD); неизвестные коды интернируются
+    """
+    from_code, to_code = split_pair(pair)
+    return CODES.intern(from_code), CODES.intern(to_code)
+
+
+def pair_key(from_id: int, to_id: int) -> str:
+    return f"{CODES.values[from_id]}{PAIR_SEPARATOR}{CODES.values[to_id]}"
+
+
+def _epoch(value) -> float:
+    """
+    Время обновления курса в секундах Unix; -inf, если не разобрано
+    """
+    try:
+        return datetime.fromisoformat(value.rstrip("Z")).timestamp()
+    except (AttributeError, TypeError, ValueError):
+        return -math.inf
+
+
+class RateTable:
+    """
+    Снимок курсов rates.json: rates[i * size + j] - курс пары (i, j)
+    Плотная часть покрывает валюты реестра; пары с кодами вне реестра
+    (например, синтетические в наборах бенчмарков) получают ячейки за её
+    пределами через словарь _extra.
+    """
+
+    __slots__ = (
+        "size",
+        "rates",
+        "updated",
+        "updated_at",
+        "sources",
+        "_cells",
+        "_extra",
+        "last_refresh",
+        "version",
+        "_meta",
+    )
+
+    def __init__(self, size: int | None = None) -> None:
+        size = len(CURRENCIES) if size is None else size
+        cells = size * size
+        self.size = size
+        self.rates = array("d", bytes(8 * cells))
+        self.updated = array("d", bytes(8 * cells))
+        # Исходные строки времени - для вывода без обратного форматирования
+        self.updated_at: list[str | None] = [None] * cells
+        self.sources = array("H", bytes(2 * cells))
+        # Заполненные ячейки в порядке добавления: ячейка -> (i, j)
+        self._cells: dict[int, tuple[int, int]] = {}
+        self._extra: dict[tuple[int, int], int] = {}
+        self.last_refresh: str | None = None
+        self.version = 0
+        self._meta: dict = {}
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def __iter__(self) -> Iterator[tuple[int, int, int]]:
+        """
+        Заполненные ячейки: (i, j, номер ячейки)
+        """
+        for cell, (from_id, to_id) in list(self._cells.items()):
+            yield from_id, to_id, cell
+
+    def cell(self, from_id: int, to_id: int) -> int:
+        """
+        Номер ячейки пары или -1, если курса нет
+        """
+        size = self.size
+        if from_id < size and to_id < size:
+            cell = from_id * size + to_id
+            return cell if cell in self._cells else -1
+        return self._extra.get((from_id, to_id), -1)
+
+    def set(
+        self,
+        from_id: int,
+        to_id: int,
+        rate: float,
+        updated_at: str | None,
+        source: str | None,
+    ) -> int:
+        size = self.size
+        if from_id < size and to_id < size:
+            cell = from_id * size + to_id
+        else:
+            cell = self._extra.get((from_id, to_id), -1)
+            if cell < 0:
+                cell = len(self.updated_at)
+                self._extra[(from_id, to_id)] = cell
+                self.rates.append(0.0)
+                self.updated.append(0.0)
+                self.updated_at.append(None)
+                self.sources.append(0)
+        self.rates[cell] = float(rate)
+        self.updated[cell] = _epoch(updated_at)
+        self.updated_at[cell] = updated_at
+        self.sources[cell] = SOURCES.intern(source)
+        self._cells[cell] = (from_id, to_id)
+        return cell
+
+    def copy(self) -> "RateTable":
+        """
+        Независимая копия снимка: изменения копии не видны читателям исходного
+        """
+        table = RateTable.__new__(RateTable)
+        table.size = self.size
+        table.rates = self.rates[:]
+        table.updated = self.updated[:]
+        table.updated_at = self.updated_at[:]
+        table.sources = self.sources[:]
+        table._cells = dict(self._cells)
+        table._extra = dict(self._extra)
+        table.last_refresh = self.last_refresh
+        table.version = self.version
+        table._meta = dict(self._meta)
+        return table
+
+    def pair_codes(self, cell: int) -> tuple[str, str]:
+        from_id, to_id = self._cells[cell]
+        return CODES.values[from_id], CODES.values[to_id]
+
+    def record(self, cell: int) -> dict:
+        """
+        Запись ячейки в формате rates.json
+        """
+        return {
+            "rate": self.rates[cell],
+            "updated_at": self.updated_at[cell],
+            "source": SOURCES.values[self.sources[cell]],
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "RateTable":
+        table = cls()
+        for pair, info in (data.get("pairs") or {}).items():
+            try:
+                from_id, to_id = pair_ids(pair)
+                rate = float(info["rate"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            table.set(from_id, to_id, rate, info.get("updated_at"), info.get("source"))
+        table.last_refresh = data.get("last_refresh")
+        table.version = data.get("version", 0)
+        table._meta = {
+            key: value
+            for key, value in data.items()
+            if key not in ("pairs", "last_refresh", "version")
+        }
+        return table
+
+    def to_json(self) -> dict:
+        return {
+            **self._meta,
+            "pairs": {
+                pair_key(from_id, to_id): self.record(cell)
+                for from_id, to_id, cell in self
+            },
+            "last_refresh": self.last_refresh,
+            "version": self.version,
+        }
@@ -0,0 +1,170 @@
+"""
+Хранилища пользователей и портфелей поверх JSON-файлов.
+Записи читаются из файла целиком, но в объекты моделей превращаются
+лениво - при первом обращении. После гидратации исходный словарь
+заменяется компактным объектом модели.
+Методы хранилищ потокобезопасны: чтение файла, гидратация и запись
+выполняются под блокировкой хранилища.
+"""
+
+import os
+import threading
+from pathlib import Path
+
+from valutatrade_hub.core.models import Portfolio, User
+from valutatrade_hub.core.utils import load_json, save_json
+from valutatrade_hub.stats import STATS
+
+
+class _JsonRepository:
+    """
+    Базовое хранилище: список записей с ключом id в JSON-файле.
+    Файл перечитывается, если его изменил другой процесс.
+    """
+
+    _id_field = ""
+    _model = None
+
+    def __init__(self, file_path) -> None:
+        self._path = Path(file_path)
+        self._items: dict[int, dict | object] = {}
+        self._mtime_ns: int | None = None
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def _file_mtime(self) -> int | None:
+        try:
+            return os.stat(self._path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _ensure_loaded(self) -> None:
+        mtime_ns = self._file_mtime()
+        if self._loaded and mtime_ns == self._mtime_ns:
+            STATS.cache_hit(self._path.stem)
+            return
+        STATS.cache_miss(self._path.stem)
+        records = load_json(self._path)
+        if not isinstance(records, list):
+            records = []
+        self._items = {record[self._id_field]: record for record in records}
+        self._mtime_ns = mtime_ns
+        self._loaded = True
+        self._on_reload()
+
+    def _on_reload(self) -> None:
+        pass
+
+    def _hydrate(self, item_id: int):
+        item = self._items.get(item_id)
+        if isinstance(item, dict):
+            item = self._model.from_dict(item)
+            self._items[item_id] = item
+        return item
+
+    def get(self, item_id: int):
+        """
+        Возвращает объект модели по id или None
+        """
+        with self._lock:
+            self._ensure_loaded()
+            return self._hydrate(item_id)
+
+    def load_all(self) -> list:
+        """
+        Гидратирует и возвращает все записи хранилища
+        """
+        with self._lock:
+            self._ensure_loaded()
+            return [self._hydrate(item_id) for item_id in list(self._items)]
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._items)
+
+    def save(self) -> None:
+        """
+        Записывает все записи обратно в файл
+        """
+        with self._lock:
+            records = [
+                item if isinstance(item, dict) else item.to_dict()
+                for item in self._items.values()
+            ]
+            save_json(self._path, records)
+            self._mtime_ns = self._file_mtime()
+
+
+class UserRepository(_JsonRepository):
+    """
+    Хранилище пользователей (users.json) с индексом по имени.
+    """
+
+    _id_field = "user_id"
+    _model = User
+
+    def __init__(self, file_path) -> None:
+        super().__init__(file_path)
+        self._by_username: dict[str, int] = {}
+
+    def _on_reload(self) -> None:
+        self._by_username = {
+            record["username"]: user_id for user_id, record in self._items.items()
+        }
+
+    def find_by_username(self, username: str) -> User | None:
+        """
+        Возвращает пользователя по имени или None
+        """
+        with self._lock:
+            self._ensure_loaded()
+            user_id = self._by_username.get(username)
+            if user_id is None:
+                return None
+            return self._hydrate(user_id)
+
+    def next_id(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return max(self._items, default=0) + 1
+
+    def add(self, user: User) -> None:
+        with self._lock:
+            self._ensure_loaded()
+            if user.username in self._by_username:
+                raise ValueError(f"Имя пользователя '{user.username}' уже занято.")
+            self._items[user.user_id] = user
+            self._by_username[user.username] = user.user_id
+
+
+class PortfolioRepository(_JsonRepository):
+    """
+    Хранилище портфелей (portfolios.json).
+    """
+
+    _id_field = "user_id"
+    _model = Portfolio
+
+    def add(self, portfolio: Portfolio) -> None:
+        with self._lock:
+            self._ensure_loaded()
+            self._items[portfolio.user] = portfolio
+
+    def get_or_create(self, user_id: int) -> Portfolio:
+        """
+        Возвращает портфель пользователя, создавая пустой при отсутствии
+        """
+        with self._lock:
+            portfolio = self.get(user_id)
+            if portfolio is None:
+                portfolio = Portfolio(user_id)
+                self._items[user_id] = portfolio
+            return portfolio
+
+    def total_units(self, currency_code: str) -> int:
+        """
+        Суммарный баланс валюты по всем портфелям в минимальных единицах
+        Используется для сверки: сумма целых чисел точна.
+        """
+        return sum(portfolio.units_of(currency_code) for portfolio in self.load_all())
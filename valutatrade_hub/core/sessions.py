@@ -0,0 +1,139 @@
+"""
+Сессии пользователей.
+Токен сессии: "<id>.<user_id>.<expires_at>.<подпись>", где подпись -
+HMAC-SHA256 секретного ключа от первых трёх полей. Проверка токена не
+требует users.json: подпись и срок проверяются вычислением, а отзыв -
+поиском id в небольшом индексе активных сессий (sessions.json).
+"""
+
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from pathlib import Path
+
+from valutatrade_hub.core.utils import load_json, save_json
+
+
+def load_secret(secret_file) -> bytes:
+    """
+    Ключ подписи: из VALUTATRADE_SECRET или из файла (создаётся при отсутствии)
+    """
+    if env_secret := os.getenv("VALUTATRADE_SECRET"):
+        return env_secret.encode("utf-8")
+
+    path = Path(secret_file)
+    try:
+        return bytes.fromhex(path.read_text(encoding="utf-8").strip())
+    except (FileNotFoundError, ValueError):
+        pass
+
+    secret = secrets.token_bytes(32)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(secret.hex())
+    return secret
+
+
+class SessionStore:
+    """
+    Выдача, проверка и отзыв подписанных токенов сессий.
+    Индекс: {id: {"user_id", "username", "expires_at"}}.
+    """
+
+    def __init__(self, file_path, secret: bytes, ttl_seconds: int) -> None:
+        self._path = Path(file_path)
+        self._secret = secret
+        self._ttl = ttl_seconds
+        self._sessions: dict[str, dict] = {}
+        self._mtime_ns: int | None = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _file_mtime(self) -> int | None:
+        try:
+            return os.stat(self._path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _index(self) -> dict[str, dict]:
+        """
+        Индекс сессий; перечитывается, если файл изменил другой процесс
+        """
+        mtime_ns = self._file_mtime()
+        if not self._loaded or mtime_ns != self._mtime_ns:
+            sessions = load_json(self._path)
+            self._sessions = sessions if isinstance(sessions, dict) else {}
+            self._mtime_ns = mtime_ns
+            self._loaded = True
+        return self._sessions
+
+    def _save(self) -> None:
+        save_json(self._path, self._sessions)
+        self._mtime_ns = self._file_mtime()
+
+    def _sign(self, payload: str) -> str:
+        return hmac.new(
+            self._secret, payload.encode("utf-8"), hashlib.sha256
+        ).hexdigest()
+
+    def issue(self, user_id: int, username: str) -> str:
+        """
+        Создаёт сессию и возвращает её токен
+        Истёкшие сессии при этом удаляются из индекса.
+        """
+        now = int(time.time())
+        session_id = secrets.token_hex(8)
+        expires_at = now + self._ttl
+        payload = f"{session_id}.{user_id}.{expires_at}"
+
+        with self._lock:
+            sessions = self._index()
+            for expired in [
+                key for key, info in sessions.items() if info["expires_at"] <= now
+            ]:
+                del sessions[expired]
+            sessions[session_id] = {
+                "user_id": user_id,
+                "username": username,
+                "expires_at": expires_at,
+            }
+            self._save()
+        return f"{payload}.{self._sign(payload)}"
+
+    def resolve(self, token: str) -> dict | None:
+        """
+        Возвращает {"user_id", "username"} действующей сессии или None
+        """
+        try:
+            session_id, user_id, expires_at, signature = token.split(".")
+            user_id, expires_at = int(user_id), int(expires_at)
+        except (AttributeError, ValueError):
+            return None
+
+        expected = self._sign(f"{session_id}.{user_id}.{expires_at}")
+        if not hmac.compare_digest(signature, expected):
+            return None
+        if expires_at <= time.time():
+            return None
+
+        with self._lock:
+            info = self._index().get(session_id)
+        if info is None or info["user_id"] != user_id:
+            return None
+        return {"user_id": user_id, "username": info["username"]}
+
+    def revoke(self, token: str) -> bool:
+        """
+        Отзывает сессию; возвращает False, если она не найдена
+        """
+        session_id = token.split(".", 1)[0] if token else ""
+        with self._lock:
+            sessions = self._index()
+            if sessions.pop(session_id, None) is None:
+                return False
+            self._save()
+        return True
@@ -3,9 +3,12 @@
 Содержит общие инструменты, используемые в разных частях проекта.
 """
 
+import io
+import json
 from datetime import datetime
 from pathlib import Path
-import json
+
+from valutatrade_hub.infra.compression import decode_errors, open_file
 
 
 def format_timestamp() -> str:
@@ -13,21 +16,18 @@ def format_timestamp() -> str:
     return datetime.utcnow().isoformat()
 
 
-def split_pair(pair: str) -> tuple[str, str]:
-    """Разделяет валютную пару 'BTC_USD' на ('BTC', 'USD')."""
-    return tuple(pair.split("_"))
-
-
 def load_json(file_path) -> list | dict:
     file_path = Path(file_path)
     if not file_path.exists():
         if file_path.name in ("users.json", "portfolios.json"):
             return []
         return {}
-    with file_path.open("r", encoding="utf-8") as f:
+    # Сжатые файлы (.gz, .xz, .zst) распаковываются потоком; обрезанный
+    # или повреждённый сжатый поток - то же, что некорректный JSON
+    with open_file(file_path, "rb") as raw, io.TextIOWrapper(raw, "utf-8") as f:
         try:
             return json.load(f)
-        except json.JSONDecodeError:
+        except (json.JSONDecodeError, *decode_errors()):
             if file_path.name in ("users.json", "portfolios.json"):
                 return []
             return {}
@@ -37,5 +37,5 @@ def save_json(file_path, data) -> None:
     file_path = Path(file_path)
     file_path.parent.mkdir(parents=True, exist_ok=True)
 
-    with file_path.open("w", encoding="utf-8") as f:
+    with open_file(file_path, "wb") as raw, io.TextIOWrapper(raw, "utf-8") as f:
         json.dump(data, f, indent=4, ensure_ascii=False)
@@ -1,8 +1,12 @@
 import datetime
 import functools
+import logging
+import time
 from typing import Any, Callable
 
-from valutatrade_hub.logging_config import setup_logger
+from valutatrade_hub import metrics, profiling
+from valutatrade_hub.logging_config import ActionRecord, setup_logger
+from valutatrade_hub.stats import STATS
 
 logger = setup_logger()
 
@@ -10,7 +14,10 @@ logger = setup_logger()
 def log_action(action_name: str, verbose: bool = False):
     """
     Декоратор для логирования операций.
+    Длительность каждого вызова и ошибки учитываются в stats.STATS;
+    при включённом профилировании вызов выполняется под профилировщиком.
     """
+    action = action_name.upper()
 
     def decorator(func: Callable) -> Callable:
         @functools.wraps(func)
@@ -34,20 +41,30 @@ def log_action(action_name: str, verbose: bool = False):
 
             timestamp = datetime.datetime.now().isoformat()
 
+            started = time.perf_counter_ns()
             try:
-                result = func(*args, **kwargs)
-
-                message = _format_message(action_name.upper(), params, "OK")
-                if verbose:
-                    message += f" context={kwargs}"
-
-                logger.info(f"{timestamp} {message}")
-                return result
-
+                result = profiling.run(action, func, *args, **kwargs)
             except Exception as e:
-                message = _format_message(action_name.upper(), params, "ERROR", e)
-                logger.error(f"{timestamp} {message}")
+                STATS.record_latency(action, (time.perf_counter_ns() - started) // 1000)
+                STATS.record_error(action, e)
+                metrics.ERRORS.labels(action, type(e).__name__).inc()
+                if logger.isEnabledFor(logging.ERROR):
+                    logger.error(ActionRecord(timestamp, action, params, "ERROR", e))
                 raise
+            STATS.record_latency(action, (time.perf_counter_ns() - started) // 1000)
+
+            # Запись собирается лениво: текст и JSON - в потоке записи логов
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    ActionRecord(
+                        timestamp,
+                        action,
+                        params,
+                        "OK",
+                        context=kwargs if verbose else None,
+                    )
+                )
+            return result
 
         return wrapper
 
@@ -71,31 +88,15 @@ def _extract_params(args: tuple, kwargs: dict) -> dict:
         elif isinstance(first_arg, (int, str)):
             user_id = str(first_arg)
 
+    rate = kwargs.get("rate")
+    quote = kwargs.get("quote")
+    if rate is None and quote is not None:
+        rate = getattr(quote, "rate", None)
+
     return {
         "username": username or f"user_id:{user_id}" if user_id else "N/A",
         "currency": kwargs.get("currency") or kwargs.get("currency_code"),
         "amount": kwargs.get("amount"),
-        "rate": kwargs.get("rate"),
+        "rate": rate,
         "base": kwargs.get("base", "USD"),
     }
-
-
-def _format_message(
-    action: str, params: dict, result: str, error: Exception = None
-) -> str:
-    """
-    Форматирует сообщение для лога.
-    """
-    message = (
-        f"{action} user='{params['username']}' "
-        f"currency='{params['currency'] or 'N/A'}' "
-        f"amount={params['amount'] or 'N/A'} "
-        f"rate={params['rate'] or 'N/A'} "
-        f"base='{params['base']}' "
-        f"result={result}"
-    )
-
-    if error:
-        message += f" error_type='{type(error).__name__}' error_message='{str(error)}'"
-
-    return message
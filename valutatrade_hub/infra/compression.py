@@ -0,0 +1,270 @@
+"""
+Сжатое хранение файлов данных.
+Кодек файла определяется расширением: .gz - gzip, .xz - lzma, .zst - zstd
+(модуль compression.zstd из Python 3.14 или пакет zstandard; без них zstd
+недоступен). Сжатие и распаковка потоковые: данные проходят через кодек
+блоками, и ни сжатая, ни распакованная копия файла целиком в памяти не
+собирается. Дописываемые файлы (журналы сделок) состоят из независимых
+сжатых блоков, записанных друг за другом; такой файл читается целиком
+как один поток, а с любой границы блока - через iter_members. Блок из
+одной записи почти не сжимается, поэтому журналы периодически
+перепаковываются в один блок (recompress).
+Файл, созданный в другом режиме хранения, находится по stored_path и
+читается в своём кодеке, пока его не переведут в текущий (merge_files).
+"""
+
+import gzip
+import io
+import lzma
+import os
+import shutil
+import zlib
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+CODEC_SUFFIXES = {"gzip": ".gz", "lzma": ".xz", "zstd": ".zst"}
+# Уровень gzip при хранении: 9 (по умолчанию в gzip) сжимает историю курсов
+# лишь на 5% плотнее, но вчетверо медленнее (bench compression)
+GZIP_LEVEL = 6
+# Размер блока потокового чтения
+CHUNK_SIZE = 1 << 16
+
+
+def _zstd():
+    """
+    Реализация zstd: стандартная библиотека (Python 3.14+) или zstandard
+    """
+    try:
+        from compression import zstd
+
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+
+        return zstandard
+    except ImportError:
+        return None
+
+
+def decode_errors() -> tuple[type[Exception], ...]:
+    """
+    Исключения распаковки обрезанного или повреждённого сжатого потока
+    """
+    errors = (EOFError, gzip.BadGzipFile, lzma.LZMAError, zlib.error)
+    zstd = _zstd()
+    return errors + (zstd.ZstdError,) if zstd is not None else errors
+
+
+def available_codecs() -> tuple[str, ...]:
+    return tuple(
+        codec for codec in CODEC_SUFFIXES if codec != "zstd" or _zstd() is not None
+    )
+
+
+def check_codec(codec: str | None) -> str | None:
+    """
+    Проверяет имя кодека; пустое значение и "none" - хранение без сжатия
+    """
+    if not codec or codec == "none":
+        return None
+    if codec not in CODEC_SUFFIXES:
+        raise ValueError(
+            f"Неизвестный кодек сжатия '{codec}': допустимы none, "
+            f"{', '.join(CODEC_SUFFIXES)}"
+        )
+    if codec not in available_codecs():
+        raise ValueError("Для сжатия zstd требуется Python 3.14 или пакет zstandard")
+    return codec
+
+
+def codec_for(path) -> str | None:
+    """
+    Кодек файла по расширению; None - файл без сжатия
+    """
+    suffix = os.path.splitext(path)[1]
+    for codec, codec_suffix in CODEC_SUFFIXES.items():
+        if suffix == codec_suffix:
+            return codec
+    return None
+
+
+def plain_path(path) -> str:
+    """
+    Путь без расширения кодека: data/exchange_rates.json.gz -> ...json
+    """
+    path = str(path)
+    return path[: -len(CODEC_SUFFIXES[codec])] if (codec := codec_for(path)) else path
+
+
+def compressed_path(path, codec: str | None) -> str:
+    """
+    Путь файла для режима хранения codec: data/exchange_rates.json.gz
+    """
+    codec = check_codec(codec)
+    path = plain_path(path)
+    return path + CODEC_SUFFIXES[codec] if codec else path
+
+
+def path_variants(path) -> list[Path]:
+    """
+    Все возможные имена файла: без сжатия и с расширением каждого кодека
+    """
+    path = plain_path(path)
+    return [Path(path)] + [Path(path + suffix) for suffix in CODEC_SUFFIXES.values()]
+
+
+def stored_variants(path) -> list[Path]:
+    """
+    Существующие варианты файла (см. path_variants)
+    """
+    return [variant for variant in path_variants(path) if variant.exists()]
+
+
+def stored_path(path) -> Path:
+    """
+    Путь, под которым файл уже хранится: path, если он существует, иначе
+    существующий вариант с другим кодеком, иначе сам path
+    """
+    path = Path(path)
+    if path.exists():
+        return path
+    found = stored_variants(path)
+    return found[0] if found else path
+
+
+def codec_stream(raw: BinaryIO, codec: str | None, mode: str, level=None):
+    """
+    Поток сжатия ("w") или распаковки ("r") поверх открытого файла
+    Закрытие потока завершает сжатый блок, но не закрывает сам файл.
+    level - уровень сжатия кодека (None - по умолчанию).
+    """
+    if codec is None:
+        return nullcontext(raw)
+    mode = "rb" if mode.startswith("r") else "wb"
+    if codec == "gzip":
+        return gzip.GzipFile(
+            fileobj=raw,
+            mode=mode,
+            compresslevel=GZIP_LEVEL if level is None else level,
+        )
+    if codec == "lzma":
+        if mode == "rb":
+            return lzma.LZMAFile(raw, mode)
+        return lzma.LZMAFile(raw, mode, preset=level)
+    zstd = _zstd()
+    if hasattr(zstd, "ZstdFile"):
+        return zstd.ZstdFile(raw, mode, level=level if mode == "wb" else None)
+    if mode == "rb":
+        return io.BufferedReader(
+            zstd.ZstdDecompressor().stream_reader(
+                raw, read_across_frames=True, closefd=False
+            )
+        )
+    return zstd.ZstdCompressor(level=3 if level is None else level).stream_writer(
+        raw, closefd=False
+    )
+
+
+@contextmanager
+def open_file(path, mode: str = "rb", level=None):
+    """
+    Открывает файл данных; сжатие и распаковка - по расширению
+    mode - "rb", "wb" или "ab" (дописывание - новым сжатым блоком).
+    """
+    codec = codec_for(path)
+    with open(path, mode) as raw:
+        if codec is None:
+            yield raw
+        else:
+            with codec_stream(raw, codec, mode, level) as stream:
+                yield stream
+
+
+def compress(data: bytes, codec: str | None) -> bytes:
+    """
+    Один независимый сжатый блок (для дописывания одной записью)
+    """
+    if codec is None:
+        return data
+    if codec == "gzip":
+        return gzip.compress(data, GZIP_LEVEL)
+    if codec == "lzma":
+        return lzma.compress(data)
+    zstd = _zstd()
+    if hasattr(zstd, "ZstdFile"):
+        return zstd.compress(data)
+    return zstd.ZstdCompressor().compress(data)
+
+
+def _decompressor(codec: str):
+    if codec == "gzip":
+        return zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    if codec == "lzma":
+        return lzma.LZMADecompressor()
+    zstd = _zstd()
+    if hasattr(zstd, "ZstdFile"):
+        return zstd.ZstdDecompressor()
+    return zstd.ZstdDecompressor().decompressobj()
+
+
+def iter_members(
+    raw: BinaryIO, codec: str, chunk_size: int = CHUNK_SIZE
+) -> Iterator[tuple[bytes, int | None]]:
+    """
+    Потоково распаковывает сжатые блоки файла с его текущей позиции
+    Отдаёт пары (распакованные данные, смещение): у последней части блока
+    смещение - позиция конца блока в файле, у остальных - None.
+    Незавершённый блок в конце файла отдаётся без смещения.
+    """
+    position = raw.tell()
+    decompressor = _decompressor(codec)
+    data = b""
+    while True:
+        if not data:
+            data = raw.read(chunk_size)
+            if not data:
+                return
+        chunk = decompressor.decompress(data)
+        if decompressor.eof:
+            rest = decompressor.unused_data
+            position += len(data) - len(rest)
+            yield chunk, position
+            data = rest
+            decompressor = _decompressor(codec)
+        else:
+            position += len(data)
+            data = b""
+            if chunk:
+                yield chunk, None
+
+
+def recompress(source, target, level=None) -> Path:
+    """
+    Перезаписывает файл source в target с кодеком по расширению target
+    Данные копируются потоком через временный файл; source удаляется, если
+    это другой файл. Все блоки source сливаются в один.
+    """
+    return merge_files([source], target, level)
+
+
+def merge_files(sources, target, level=None) -> Path:
+    """
+    Записывает распакованное содержимое sources по порядку в target
+    Кодек - по расширению target; данные копируются потоком через временный
+    файл одним блоком. Исходные файлы, кроме самого target, удаляются.
+    """
+    sources, target = [Path(source) for source in sources], Path(target)
+    tmp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as raw:
+        with codec_stream(raw, codec_for(target), "w", level) as dst:
+            for source in sources:
+                with open_file(source, "rb") as src:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    os.replace(tmp_path, target)
+    for source in sources:
+        if source != target:
+            source.unlink()
+    return target
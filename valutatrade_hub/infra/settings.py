@@ -4,6 +4,8 @@ import os
 from pathlib import Path
 from typing import Any
 
+from valutatrade_hub.infra.compression import check_codec, compressed_path
+
 
 class SettingsLoader:
     """
@@ -19,8 +21,10 @@ class SettingsLoader:
         Кода меньше, за счёт этого читаемость и ясность кода значительно выше.
         """
         if SettingsLoader._instance is None:
-            SettingsLoader._instance = super().__new__(cls)
-            SettingsLoader._instance._init_values()
+            instance = super().__new__(cls)
+            # Экземпляр запоминается, только если настройки прочитаны без ошибок
+            instance._init_values()
+            SettingsLoader._instance = instance
 
         return SettingsLoader._instance
 
@@ -46,12 +50,34 @@ class SettingsLoader:
         else:
             data_dir.mkdir(parents=True, exist_ok=True)
 
+        # Кодек истории курсов, журналов сделок и состояний P&L
+        compression = check_codec(os.getenv("VALUTATRADE_COMPRESSION"))
+
         self._values = {
             "DATA_DIR": str(data_dir),
             "USERS_FILE": str(data_dir / "users.json"),
             "PORTFOLIOS_FILE": str(data_dir / "portfolios.json"),
             "RATES_FILE": str(data_dir / "rates.json"),
+            "HISTORY_FILE": compressed_path(
+                data_dir / "exchange_rates.json", compression
+            ),
+            "HISTORY_COLUMNAR_FILE": str(data_dir / "exchange_rates.vth"),
+            "ORDERS_FILE": str(data_dir / "orders.json"),
+            "LEDGER_DIR": str(data_dir / "ledger"),
+            "DATA_COMPRESSION": compression,
+            "CURRENCIES_FILE": os.getenv(
+                "VALUTATRADE_CURRENCIES", str(data_dir / "currencies.json")
+            ),
+            "SESSIONS_FILE": str(data_dir / "sessions.json"),
+            "SESSION_FILE": str(data_dir / "session.json"),
+            "SESSION_SECRET_FILE": str(data_dir / ".session_secret"),
+            "SESSION_TTL_SECONDS": int(os.getenv("VALUTATRADE_SESSION_TTL", "86400")),
             "RATES_TTL_SECONDS": int(os.getenv("VALUTATRADE_RATES_TTL", "600")),
+            "QUOTE_TTL_SECONDS": int(os.getenv("VALUTATRADE_QUOTE_TTL", "30")),
+            "SERVICE_ADDRESS": os.getenv(
+                "VALUTATRADE_SERVICE", str(data_dir / "valutatrade.sock")
+            ),
+            "METRICS_ADDRESS": os.getenv("VALUTATRADE_METRICS", "127.0.0.1:9108"),
         }
 
     def get(self, key: str, default: Any | None = None) -> Any:
@@ -1,24 +1,226 @@
+"""
+Асинхронное логирование приложения.
+Записи кладутся в ограниченную очередь (QueueHandler), а форматирование
+и запись в файл и терминал выполняет фоновый поток QueueListener.
+В файл logs/app.log пишется по одному JSON-объекту на строку.
+Если очередь переполнена, запись отбрасывается и учитывается в счётчике
+dropped_records(), чтобы всплеск нагрузки не блокировал операции.
+"""
+
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+from datetime import datetime
 
 from valutatrade_hub.infra.settings import SettingsLoader
 
+LOGGER_NAME = "ValutaTrade"
+LOG_QUEUE_SIZE = 10000
+
+_listener: logging.handlers.QueueListener | None = None
+_setup_lock = threading.Lock()
+_dropped = 0
+_dropped_lock = threading.Lock()
 
-def setup_logger():
-    """Единый логгер приложения."""
-    settings = SettingsLoader()
-    logs_dir = settings.get("LOGS_DIR") or "logs"
-    os.makedirs(logs_dir, exist_ok=True)
 
-    log_file = os.path.join(logs_dir, "app.log")
+class ActionRecord:
+    """
+    Структурированное сообщение об операции (см. decorators.log_action)
+    Текст собирается только при выводе - в потоке записи логов; до передачи
+    в очередь запись фиксируется (см. frozen), чтобы вывод не зависел от
+    дальнейших изменений параметров.
+    """
 
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(levelname)s] %(message)s",
-        handlers=[
-            logging.FileHandler(log_file, encoding="utf-8"),
-            logging.StreamHandler(),
-        ],
+    __slots__ = (
+        "timestamp",
+        "action",
+        "params",
+        "result",
+        "error_type",
+        "error_message",
+        "context",
     )
 
-    return logging.getLogger("ValutaTrade")
\ No newline at end of file
+    def __init__(
+        self,
+        timestamp: str,
+        action: str,
+        params: dict,
+        result: str,
+        error: Exception | None = None,
+        context: dict | None = None,
+    ) -> None:
+        self.timestamp = timestamp
+        self.action = action
+        self.params = params
+        self.result = result
+        self.error_type = type(error).__name__ if error is not None else None
+        self.error_message = str(error) if error is not None else None
+        self.context = context
+
+    def frozen(self) -> "ActionRecord":
+        """
+        Копия с собственными params и context (значения context - строки)
+        """
+        record = copy.copy(self)
+        record.params = dict(self.params)
+        if self.context is not None:
+            record.context = {key: str(value) for key, value in self.context.items()}
+        return record
+
+    def to_dict(self) -> dict:
+        data = {
+            "timestamp": self.timestamp,
+            "action": self.action,
+            "user": self.params["username"],
+            "currency": self.params["currency"],
+            "amount": self.params["amount"],
+            "rate": self.params["rate"],
+            "base": self.params["base"],
+            "result": self.result,
+        }
+        if self.error_type is not None:
+            data["error_type"] = self.error_type
+            data["error_message"] = self.error_message
+        if self.context is not None:
+            data["context"] = {key: str(value) for key, value in self.context.items()}
+        return data
+
+    def __str__(self) -> str:
+        params = self.params
+        message = (
+            f"{self.timestamp} {self.action} user='{params['username']}' "
+            f"currency='{params['currency'] or 'N/A'}' "
+            f"amount={params['amount'] or 'N/A'} "
+            f"rate={params['rate'] or 'N/A'} "
+            f"base='{params['base']}' "
+            f"result={self.result}"
+        )
+        if self.error_type is not None:
+            message += (
+                f" error_type='{self.error_type}' "
+                f"error_message='{self.error_message}'"
+            )
+        if self.context is not None:
+            message += f" context={self.context}"
+        return message
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Запись лога в виде одной строки JSON
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+        }
+        if isinstance(record.msg, ActionRecord):
+            data.update(record.msg.to_dict())
+        else:
+            data["message"] = record.getMessage()
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+_EXC_FORMATTER = logging.Formatter()
+
+
+class _BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, который не блокируется и не форматирует запись целиком
+    В очередь попадает копия записи без ссылок на изменяемые данные
+    вызывающего: msg % args подставляется сразу, ActionRecord фиксируется,
+    трассировка исключения переводится в текст. Форматирование строк вывода
+    и JSON остаётся потоку записи; при полной очереди запись отбрасывается.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if isinstance(record.msg, ActionRecord):
+            record.msg = record.msg.frozen()
+        else:
+            record.message = record.getMessage()
+            record.msg = record.message
+            record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        global _dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with _dropped_lock:
+                _dropped += 1
+
+
+def dropped_records() -> int:
+    """
+    Число записей, отброшенных из-за переполнения очереди
+    """
+    return _dropped
+
+
+def shutdown_logging() -> None:
+    """
+    Дописывает записи из очереди и останавливает поток записи
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def setup_logger() -> logging.Logger:
+    """Единый логгер приложения. Повторные вызовы возвращают тот же логгер."""
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+    if _listener is not None:
+        return logger
+
+    with _setup_lock:
+        if _listener is not None:
+            return logger
+
+        settings = SettingsLoader()
+        logs_dir = settings.get("LOGS_DIR") or "logs"
+        os.makedirs(logs_dir, exist_ok=True)
+
+        file_handler = logging.FileHandler(
+            os.path.join(logs_dir, "app.log"), encoding="utf-8"
+        )
+        file_handler.setFormatter(JsonFormatter())
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(
+            logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
+        )
+
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        logger.handlers.clear()
+        logger.addHandler(_BoundedQueueHandler(log_queue))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+        _listener = logging.handlers.QueueListener(
+            log_queue, file_handler, stream_handler, respect_handler_level=True
+        )
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+    return logger
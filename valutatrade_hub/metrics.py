@@ -0,0 +1,324 @@
+"""
+Метрики приложения в текстовом формате Prometheus.
+Счётчики, gauge и гистограммы хранят значения в простых атрибутах:
+обновление - поиск по кортежу меток и сложение, без блокировок (под
+конкуренцией потоков значения приближённые, как и в stats). Метрики,
+которые дорого поддерживать на каждой операции (возраст курсов, размеры
+журналов), вычисляются сборщиками только при экспорте.
+Экспорт: HTTP-эндпоинт /metrics (см. start_http_server) и файл
+logs/metrics.prom, который периодически обновляют долгоживущие режимы (см.
+start_file_writer) или записывает команда metrics --out. Короткие запуски
+CLI файл не трогают: их счётчики не затирают счётчики сервиса.
+"""
+
+import atexit
+import logging
+import os
+import threading
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+from valutatrade_hub.infra.settings import SettingsLoader
+from valutatrade_hub.logging_config import LOGGER_NAME
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Период записи файла метрик в долгоживущих режимах, секунды
+FILE_WRITE_INTERVAL = 15.0
+
+# Сборщик возвращает семейства: (имя, тип, описание, [(метки, значение)])
+Family = tuple[str, str, str, list[tuple[dict, float]]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    body = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return "{" + body + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self._children: dict[tuple, object] = {}
+
+    def _new_child(self):
+        return _Value()
+
+    def labels(self, *values):
+        """
+        Значение с заданными метками (создаётся при первом обращении)
+        """
+        # Метки хранятся строками: 1 и "1" - одно значение
+        key = tuple(map(str, values))
+        child = self._children.get(key)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(
+                    f"Метрика {self.name} ожидает метки {self.label_names}"
+                )
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def samples(self) -> Iterable[tuple[str, dict, float]]:
+        for values, child in list(self._children.items()):
+            yield self.name, dict(zip(self.label_names, values)), child.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple = (),
+        buckets: tuple[float, ...] = DURATION_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self) -> Iterable[tuple[str, dict, float]]:
+        for values, child in list(self._children.items()):
+            labels = dict(zip(self.label_names, values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    {**labels, "le": _format_value(float(bound))},
+                    cumulative,
+                )
+            yield f"{self.name}_sum", labels, child.sum
+            yield f"{self.name}_count", labels, child.count
+
+
+class Registry:
+    """
+    Набор метрик и сборщиков, отображаемый в текстовый формат Prometheus
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[[], Iterable[Family]]] = []
+
+    def _add(self, metric: _Metric) -> _Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labels: tuple = ()) -> Counter:
+        return self._add(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: tuple = ()) -> Gauge:
+        return self._add(Gauge(name, documentation, labels))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple = (),
+        buckets: tuple[float, ...] = DURATION_BUCKETS,
+    ) -> Histogram:
+        return self._add(Histogram(name, documentation, labels, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+        """
+        Добавляет функцию, вычисляющую метрики в момент экспорта
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(
+                        f"{name}{_format_labels(labels)} {_format_value(value)}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+TRADES = REGISTRY.counter(
+    "valutatrade_trades_total", "Исполненные сделки", ("side", "currency")
+)
+ERRORS = REGISTRY.counter(
+    "valutatrade_errors_total", "Операции, завершившиеся ошибкой", ("action", "type")
+)
+RATES_UPDATE_DURATION = REGISTRY.histogram(
+    "valutatrade_rates_update_duration_seconds",
+    "Длительность запроса курсов у провайдера",
+    ("provider",),
+)
+RATES_UPDATE_ERRORS = REGISTRY.counter(
+    "valutatrade_rates_update_errors_total",
+    "Неудачные запросы курсов у провайдера",
+    ("provider",),
+)
+RATES_UPDATED = REGISTRY.gauge(
+    "valutatrade_rates_last_success_timestamp_seconds",
+    "Время последнего успешного обновления курсов (Unix)",
+    ("provider",),
+)
+
+
+def metrics_file() -> str:
+    settings = SettingsLoader()
+    return os.path.join(settings.get("LOGS_DIR") or "logs", "metrics.prom")
+
+
+def write_metrics(path: str | None = None) -> None:
+    """
+    Атомарно записывает метрики процесса в файл (формат textfile-коллектора)
+    """
+    path = path or metrics_file()
+    # Сборщики вызываются до создания временного файла: их ошибка его не оставит
+    text = REGISTRY.render()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _write_metrics_quietly(path: str | None) -> None:
+    """
+    Запись файла метрик из фонового потока: ошибка (в том числе сборщика)
+    логируется, а не останавливает периодическую запись
+    """
+    try:
+        write_metrics(path)
+    except Exception:
+        logging.getLogger(LOGGER_NAME).exception(
+            "Не удалось записать метрики в '%s'", path or metrics_file()
+        )
+
+
+def start_file_writer(
+    interval: float = FILE_WRITE_INTERVAL, path: str | None = None
+) -> threading.Thread:
+    """
+    Записывает метрики в файл каждые interval секунд в фоновом потоке и
+    последний раз - при завершении процесса
+    Для долгоживущих режимов (--serve): файл отражает счётчики процесса с
+    момента запуска.
+    """
+    stop = threading.Event()
+
+    def run() -> None:
+        while not stop.wait(interval):
+            _write_metrics_quietly(path)
+
+    def finish() -> None:
+        stop.set()
+        _write_metrics_quietly(path)
+
+    thread = threading.Thread(target=run, name="metrics-file", daemon=True)
+    thread.start()
+    atexit.register(finish)
+    return thread
+
+
+def start_http_server(address: str):
+    """
+    Запускает HTTP-эндпоинт /metrics в фоновом потоке
+    address - "host:port" или только порт (тогда слушается 127.0.0.1).
+    """
+    # http.server загружается только при включённом эндпоинте
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    host, _, port = address.rpartition(":")
+    try:
+        port = int(port)
+    except ValueError:
+        raise ValueError(f"Некорректный адрес метрик '{address}'") from None
+    server = ThreadingHTTPServer((host or "127.0.0.1", port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="metrics-http", daemon=True
+    ).start()
+    return server
@@ -39,7 +39,7 @@ class CoinGeckoClient(BaseApiClient):
         line_ids = line_ids[:-1]
         fiat_ids = ""
         for currency in self.cfg.FIAT_CURRENCIES:
-            currency_id = currency.lower()
+            currency_id = self.cfg.FIAT_ID_MAP.get(currency, currency.lower())
             fiat_ids += currency_id + ","
         fiat_ids = fiat_ids[:-1]
         url = (
@@ -55,11 +55,11 @@ class CoinGeckoClient(BaseApiClient):
             crypto_info = requests.get(url).json()
             update_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             result = {}
+            codes_by_id = {val: cur for cur, val in self.cfg.CRYPTO_ID_MAP.items()}
             for key in crypto_info.keys():
-                for cur, val in self.cfg.CRYPTO_ID_MAP.items():
-                    if str(key) == val:
-                        parsed_cur = cur
-                        break
+                parsed_cur = codes_by_id.get(str(key))
+                if parsed_cur is None:
+                    continue
                 result[parsed_cur + "_" + self.cfg.BASE_CURRENCY] = {
                     "rate": float(crypto_info[key][self.cfg.BASE_CURRENCY.lower()]),
                     "updated_at": update_time,
@@ -73,13 +73,14 @@ class CoinGeckoClient(BaseApiClient):
                     "source": "CoinGecko",
                 }
                 for fiat_cur in self.cfg.FIAT_CURRENCIES:
+                    fiat_id = self.cfg.FIAT_ID_MAP.get(fiat_cur, fiat_cur.lower())
                     result[parsed_cur + "_" + fiat_cur] = {
-                        "rate": float(crypto_info[key][fiat_cur.lower()]),
+                        "rate": float(crypto_info[key][fiat_id]),
                         "updated_at": update_time,
                         "source": "CoinGecko",
                     }
                     result[fiat_cur + "_" + parsed_cur] = {
-                        "rate": float(1 / float(crypto_info[key][fiat_cur.lower()])),
+                        "rate": float(1 / float(crypto_info[key][fiat_id])),
                         "updated_at": update_time,
                         "source": "CoinGecko",
                     }
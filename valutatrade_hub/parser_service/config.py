@@ -1,6 +1,12 @@
 import os
 from dataclasses import dataclass, field
 
+from valutatrade_hub.core.currencies import CURRENCIES
+from valutatrade_hub.infra.compression import compressed_path
+from valutatrade_hub.infra.settings import SettingsLoader
+
+DEFAULT_BASE_CURRENCY = "USD"
+
 
 @dataclass
 class ParserConfig:
@@ -11,13 +17,15 @@ class ParserConfig:
     - EXCHANGERATE_API_URL - общая часть ссылки на ExchangeRate API.
     - BASE_CURRENCY - базовая валюта.
     - FIAT_CURRENCIES - коды поддерживаемых фиатных валют.
-    - FIAT_ID_MAP - имена поддерживаемых фиатных валют.
+    - FIAT_ID_MAP - идентификаторы фиатных валют у провайдеров.
     - CRYPTO_CURRENCIES - коды поддерживаемых криптовалют.
-    - CRYPTO_ID_MAP - имена поддерживаемых криптовалют.
+    - CRYPTO_ID_MAP - идентификаторы криптовалют в CoinGecko.
     - RATES_FILE_PATH - путь к файлу с кэшами обменных курсов.
-    - HISTORY_FILE_PATH - путь к файлу с историей записей в кэш курсов.
+    - HISTORY_FILE_PATH - путь к файлу с историей записей в кэш курсов
+    (с расширением кодека в режиме сжатия).
     - REQUEST_TIMEOUT - время в секундах, после которого ожидание
     запроса к API принудительно прекращается.
+    Списки валют по умолчанию берутся из реестра валют (CURRENCIES).
     """
 
     EXCHANGERATE_API_KEY: str = os.getenv(
@@ -25,21 +33,32 @@ class ParserConfig:
     )
     COINGECKO_URL: str = "https://api.coingecko.com/api/v3/simple/price"
     EXCHANGERATE_API_URL: str = "https://v6.exchangerate-api.com/v6"
-    BASE_CURRENCY: str = "USD"
-    FIAT_CURRENCIES: tuple = ("EUR", "RUB")
+    BASE_CURRENCY: str = DEFAULT_BASE_CURRENCY
+    FIAT_CURRENCIES: tuple = tuple(
+        currency.code
+        for currency in CURRENCIES.of_kind("fiat")
+        if currency.code != DEFAULT_BASE_CURRENCY
+    )
     FIAT_ID_MAP: dict = field(
         default_factory=lambda: {
-            "EUR": "euro",
-            "RUB": "ruble",
+            currency.code: currency.provider_id
+            for currency in CURRENCIES.of_kind("fiat")
         }
     )
-    CRYPTO_CURRENCIES: tuple = ("BTC", "ETH")
+    CRYPTO_CURRENCIES: tuple = tuple(
+        currency.code
+        for currency in CURRENCIES.of_kind("crypto")
+        if currency.provider_id
+    )
     CRYPTO_ID_MAP: dict = field(
         default_factory=lambda: {
-            "BTC": "bitcoin",
-            "ETH": "ethereum",
+            currency.code: currency.provider_id
+            for currency in CURRENCIES.of_kind("crypto")
+            if currency.provider_id
         }
     )
     RATES_FILE_PATH: str = "data/rates.json"
-    HISTORY_FILE_PATH: str = "data/exchange_rates.json"
+    HISTORY_FILE_PATH: str = compressed_path(
+        "data/exchange_rates.json", SettingsLoader().get("DATA_COMPRESSION")
+    )
     REQUEST_TIMEOUT: int = 10
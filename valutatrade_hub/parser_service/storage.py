@@ -1,4 +1,7 @@
+import valutatrade_hub.core.history_import as history_import
+import valutatrade_hub.core.history_index as history_index
 import valutatrade_hub.core.utils as utils
+import valutatrade_hub.infra.compression as compression
 import valutatrade_hub.parser_service.config as config
 
 
@@ -20,14 +23,25 @@ class StorageUpdater:
         for key, value in rates["pairs"].items():
             json_data["pairs"][key] = value
         json_data["last_refresh"] = rates["last_refresh"]
+        json_data["version"] = json_data.get("version", 0) + 1
         utils.save_json(self.cfg.RATES_FILE_PATH, json_data)
 
     def save_history(self, history_entry: dict):
-        json_data = utils.load_json(self.cfg.HISTORY_FILE_PATH)
+        """
+        Дописывает записи в конец истории. Повторы проверяются по индексу
+        идемпотентности (exchange_rates.idx), сама история не читается.
+        """
         if not history_entry:
             raise ValueError("Попытка передать пустой словарь.")
-        for key, value in history_entry.items():
-            if key in json_data.keys():
+        # История, начатая в другом режиме хранения, дописывается в своём кодеке
+        path = compression.stored_path(self.cfg.HISTORY_FILE_PATH)
+        with history_index.locked_index(path) as index:
+            keys = [history_index.history_key(str(key)) for key in history_entry]
+            if any(key in index for key in keys):
                 raise ValueError("Такая запись в истории уже существует.")
-            json_data.update({key: value})
-        utils.save_json(self.cfg.HISTORY_FILE_PATH, json_data)
+            for key in keys:
+                index.add(key)
+            with history_import.HistoryAppender(path) as appender:
+                appender.write(
+                    history_import.format_records(history_entry).encode("utf-8")
+                )
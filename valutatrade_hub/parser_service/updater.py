@@ -1,9 +1,12 @@
 import datetime
+import time
 
 import valutatrade_hub.core.exceptions as exceptions
+import valutatrade_hub.metrics as metrics
 import valutatrade_hub.parser_service.api_clients as api_clients
 import valutatrade_hub.parser_service.config as config
 import valutatrade_hub.parser_service.storage as storage
+from valutatrade_hub.core.rates import split_pair
 
 
 class RatesUpdater:
@@ -13,13 +16,57 @@ class RatesUpdater:
         fiat_api: api_clients.ExchangeRateApiClient,
         storage: storage.StorageUpdater,
         input_source: str = "",
+        engine=None,
     ):
+        """
+        engine - торговый движок, отложенные заявки которого исполняются по
+        новым курсам после каждого обновления; по умолчанию - движок
+        core.usecases.
+        """
         self.crypto_api = crypto_api
         self.fiat_api = fiat_api
         self.storage = storage
         self.input_source = input_source.lower()
+        self.engine = engine
         self.cfg = config.ParserConfig()
 
+    @staticmethod
+    def _fetch(provider: str, api: api_clients.BaseApiClient) -> dict:
+        """
+        Запрашивает курсы у провайдера, учитывая длительность и ошибки в метриках
+        """
+        started = time.perf_counter()
+        try:
+            rates = api.fetch_rates()
+        except exceptions.ApiRequestError:
+            metrics.RATES_UPDATE_ERRORS.labels(provider).inc()
+            raise
+        finally:
+            metrics.RATES_UPDATE_DURATION.labels(provider).observe(
+                time.perf_counter() - started
+            )
+        metrics.RATES_UPDATED.labels(provider).set(time.time())
+        return rates
+
+    def _match_orders(self, pairs: dict) -> None:
+        """
+        Исполняет сработавшие отложенные заявки по новым курсам.
+        Заявка, которую не удалось исполнить, снимается с книги (см.
+        TradingEngine.match_orders).
+        """
+        engine = self.engine
+        if engine is None:
+            # Движок по умолчанию создаётся при первом обращении к usecases
+            from valutatrade_hub.core.usecases import engine
+        for order, result in engine.match_orders(pairs):
+            if result == "filled":
+                print(
+                    f"INFO: Заявка #{order.order_id} исполнена: {order.side} "
+                    f"{order.amount} {order.currency_code}"
+                )
+            else:
+                print(f"WARNING: Заявка #{order.order_id} отменена: {result}")
+
     def run_update(self):
         """
         Обращается к api_clients, чтобы получить курсы обмена валют,
@@ -47,7 +94,7 @@ class RatesUpdater:
             try:
                 print("INFO: Запрос с CoinGecko...", end="")
                 crypto_output = {}
-                crypto_output = self.crypto_api.fetch_rates()
+                crypto_output = self._fetch("coingecko", self.crypto_api)
                 print(f"OK ({len(crypto_output)} rates)")
                 for key_rate in crypto_output:
                     rates["pairs"][key_rate] = crypto_output[key_rate]
@@ -58,7 +105,7 @@ class RatesUpdater:
             try:
                 print("INFO: Запрос с ExchangeRate-API...", end="")
                 fiat_output = {}
-                fiat_output = self.fiat_api.fetch_rates()
+                fiat_output = self._fetch("exchangerate", self.fiat_api)
                 print(f"OK ({len(fiat_output)} rates)")
                 for key_rate in fiat_output:
                     rates["pairs"][key_rate] = fiat_output[key_rate]
@@ -71,6 +118,8 @@ class RatesUpdater:
             f"в {self.cfg.RATES_FILE_PATH}..."
         )
         self.storage.save_rates(rates)
+        if rates["pairs"]:
+            self._match_orders(rates["pairs"])
         if not errors:
             print(
                 f"Обновление успешно. "
@@ -85,8 +134,7 @@ class RatesUpdater:
             )
         history_update = {}
         for key, value in rates["pairs"].items():
-            history_from_currency = str(key).split("_")[0]
-            history_to_currency = str(key).split("_")[1]
+            history_from_currency, history_to_currency = split_pair(str(key))
             history_rate = float(value["rate"])
             history_timestamp = value["updated_at"]
             history_source = value["source"]
@@ -0,0 +1,200 @@
+"""
+Профилирование команд и операций по запросу.
+Включается переменными окружения или флагами main.py:
+  VALUTATRADE_PROFILE=cpu,mem - что собирать (cProfile и/или tracemalloc);
+  VALUTATRADE_PROFILE_TARGETS=buy,get-rate - какие команды (по умолчанию все);
+  VALUTATRADE_PROFILE_EVERY=N - профилировать только каждый N-й вызов;
+  VALUTATRADE_PROFILE_TOP=N - сколько строк выводить в отчёт.
+Обёртка стоит на уровне dispatch (команды CLI) и log_action (операции
+движка - в том числе в сервисе). Вложенные вызовы не профилируются
+повторно: профиль снимает внешний уровень. Отчёты пишутся в logs/profiles.
+"""
+
+import io
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+from valutatrade_hub.infra.settings import SettingsLoader
+from valutatrade_hub.logging_config import setup_logger
+
+PROFILE_MODES = ("cpu", "mem")
+
+logger = setup_logger()
+
+enabled = False
+_modes: frozenset[str] = frozenset()
+_targets: frozenset[str] | None = None
+_every = 1
+_top = 25
+_calls = 0
+# cProfile и tracemalloc глобальны для процесса - профиль снимается один
+_active = threading.Lock()
+# Вызов уже учтён внешним уровнем (dispatch -> log_action)
+_local = threading.local()
+
+
+def _normalize(name: str) -> str:
+    """
+    Команда 'get-rate' и операция 'GET_RATE' - одна цель профилирования
+    """
+    return name.strip().lower().replace("_", "-")
+
+
+def _split(value: str | None) -> list[str]:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        raise ValueError(f"{name} должна быть целым числом") from None
+
+
+def configure(
+    modes: str | None = None,
+    targets: str | None = None,
+    every: int | None = None,
+    top: int | None = None,
+) -> None:
+    """
+    Настраивает профилирование; не заданные параметры берутся из окружения
+    """
+    global enabled, _modes, _targets, _every, _top, _calls
+
+    modes = _split(modes if modes is not None else os.getenv("VALUTATRADE_PROFILE"))
+    unknown = [mode for mode in modes if mode not in PROFILE_MODES]
+    if unknown:
+        raise ValueError(
+            f"Неизвестный режим профилирования '{unknown[0]}'. "
+            f"Доступны: {', '.join(PROFILE_MODES)}"
+        )
+
+    targets = _split(
+        targets if targets is not None else os.getenv("VALUTATRADE_PROFILE_TARGETS")
+    )
+    every = every if every is not None else _env_int("VALUTATRADE_PROFILE_EVERY", 1)
+    top = top if top is not None else _env_int("VALUTATRADE_PROFILE_TOP", 25)
+    if every < 1 or top < 1:
+        raise ValueError("Период и размер отчёта профилирования должны быть больше 0")
+
+    _modes = frozenset(modes)
+    _targets = frozenset(_normalize(target) for target in targets) or None
+    _every = every
+    _top = top
+    _calls = 0
+    enabled = bool(_modes)
+
+
+def _matches(name: str) -> bool:
+    return _targets is None or _normalize(name) in _targets
+
+
+def _next_call_profiled() -> bool:
+    global _calls
+    _calls += 1
+    return _calls % _every == 0
+
+
+def profiles_dir() -> str:
+    settings = SettingsLoader()
+    return os.path.join(settings.get("LOGS_DIR") or "logs", "profiles")
+
+
+def run(name: str, func, *args, **kwargs):
+    """
+    Вызывает func; если для name включено профилирование - под профилировщиком
+    """
+    if not enabled or getattr(_local, "claimed", False) or not _matches(name):
+        return func(*args, **kwargs)
+
+    _local.claimed = True
+    try:
+        if _next_call_profiled() and _active.acquire(blocking=False):
+            try:
+                return _profiled(name, func, args, kwargs)
+            finally:
+                _active.release()
+        return func(*args, **kwargs)
+    finally:
+        _local.claimed = False
+
+
+def _profiled(name: str, func, args: tuple, kwargs: dict):
+    # Профилировщики загружаются только при первом профилируемом вызове
+    import cProfile
+    import tracemalloc
+
+    profile = cProfile.Profile() if "cpu" in _modes else None
+    trace_memory = "mem" in _modes
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    elif trace_memory:
+        tracemalloc.reset_peak()
+
+    started = time.perf_counter()
+    if profile is not None:
+        profile.enable()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        if profile is not None:
+            profile.disable()
+        elapsed = time.perf_counter() - started
+        snapshot = peak = None
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+        _write_report(name, elapsed, profile, snapshot, peak)
+
+
+def _write_report(
+    name: str,
+    elapsed: float,
+    profile,
+    snapshot,
+    peak: int | None,
+) -> None:
+    import pstats
+    import tracemalloc
+
+    slug = re.sub(r"[^a-z0-9-]+", "_", _normalize(name))
+    directory = profiles_dir()
+    path = os.path.join(directory, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{slug}.txt")
+
+    report = io.StringIO()
+    report.write(f"Профиль '{name}': {elapsed * 1000:.3f} мс\n")
+    if profile is not None:
+        report.write(f"\nTop-{_top} функций по накопленному времени (cProfile):\n")
+        stats = pstats.Stats(profile, stream=report)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(_top)
+    if snapshot is not None:
+        snapshot = snapshot.filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, __file__),
+            )
+        )
+        report.write(f"\nПик памяти: {peak / 1024:.1f} KiB\n")
+        report.write(f"Top-{_top} мест выделения памяти (tracemalloc):\n")
+        for stat in snapshot.statistics("lineno")[:_top]:
+            report.write(f"{stat}\n")
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(report.getvalue())
+    except OSError as e:
+        logger.error("Не удалось сохранить профиль '%s': %s", name, e)
+        return
+    logger.info("Профиль '%s' сохранён: %s", name, path)
+
+
+configure()
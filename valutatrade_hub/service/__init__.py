@@ -0,0 +1,4 @@
+from .client import ServiceClient
+from .protocol import ServiceError
+
+__all__ = ["ServiceClient", "ServiceError"]
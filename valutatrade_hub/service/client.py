@@ -0,0 +1,55 @@
+"""
+Тонкий клиент сервиса ValutaTrade: одно постоянное соединение,
+синхронные вызовы методов.
+"""
+
+import itertools
+import socket
+
+from valutatrade_hub.service.protocol import ServiceError, decode, encode, parse_address
+
+
+class ServiceClient:
+    """
+    Клиент JSON-RPC сервиса.
+    Пример: ServiceClient("data/valutatrade.sock").call("get_rate", ...)
+    """
+
+    def __init__(self, address: str, timeout: float | None = 30.0) -> None:
+        target = parse_address(address)
+        if isinstance(target, tuple):
+            self._sock = socket.create_connection(target, timeout=timeout)
+        else:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.settimeout(timeout)
+            self._sock.connect(target)
+        self._file = self._sock.makefile("rb")
+        self._ids = itertools.count(1)
+
+    def call(self, method: str, **params):
+        """
+        Вызывает метод сервиса; ошибка сервиса поднимается как ServiceError
+        """
+        request_id = next(self._ids)
+        self._sock.sendall(
+            encode({"id": request_id, "method": method, "params": params})
+        )
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Сервис закрыл соединение")
+
+        response = decode(line)
+        if "error" in response:
+            error = response["error"]
+            raise ServiceError(error["message"], error.get("type", "ServiceError"))
+        return response.get("result")
+
+    def close(self) -> None:
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self) -> "ServiceClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,40 @@
+"""
+Протокол сервиса ValutaTrade: JSON-RPC поверх потокового сокета.
+Каждое сообщение - одна строка JSON:
+- запрос: {"id": 1, "method": "buy", "params": {"currency": "BTC", ...}};
+- ответ: {"id": 1, "result": ...} или {"id": 1, "error": {"type", "message"}}.
+"""
+
+import json
+
+
+class ServiceError(ValueError):
+    """
+    Ошибка, которую вернул сервис в ответ на запрос.
+    - type - имя класса исключения на стороне сервиса.
+    """
+
+    def __init__(self, message: str, error_type: str = "ServiceError") -> None:
+        super().__init__(message)
+        self.type = error_type
+
+
+def parse_address(address: str) -> tuple[str, int] | str:
+    """
+    Адрес сервиса: "host:port" для TCP или путь к Unix-сокету
+    """
+    host, sep, port = address.rpartition(":")
+    if sep and host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+def encode(message: dict) -> bytes:
+    return (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def decode(line: bytes) -> dict:
+    message = json.loads(line)
+    if not isinstance(message, dict):
+        raise ValueError("Сообщение должно быть JSON-объектом")
+    return message
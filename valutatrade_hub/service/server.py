@@ -0,0 +1,242 @@
+"""
+Долгоживущий сервис ValutaTrade на asyncio.
+Хранилища пользователей, портфелей и кэш курсов живут в памяти процесса,
+поэтому запросы не перечитывают JSON-файлы. Изменяющие запросы проходят
+через одну очередь и исполняются единственной задачей-писателем в порядке
+поступления; запросы на чтение выполняются параллельно, не ожидая очереди.
+Обработчики работают в пуле потоков, поэтому файловый ввод-вывод не
+останавливает цикл событий и других клиентов. Чтение, которому нужно
+обновить устаревший курс (и записать rates.json), передаётся писателю.
+Вход (login) привязан к соединению.
+"""
+
+import asyncio
+import functools
+import os
+import signal
+
+from valutatrade_hub.core.usecases import (
+    buy,
+    get_portfolio_summary,
+    get_quote,
+    get_rate,
+    login_user,
+    register_user,
+    sell,
+    show_rates,
+)
+from valutatrade_hub.service.protocol import decode, encode, parse_address
+
+# Максимум изменяющих запросов в очереди писателя
+WRITE_QUEUE_SIZE = 1024
+
+
+class _Session:
+    """
+    Состояние одного клиентского соединения
+    """
+
+    __slots__ = ("user_id", "username")
+
+    def __init__(self) -> None:
+        self.user_id: int | None = None
+        self.username: str | None = None
+
+    def require_login(self) -> int:
+        if self.user_id is None:
+            raise ValueError("Сначала выполните login.")
+        return self.user_id
+
+
+def _register(session: _Session, username: str, password: str) -> dict:
+    user = register_user(username, password)
+    return {"user_id": user.user_id, "username": user.username}
+
+
+def _login(session: _Session, username: str, password: str) -> dict:
+    user = login_user(username, password)
+    session.user_id, session.username = user.user_id, user.username
+    return {"user_id": user.user_id, "username": user.username}
+
+
+def _logout(session: _Session) -> None:
+    session.require_login()
+    session.user_id = session.username = None
+
+
+def _trade(trade_func, session: _Session, currency: str, amount: float) -> dict:
+    user_id = session.require_login()
+    currency = currency.upper()
+    # Котировка и сделка исполняются одним шагом писателя
+    quote = get_quote(currency, "USD")
+    return trade_func(
+        user_id=user_id,
+        currency_code=currency,
+        amount=float(amount),
+        username=session.username,
+        currency=currency,
+        quote=quote,
+    )
+
+
+def _buy(session: _Session, currency: str, amount: float) -> dict:
+    return _trade(buy, session, currency, amount)
+
+
+def _sell(session: _Session, currency: str, amount: float) -> dict:
+    return _trade(sell, session, currency, amount)
+
+
+def _get_rate(
+    session: _Session, from_code: str, to_code: str, refresh: bool = True
+) -> dict | None:
+    found = get_rate(from_code=from_code, to_code=to_code, refresh=refresh)
+    if found is None:
+        return None
+    rate, updated_at = found
+    return {"pair": f"{from_code}_{to_code}", "rate": rate, "updated_at": updated_at}
+
+
+def _show_rates(
+    session: _Session,
+    currency: str | None = None,
+    base: str | None = None,
+    top: str | None = None,
+) -> dict:
+    result = show_rates(currency=currency, base=base, top=top)
+    result["rates"] = list(result["rates"])
+    return result
+
+
+def _portfolio(session: _Session, base: str = "USD") -> dict | None:
+    return get_portfolio_summary(session.require_login(), base)
+
+
+# Метод -> (обработчик, изменяет ли данные)
+METHODS = {
+    "register": (_register, True),
+    "login": (_login, False),
+    "logout": (_logout, False),
+    "buy": (_buy, True),
+    "sell": (_sell, True),
+    "get_rate": (_get_rate, False),
+    "show_rates": (_show_rates, False),
+    "portfolio": (_portfolio, False),
+}
+# Чтения, которые могут обновить курс: сначала выполняются без обновления
+# (refresh=False), а если курс устарел (результат None) - писателем
+REFRESHING_READS = {"get_rate"}
+
+
+class TradingServer:
+    """
+    Сервер JSON-RPC на Unix-сокете или TCP (host:port).
+    """
+
+    def __init__(self, address: str) -> None:
+        self.address = address
+        self._writes: asyncio.Queue | None = None
+
+    async def _writer(self) -> None:
+        """
+        Единственный исполнитель изменяющих запросов
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            func, future = await self._writes.get()
+            if future.cancelled():
+                continue
+            # Следующий запрос ждёт завершения текущего: порядок сохраняется
+            try:
+                result = await loop.run_in_executor(None, func)
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+
+    async def _call(self, method: str, params: dict, session: _Session):
+        entry = METHODS.get(method)
+        if entry is None:
+            raise ValueError(f"Неизвестный метод '{method}'")
+        handler, is_write = entry
+        call = functools.partial(handler, session, **params)
+
+        if not is_write:
+            loop = asyncio.get_running_loop()
+            if method not in REFRESHING_READS:
+                return await loop.run_in_executor(None, call)
+            read = functools.partial(handler, session, **{**params, "refresh": False})
+            result = await loop.run_in_executor(None, read)
+            if result is not None:
+                return result
+
+        future = asyncio.get_running_loop().create_future()
+        await self._writes.put((call, future))
+        return await future
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        session = _Session()
+        try:
+            while line := await reader.readline():
+                request_id = None
+                try:
+                    request = decode(line)
+                    request_id = request.get("id")
+                    params = request.get("params") or {}
+                    result = await self._call(request.get("method"), params, session)
+                    response = {"id": request_id, "result": result}
+                except Exception as e:
+                    response = {
+                        "id": request_id,
+                        "error": {"type": type(e).__name__, "message": str(e)},
+                    }
+                writer.write(encode(response))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self) -> None:
+        self._writes = asyncio.Queue(maxsize=WRITE_QUEUE_SIZE)
+        writer_task = asyncio.create_task(self._writer())
+
+        target = parse_address(self.address)
+        if isinstance(target, tuple):
+            server = await asyncio.start_server(self._handle_client, *target)
+        else:
+            # Сокет, оставшийся от прошлого запуска, мешает bind
+            if os.path.exists(target):
+                os.unlink(target)
+            server = await asyncio.start_unix_server(self._handle_client, target)
+
+        # SIGTERM завершает сервис так же, как Ctrl+C
+        stop = asyncio.Event()
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        except NotImplementedError:
+            pass
+
+        print(f"Сервис ValutaTrade запущен: {self.address}", flush=True)
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            writer_task.cancel()
+            if not isinstance(target, tuple) and os.path.exists(target):
+                os.unlink(target)
+
+
+def run_server(address: str) -> None:
+    """
+    Запускает сервис до прерывания (Ctrl+C или SIGTERM)
+    """
+    try:
+        asyncio.run(TradingServer(address).serve())
+    except KeyboardInterrupt:
+        pass
+    print("\nСервис остановлен.")
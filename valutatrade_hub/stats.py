@@ -0,0 +1,276 @@
+"""
+Статистика операций: гистограммы задержек, счётчики ошибок и кэшей.
+Гистограмма устроена как HDR: значения (микросекунды) раскладываются по
+логарифмическим корзинам, каждая степень двойки делится на 16 подкорзин.
+Запись - O(1) без выделения памяти, относительная погрешность
+процентилей не больше ~6%, гистограммы разных процессов складываются.
+Статистика процесса при завершении добавляется к файлу logs/stats.json.
+"""
+
+import atexit
+import json
+import os
+import threading
+from array import array
+from collections import Counter
+
+from valutatrade_hub.infra.settings import SettingsLoader
+
+try:
+    import fcntl
+except ImportError:  # Windows: слияние файлов без межпроцессной блокировки
+    fcntl = None
+
+_SUB_BITS = 5
+_SUB_COUNT = 1 << _SUB_BITS  # значения меньше 32 мкс хранятся точно
+_HALF_COUNT = _SUB_COUNT // 2
+_MAX_SHIFT = 40  # до ~2^45 мкс (≈ 1 год)
+_BUCKETS = _SUB_COUNT + _MAX_SHIFT * _HALF_COUNT
+
+PERCENTILES = (50, 95, 99)
+
+
+def _bucket_index(value: int) -> int:
+    if value < _SUB_COUNT:
+        return max(value, 0)
+    shift = min(value.bit_length() - _SUB_BITS, _MAX_SHIFT)
+    top = min(value >> shift, _SUB_COUNT - 1)
+    return _SUB_COUNT + (shift - 1) * _HALF_COUNT + (top - _HALF_COUNT)
+
+
+def _bucket_value(index: int) -> int:
+    """
+    Середина диапазона значений корзины
+    """
+    if index < _SUB_COUNT:
+        return index
+    shift = (index - _SUB_COUNT) // _HALF_COUNT + 1
+    top = (index - _SUB_COUNT) % _HALF_COUNT + _HALF_COUNT
+    return (top << shift) + (1 << (shift - 1))
+
+
+class LatencyHistogram:
+    """
+    Гистограмма задержек в микросекундах
+    """
+
+    __slots__ = ("counts", "total", "sum", "min", "max")
+
+    def __init__(self) -> None:
+        self.counts = array("q", bytes(8 * _BUCKETS))
+        self.total = 0
+        self.sum = 0
+        self.min = 0
+        self.max = 0
+
+    def record(self, value_us: int) -> None:
+        self.counts[_bucket_index(value_us)] += 1
+        if not self.total or value_us < self.min:
+            self.min = value_us
+        if value_us > self.max:
+            self.max = value_us
+        self.total += 1
+        self.sum += value_us
+
+    def percentile(self, percent: float) -> int:
+        if not self.total:
+            return 0
+        rank = max(1, round(self.total * percent / 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(max(_bucket_value(index), self.min), self.max)
+        return self.max
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        if other.total and (not self.total or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+        self.total += other.total
+        self.sum += other.sum
+
+    def to_dict(self) -> dict:
+        return {
+            "total": self.total,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "buckets": {
+                str(index): count for index, count in enumerate(self.counts) if count
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        histogram = cls()
+        for index, count in data.get("buckets", {}).items():
+            histogram.counts[int(index)] = count
+        histogram.total = data.get("total", 0)
+        histogram.sum = data.get("sum", 0)
+        histogram.min = data.get("min", 0)
+        histogram.max = data.get("max", 0)
+        return histogram
+
+    def summary(self) -> dict:
+        """
+        Сводка в миллисекундах: count, mean, p50/p95/p99, max
+        """
+        result = {
+            "count": self.total,
+            "mean_ms": self.sum / self.total / 1000 if self.total else 0.0,
+        }
+        for percent in PERCENTILES:
+            result[f"p{percent}_ms"] = self.percentile(percent) / 1000
+        result["max_ms"] = self.max / 1000
+        return result
+
+
+class Stats:
+    """
+    Набор гистограмм по действиям и счётчиков ошибок и кэшей.
+    Запись не блокируется: под конкуренцией потоков счётчики приближённые.
+    """
+
+    def __init__(self) -> None:
+        self.latency: dict[str, LatencyHistogram] = {}
+        self.errors: Counter = Counter()
+        self.cache: Counter = Counter()
+
+    def record_latency(self, action: str, value_us: int) -> None:
+        histogram = self.latency.get(action)
+        if histogram is None:
+            histogram = self.latency.setdefault(action, LatencyHistogram())
+        histogram.record(value_us)
+
+    def record_error(self, action: str, error: Exception) -> None:
+        self.errors[f"{action}:{type(error).__name__}"] += 1
+
+    def cache_hit(self, cache: str) -> None:
+        self.cache[f"{cache}:hit"] += 1
+
+    def cache_miss(self, cache: str) -> None:
+        self.cache[f"{cache}:miss"] += 1
+
+    def __bool__(self) -> bool:
+        return bool(self.latency or self.errors or self.cache)
+
+    def clear(self) -> None:
+        self.latency.clear()
+        self.errors.clear()
+        self.cache.clear()
+
+    def merge(self, other: "Stats") -> None:
+        for action, histogram in other.latency.items():
+            self.latency.setdefault(action, LatencyHistogram()).merge(histogram)
+        self.errors.update(other.errors)
+        self.cache.update(other.cache)
+
+    def to_dict(self) -> dict:
+        return {
+            "latency_us": {
+                action: histogram.to_dict()
+                for action, histogram in self.latency.items()
+            },
+            "errors": dict(self.errors),
+            "cache": dict(self.cache),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Stats":
+        stats = cls()
+        for action, histogram in data.get("latency_us", {}).items():
+            stats.latency[action] = LatencyHistogram.from_dict(histogram)
+        stats.errors.update(data.get("errors", {}))
+        stats.cache.update(data.get("cache", {}))
+        return stats
+
+    def report(self) -> dict:
+        """
+        Отчёт: процентили задержек по действиям, ошибки и доли попаданий в кэши
+        """
+        caches = {}
+        for key, count in self.cache.items():
+            name, kind = key.rsplit(":", 1)
+            caches.setdefault(name, {"hit": 0, "miss": 0})[kind] += count
+        for counts in caches.values():
+            lookups = counts["hit"] + counts["miss"]
+            counts["hit_ratio"] = counts["hit"] / lookups if lookups else 0.0
+
+        return {
+            "actions": {
+                action: histogram.summary()
+                for action, histogram in sorted(self.latency.items())
+            },
+            "errors": dict(sorted(self.errors.items())),
+            "cache": dict(sorted(caches.items())),
+        }
+
+
+# Статистика текущего процесса
+STATS = Stats()
+_dump_lock = threading.Lock()
+
+
+def stats_file() -> str:
+    settings = SettingsLoader()
+    return os.path.join(settings.get("LOGS_DIR") or "logs", "stats.json")
+
+
+def load_stats(path: str | None = None) -> Stats:
+    """
+    Накопленная статистика из файла (пустая, если файла нет)
+    """
+    try:
+        with open(path or stats_file(), encoding="utf-8") as f:
+            return Stats.from_dict(json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return Stats()
+
+
+def current_stats(path: str | None = None) -> Stats:
+    """
+    Статистика из файла вместе со статистикой текущего процесса
+    """
+    stats = load_stats(path)
+    stats.merge(STATS)
+    return stats
+
+
+def dump_stats(path: str | None = None) -> None:
+    """
+    Добавляет статистику процесса к файлу и обнуляет её в памяти.
+    Слияние с файлом выполняется под межпроцессной блокировкой.
+    """
+    with _dump_lock:
+        if not STATS:
+            return
+        current = Stats()
+        current.merge(STATS)
+        STATS.clear()
+
+        path = path or stats_file()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(f"{path}.lock", "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            total = load_stats(path)
+            total.merge(current)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(total.to_dict(), f)
+            os.replace(tmp_path, path)
+
+
+def reset_stats(path: str | None = None) -> None:
+    STATS.clear()
+    try:
+        os.remove(path or stats_file())
+    except FileNotFoundError:
+        pass
+
+
+atexit.register(dump_stats)